@@ -0,0 +1,66 @@
+"""
+Microbenchmark of confirmation email rendering, in messages per second.
+
+Compares rendering one message at a time the way fastapi_mail did (template looked up in an
+auto-reloading Jinja environment, one JWT per call) with the batch path of the email worker
+(templates compiled at startup, tokens issued per batch), with and without building the MIME
+messages::
+
+    python -m benchmarks.bench_email_rendering --messages 20000 --batch-size 100
+"""
+
+import argparse
+import time
+
+from jinja2 import Environment, FileSystemLoader
+
+from src.database.models import EmailOutbox
+from src.services.auth import auth_service
+from src.services.email import EMAIL_KINDS, TEMPLATE_FOLDER, build_messages, renderer
+
+KIND = EMAIL_KINDS["confirm_email"]
+
+
+def per_message(emails: list[EmailOutbox], batch_size: int) -> None:
+    environment = Environment(loader=FileSystemLoader(TEMPLATE_FOLDER))
+    for email in emails:
+        token = auth_service.create_email_token({"sub": email.recipient})
+        environment.get_template(KIND.template).render({**email.context, "token": token})
+
+
+def batched(emails: list[EmailOutbox], batch_size: int) -> None:
+    for start in range(0, len(emails), batch_size):
+        batch = emails[start:start + batch_size]
+        contexts = KIND.build_contexts([email.recipient for email in batch], [email.context for email in batch])
+        renderer.render_many(KIND.template, contexts)
+
+
+def batched_messages(emails: list[EmailOutbox], batch_size: int) -> None:
+    for start in range(0, len(emails), batch_size):
+        build_messages(emails[start:start + batch_size])
+
+
+def measure(name: str, func, emails: list[EmailOutbox], batch_size: int) -> None:
+    started = time.perf_counter()
+    func(emails, batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<17} {elapsed / len(emails) * 1e6:8.1f} us/message   {len(emails) / elapsed:10.0f} messages/s")
+
+
+def main(messages: int, batch_size: int) -> None:
+    emails = [
+        EmailOutbox(kind="confirm_email", recipient=f"user{i}@example.com",
+                    context={"username": f"user{i}", "host": "http://localhost:8000/"})
+        for i in range(messages)
+    ]
+    measure("per message", per_message, emails, batch_size)
+    measure("batched", batched, emails, batch_size)
+    measure("batched + MIME", batched_messages, emails, batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    main(args.messages, args.batch_size)
@@ -0,0 +1,74 @@
+"""
+Concurrent latency benchmark for the Contacts REST API.
+
+Fires a fixed number of requests at a running server with a bounded number of
+in-flight requests and reports latency percentiles and throughput. Run it once
+against a build with the blocking (psycopg2) database layer and once against the
+async (asyncpg) one, with the same data set and worker count, to compare p99::
+
+    uvicorn main:app --workers 1
+    python benchmarks/bench_latency.py --token <access token> \\
+        --path "/api/contacts/search?first_name=a" --concurrency 50 --requests 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """
+    Returns the nearest-rank percentile of the samples.
+
+    :param samples: Sorted latency samples.
+    :type samples: list[float]
+    :param pct: The percentile to compute, from 0 to 100.
+    :type pct: float
+    :return: The percentile value.
+    :rtype: float
+    """
+    index = max(0, min(len(samples) - 1, round(pct / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+async def run(url: str, path: str, token: str | None, concurrency: int, requests: int) -> None:
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=url, headers=headers, timeout=60) as client:
+        async def one() -> None:
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"requests:    {requests} ({errors} errors), concurrency {concurrency}")
+    print(f"throughput:  {requests / elapsed:.1f} req/s")
+    print(f"mean:        {statistics.fmean(latencies) * 1000:.1f} ms")
+    for pct in (50, 90, 99):
+        print(f"p{pct}:         {percentile(latencies, pct) * 1000:.1f} ms")
+    print(f"max:         {latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/api/contacts/")
+    parser.add_argument("--token", default=None, help="Access token of the user to benchmark as")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.path, args.token, args.concurrency, args.requests))
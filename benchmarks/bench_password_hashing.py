@@ -0,0 +1,76 @@
+"""
+Password verification benchmark for a single API worker.
+
+Simulates a burst of logins in one event loop and reports login throughput together with the
+worst event loop stall seen by a 10 ms ticker, first with bcrypt run inline on the loop (the
+previous behaviour) and then through ``Auth.verify_password``'s bounded hashing pool. Logins over
+``password_hash_workers + password_hash_queue_size`` are shed with 503 and counted separately::
+
+    python -m benchmarks.bench_password_hashing --logins 30 --rounds 12
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import HTTPException, status
+
+from src.conf.config import settings
+from src.services.auth import auth_service
+
+
+async def measure(name: str, verify, logins: int) -> None:
+    stalls = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - started - 0.01)
+
+    async def login() -> bool:
+        try:
+            await verify()
+        except HTTPException as err:
+            if err.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                raise
+            return False
+        return True
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    admitted = sum(await asyncio.gather(*(login() for _ in range(logins))))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+
+    print(f"{name:<10} {admitted / elapsed:8.1f} logins/s   worst loop stall {max(stalls) * 1000:8.1f} ms   "
+          f"{logins - admitted} rejected with 503")
+
+
+async def main(logins: int, rounds: int) -> None:
+    context = auth_service.pwd_context.copy(bcrypt__rounds=rounds)
+    auth_service.pwd_context = context
+    hashed = context.hash("benchmark-password")
+
+    async def inline():
+        return context.verify("benchmark-password", hashed)
+
+    async def offloaded():
+        return await auth_service.verify_password("benchmark-password", hashed)
+
+    print(f"bcrypt rounds {rounds}, {logins} concurrent logins, "
+          f"{settings.password_hash_workers} hashing threads, "
+          f"{auth_service.hash_max_pending} pending hashes at most")
+    await measure("inline", inline, logins)
+    await measure("offloaded", offloaded, logins)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.rounds))
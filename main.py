@@ -1,11 +1,13 @@
+import asyncio
+
 from fastapi import FastAPI
-from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 
-from src.routes import contacts, auth, users
+from src.routes import contacts, auth, users, internal
 from src.conf.config import settings
-
-import redis.asyncio as redis
+from src.services.cache import user_cache
+from src.services.rate_limit import RateLimitHeadersMiddleware
 
 
 app = FastAPI(
@@ -21,25 +23,48 @@ origins = [
 app.include_router(auth.router, prefix='/api')
 app.include_router(contacts.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
+app.include_router(internal.router)
+
+if settings.avatar_storage == "local":
+    app.mount(settings.avatar_local_url, StaticFiles(directory=settings.avatar_local_dir, check_dir=False),
+              name="avatars")
 
+app.add_middleware(RateLimitHeadersMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "RateLimit-Limit", "RateLimit-Remaining",
+                    "RateLimit-Reset", "RateLimit-Policy", "Retry-After"],
 )
 
 
+background_tasks = set()
+
+
 @app.on_event("startup")
 async def startup():
     """
-    Initialize Redis and FastAPILimiter during the startup event.
+    Start the user cache invalidation listener during the startup event.
+
+    :rtype: None
+    """
+    background_tasks.add(asyncio.create_task(user_cache.listen()))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Stop the background tasks started during the startup event.
 
     :rtype: None
     """
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(r)
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
 
 
 @app.get("/health", tags=["Health check"])
@@ -0,0 +1,33 @@
+"""Contacts indexes
+
+Revision ID: 3f6b2c1d9e47
+Revises: aba9c2f2cd70
+Create Date: 2026-10-17 10:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6b2c1d9e47'
+down_revision: Union[str, None] = 'aba9c2f2cd70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_constraint('contacts_email_key', 'contacts', type_='unique')
+    op.create_unique_constraint('uq_contacts_user_id_email', 'contacts', ['user_id', 'email'])
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+    op.create_index('ix_contacts_user_id_name', 'contacts',
+                    ['user_id', sa.text('lower(last_name)'), sa.text('lower(first_name)'), 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_name', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
+    op.drop_constraint('uq_contacts_user_id_email', 'contacts', type_='unique')
+    op.create_unique_constraint('contacts_email_key', 'contacts', ['email'])
@@ -0,0 +1,33 @@
+"""Contacts birthday key
+
+Revision ID: 5e9a07c3d8f1
+Revises: c27d94f1a3e8
+Create Date: 2026-10-17 12:31:09.716528
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9a07c3d8f1'
+down_revision: Union[str, None] = 'c27d94f1a3e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_key', sa.SmallInteger(), nullable=True))
+    op.execute(
+        "UPDATE contacts SET birthday_key = "
+        "EXTRACT(MONTH FROM birthday)::int * 100 + EXTRACT(DAY FROM birthday)::int"
+    )
+    op.alter_column('contacts', 'birthday_key', existing_type=sa.SmallInteger(), nullable=False)
+    op.create_index('ix_contacts_user_id_birthday_key', 'contacts', ['user_id', 'birthday_key'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_key', table_name='contacts')
+    op.drop_column('contacts', 'birthday_key')
@@ -0,0 +1,29 @@
+"""Contacts trigram indexes
+
+Revision ID: 8c41e0a7b5d2
+Revises: 3f6b2c1d9e47
+Create Date: 2026-10-17 11:03:17.540981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41e0a7b5d2'
+down_revision: Union[str, None] = '3f6b2c1d9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in ('first_name', 'last_name', 'email'):
+        op.create_index(f'ix_contacts_{column}_trgm', 'contacts', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    for column in ('first_name', 'last_name', 'email'):
+        op.drop_index(f'ix_contacts_{column}_trgm', table_name='contacts')
@@ -0,0 +1,36 @@
+"""Contacts versions
+
+Revision ID: 9b3d5f7a1c20
+Revises: 5e9a07c3d8f1
+Create Date: 2026-10-17 12:52:40.318264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3d5f7a1c20'
+down_revision: Union[str, None] = '5e9a07c3d8f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('contacts', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.execute("UPDATE contacts SET updated_at = created_at")
+    op.create_table('contact_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('contact_stats')
+    op.drop_column('contacts', 'version')
+    op.drop_column('contacts', 'updated_at')
@@ -0,0 +1,26 @@
+"""Drop users.refresh_token
+
+Revision ID: a7d4c2e9b150
+Revises: f3c81b6d2a57
+Create Date: 2026-10-17 18:05:41.927310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4c2e9b150'
+down_revision: Union[str, None] = 'f3c81b6d2a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_column('users', 'refresh_token')
+
+
+def downgrade() -> None:
+    op.add_column('users', sa.Column('refresh_token', sa.String(length=255), nullable=True))
@@ -0,0 +1,38 @@
+"""Contacts search vector
+
+Revision ID: c27d94f1a3e8
+Revises: 8c41e0a7b5d2
+Create Date: 2026-10-17 11:46:52.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c27d94f1a3e8'
+down_revision: Union[str, None] = '8c41e0a7b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR = (
+    "to_tsvector('simple', "
+    "coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || "
+    "coalesce(email, '') || ' ' || coalesce(phone, '') || ' ' || coalesce(additional_info, ''))"
+)
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('search_vector', postgresql.TSVECTOR(),
+                                        sa.Computed(SEARCH_VECTOR, persisted=True), nullable=True))
+    op.create_index('ix_contacts_search_vector', 'contacts', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_search_vector', table_name='contacts')
+    op.drop_column('contacts', 'search_vector')
@@ -0,0 +1,31 @@
+"""Contact stats total
+
+Revision ID: e6f2a8c4d913
+Revises: 9b3d5f7a1c20
+Create Date: 2026-10-17 13:05:12.604187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f2a8c4d913'
+down_revision: Union[str, None] = '9b3d5f7a1c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contact_stats', sa.Column('total', sa.BigInteger(), server_default='0', nullable=False))
+    op.execute(
+        "INSERT INTO contact_stats (user_id, version, total) "
+        "SELECT user_id, 0, count(*) FROM contacts GROUP BY user_id "
+        "ON CONFLICT (user_id) DO UPDATE SET total = EXCLUDED.total"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('contact_stats', 'total')
@@ -3,15 +3,41 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     sqlalchemy_database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
     secret_key: str
     algorithm: str
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_queue_size: int = 32
+    token_cache_size: int = 10000
+    refresh_token_ttl: int = 7 * 24 * 60 * 60
     mail_username: str
     mail_password: str
     mail_from: str
     mail_port: int
     mail_server: str
+    mail_from_name: str = "Anonymous Name"
+    mail_ssl_tls: bool = True
+    mail_starttls: bool = False
+    mail_validate_certs: bool = True
+    mail_timeout: float = 30
+    email_batch_size: int = 100
+    email_max_attempts: int = 8
+    email_retry_base: float = 30
+    email_retry_max: float = 3600
+    email_claim_timeout: float = 300
+    email_poll_interval: float = 1.0
     redis_host: str
     redis_port: int
+    user_cache_ttl: int = 6 * 60 * 60
+    user_cache_local_ttl: float = 300
+    user_cache_local_size: int = 1024
+    response_cache_enabled: bool = True
+    response_cache_ttl: int = 300
 
     postgres_db: str
     postgres_user: str
@@ -22,6 +48,39 @@ class Settings(BaseSettings):
     cloudinary_api_key: str
     cloudinary_api_secret: str
 
+    avatar_storage: str = "cloudinary"
+    avatar_local_dir: str = "media/avatars"
+    avatar_local_url: str = "/media/avatars"
+    avatar_max_bytes: int = 5 * 1024 * 1024
+    avatar_max_pixels: int = 40_000_000
+    avatar_size: int = 250
+
+    internal_api_token: str | None = None
+
+    contacts_max_page_size: int = 100
+    contacts_import_batch_size: int = 1000
+    contacts_import_max_errors: int = 100
+    contacts_export_batch_size: int = 1000
+    contacts_batch_max_size: int = 500
+
+    rate_limit_enabled: bool = True
+    rate_limit_default: str = "60/60"
+    rate_limits: dict[str, str] = {
+        "contacts_list": "12/60",
+        "contacts_search": "60/60",
+        "contacts_birthdays": "60/60",
+        "contacts_read": "12/60",
+        "contacts_create": "12/60",
+        "contacts_update": "60/60",
+        "contacts_patch": "60/60",
+        "contacts_delete": "60/60",
+        "contacts_batch": "12/60",
+        "contacts_import": "2/60",
+        "contacts_export": "2/60",
+    }
+    rate_limit_lease_fraction: float = 0.1
+    rate_limit_lease_ttl: float = 1.0
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,24 +1,80 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-import psycopg2
-import os
-from dotenv import load_dotenv
 from src.conf.config import settings
+from src.database.pool import InstrumentedAsyncQueuePool
 
-load_dotenv()
 
-SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
+def to_async_url(url: str) -> str:
+    """
+    Converts a database URL to its asyncio driver counterpart.
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    ``postgresql://`` and ``postgresql+psycopg2://`` URLs are switched to asyncpg and
+    ``sqlite://`` URLs to aiosqlite, so existing ``.env`` files keep working.
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    :param url: A database URL.
+    :type url: str
+    :return: The URL with an asyncio-compatible driver.
+    :rtype: str
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql" and parsed.get_driver_name() != "asyncpg":
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    elif parsed.get_backend_name() == "sqlite" and parsed.get_driver_name() != "aiosqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+SQLALCHEMY_DATABASE_URL = to_async_url(settings.sqlalchemy_database_url)
+
+
+def engine_options(url: str) -> dict:
+    """
+    Returns the connection pool options configured in ``Settings`` for a database URL.
+
+    SQLite keeps the pool chosen by its dialect, since its file and memory databases
+    need different pool classes.
+
+    :param url: A database URL.
+    :type url: str
+    :return: Keyword arguments for ``create_async_engine``.
+    :rtype: dict
+    """
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+    return options
+
+
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    """
+    Yields an async database session and closes it once the request is finished.
+
+    :return: An async database session.
+    :rtype: AsyncSession
+    """
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def get_session_maker() -> async_sessionmaker:
+    """
+    Returns the session factory, for responses that outlive the request's ``get_db`` session,
+    such as streamed responses which keep reading from the database after the handler returns.
+
+    :return: The async session factory.
+    :rtype: async_sessionmaker
+    """
+    return SessionLocal
@@ -1,5 +1,8 @@
-from sqlalchemy import Column, Integer, String, Date, func, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from datetime import date, datetime
+
+from sqlalchemy import (Column, Integer, BigInteger, SmallInteger, String, Text, Date, JSON, func, literal_column,
+                        ForeignKey, Boolean, Index, UniqueConstraint)
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql.sqltypes import DateTime
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -7,18 +10,79 @@ from sqlalchemy.ext.declarative import declarative_base
 Base = declarative_base()
 
 
+def birthday_key(birthday: date | None) -> int | None:
+    """
+    Returns the month and day of a birthday as an ``MMDD`` integer, e.g. 1231 for December 31.
+
+    Keys sort in calendar order regardless of the year, so a window of upcoming birthdays is a range of keys.
+
+    :param birthday: A birthday.
+    :type birthday: date | None
+    :return: The ``MMDD`` key or None if there is no birthday.
+    :rtype: int | None
+    """
+    if birthday is None:
+        return None
+    return birthday.month * 100 + birthday.day
+
+
+def _birthday_key_default(context) -> int | None:
+    # Fills birthday_key for Core inserts, e.g. executemany batches, from the birthday being inserted
+    return birthday_key(context.get_current_parameters().get("birthday"))
+
+
 class Contact(Base):
     __tablename__ = "contacts"
     id = Column(Integer, primary_key=True)
     created_at = Column('created_at', DateTime, default=func.now())
     first_name = Column(String(50), nullable=False)
     last_name = Column(String(50), nullable=False)
-    email = Column(String(320), nullable=False, unique=True)
+    email = Column(String(320), nullable=False)
     phone = Column(String(15), nullable=False)
     birthday = Column("birthday", Date, nullable=False)
+    birthday_key = Column(SmallInteger, nullable=False, default=_birthday_key_default)
     additional_info = Column(String(350), nullable=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    # Maintained by every write, including Core UPDATEs that don't set them; they back the contact ETag
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)
     user = relationship("User", back_populates="contacts")
+    # PostgreSQL also has a generated ``search_vector`` tsvector column with a GIN index (see the
+    # "contacts search vector" migration). It is left unmapped so the model stays portable to SQLite.
+
+    __table_args__ = (
+        # Every contacts query is scoped to a user, so each index leads with user_id
+        UniqueConstraint("user_id", "email", name="uq_contacts_user_id_email"),
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_id_name", user_id, func.lower(last_name), func.lower(first_name), id),
+        Index("ix_contacts_user_id_birthday_key", user_id, birthday_key),
+        # Trigram indexes serve the ILIKE '%term%' filters of the contacts search (PostgreSQL only)
+        Index("ix_contacts_first_name_trgm", first_name, postgresql_using="gin",
+              postgresql_ops={"first_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_contacts_last_name_trgm", last_name, postgresql_using="gin",
+              postgresql_ops={"last_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_contacts_email_trgm", email, postgresql_using="gin",
+              postgresql_ops={"email": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
+    @validates("birthday")
+    def _set_birthday_key(self, key, value):
+        if isinstance(value, str):
+            value = date.fromisoformat(value)
+        self.birthday_key = birthday_key(value)
+        return value
+
+
+class ContactStats(Base):
+    """
+    Per-user counters of the contacts collection, maintained in the transaction of every contacts write:
+    ``version`` is bumped, so the collection ETag is derived from one primary-key lookup instead of the rows,
+    and ``total`` tracks the number of contacts, so listings report it without counting.
+    """
+    __tablename__ = "contact_stats"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    total = Column(BigInteger, nullable=False, default=0, server_default="0")
 
 
 class User(Base):
@@ -29,6 +93,31 @@ class User(Base):
     password = Column(String(255), nullable=False)
     created_at = Column("created_at", DateTime, default=func.now())
     avatar = Column(String(255), nullable=True)
-    refresh_token = Column(String(255), nullable=True)
     contacts = relationship("Contact", back_populates="user")
     confirmed = Column(Boolean, default=False)
+
+
+class EmailOutbox(Base):
+    """
+    Emails waiting to be sent by the email worker. Rows are written in the transaction of the change that
+    triggers the email, so an email is neither lost nor sent for a change that was rolled back.
+
+    ``next_attempt_at`` is when a pending email is due. Claiming a batch pushes it forward by the claim
+    timeout, so the emails of a worker that died mid-batch are picked up again.
+    """
+    __tablename__ = "email_outbox"
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    recipient = Column(String(320), nullable=False)
+    context = Column(JSON, nullable=False, default=dict)
+    status = Column(String(10), nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_pending", next_attempt_at, postgresql_where=status == "pending",
+              sqlite_where=status == "pending"),
+    )
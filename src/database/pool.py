@@ -0,0 +1,112 @@
+"""
+Connection Pool Module
+
+This module provides an instrumented connection pool that records checkout wait time
+and connect latency, so pools can be sized per worker against Postgres ``max_connections``.
+"""
+
+import bisect
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class Histogram:
+    """
+    A cumulative histogram with fixed bucket upper bounds (in seconds).
+    """
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Records a single observation.
+
+        :param value: The observed duration in seconds.
+        :type value: float
+        :rtype: None
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Returns the histogram as cumulative bucket counts keyed by upper bound.
+
+        :return: The bucket counts, the number of observations and their sum.
+        :rtype: dict
+        """
+        cumulative, total = {}, 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            total += count
+            cumulative[bound] = total
+        return {"buckets": cumulative, "count": self.count, "sum": round(self.sum, 6)}
+
+
+class PoolMetrics:
+    """
+    Per-process connection pool statistics.
+    """
+
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self.connect_latency = Histogram()
+        self.timeouts = 0
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    An AsyncAdaptedQueuePool that records checkout wait time and connect latency in ``pool_metrics``.
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.checkout_wait.observe(time.perf_counter() - started)
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            pool_metrics.connect_latency.observe(time.perf_counter() - started)
+
+
+def pool_status(pool) -> dict:
+    """
+    Returns the current state of a pool together with the recorded metrics.
+
+    :param pool: The connection pool to describe.
+    :type pool: Pool
+    :return: Pool size, checked-out and overflow connections, timeouts and histograms.
+    :rtype: dict
+    """
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    status.update(
+        timeouts=pool_metrics.timeouts,
+        checkout_wait=pool_metrics.checkout_wait.snapshot(),
+        connect_latency=pool_metrics.connect_latency.snapshot(),
+    )
+    return status
@@ -4,36 +4,211 @@ Contacts Repository Module
 This module provides functions for handling contacts in the database.
 """
 
-from typing import List, Optional
+import base64
+import binascii
+import json
+from typing import AsyncIterator, List, Optional, Sequence, Set, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, bindparam, case, delete, func, insert, literal_column, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import TSVECTOR, insert as pg_insert, websearch_to_tsquery
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Result, RowMapping
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
 
-from src.database.models import Contact, User
-from src.schemas import ContactCreate, ContactUpdate
+from src.database.models import Contact, ContactStats, User, birthday_key
+from src.services.cache import response_cache
+from src.schemas import (
+    BatchDelete,
+    BatchItemResult,
+    BatchOperation,
+    BatchUpdate,
+    ContactCreate,
+    ContactOrder,
+    ContactPatch,
+    ContactResponse,
+    ContactUpdate,
+)
 
-from datetime import datetime, timedelta, date
-from sqlalchemy import and_, func
+from datetime import timedelta, date
 
 
-async def get_contacts(skip: int, limit: int, user: User, db: Session) -> List[Contact]:
+def _sort_key(order: ContactOrder) -> tuple:
+    """
+    The function returns the columns contacts are ordered by for a provided sort order.
+
+    :param order: A sort order.
+    :type order: ContactOrder
+    :return: The sort key columns, always ending with the contact id.
+    :rtype: tuple
+    """
+    if order == ContactOrder.name:
+        return func.lower(Contact.last_name), func.lower(Contact.first_name), Contact.id
+    return (Contact.id,)
+
+
+def _pack_cursor(kind: str, key: list) -> str:
+    """
+    The function packs a sort key into an opaque url-safe cursor.
+
+    :param kind: The kind of listing the cursor belongs to.
+    :type kind: str
+    :param key: The sort key of the last row of a page.
+    :type key: list
+    :return: An url-safe cursor.
+    :rtype: str
+    """
+    payload = json.dumps({"o": kind, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _unpack_cursor(cursor: str, kind: str, size: int) -> list:
+    """
+    The function unpacks a cursor made by ``_pack_cursor``.
+
+    :param cursor: A cursor returned with a previous page.
+    :type cursor: str
+    :param kind: The kind of listing requested.
+    :type kind: str
+    :param size: The expected number of sort key values.
+    :type size: int
+    :return: The sort key of the last row of the previous page.
+    :rtype: list
+    :raises ValueError: If the cursor is malformed or was issued for another kind of listing.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        key = payload["k"]
+        valid = payload["o"] == kind and isinstance(key, list) and len(key) == size
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        valid = False
+    if not valid:
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def encode_cursor(contact: Contact, order: ContactOrder) -> str:
+    """
+    The function builds an opaque cursor pointing right after a provided contact.
+
+    :param contact: The last contact of a page.
+    :type contact: Contact
+    :param order: The sort order of the page.
+    :type order: ContactOrder
+    :return: An url-safe cursor.
+    :rtype: str
+    """
+    if order == ContactOrder.name:
+        return _pack_cursor(order.value, [contact.last_name, contact.first_name, contact.id])
+    return _pack_cursor(order.value, [contact.id])
+
+
+def decode_cursor(cursor: str, order: ContactOrder) -> list:
+    """
+    The function decodes a cursor made by ``encode_cursor``.
+
+    :param cursor: A cursor returned with a previous page.
+    :type cursor: str
+    :param order: The sort order of the requested page.
+    :type order: ContactOrder
+    :return: The sort key of the last contact of the previous page.
+    :rtype: list
+    :raises ValueError: If the cursor is malformed or was issued for another sort order.
+    """
+    return _unpack_cursor(cursor, order.value, len(_sort_key(order)))
+
+
+def _dialect(db: AsyncSession) -> str:
+    """
+    The function returns the name of the database dialect a session is bound to.
+
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: The dialect name, e.g. ``postgresql`` or ``sqlite``.
+    :rtype: str
+    """
+    return db.get_bind().dialect.name
+
+
+def _projection(fields: Optional[Sequence[str]], *required: str) -> Select:
+    """
+    The function starts a contacts query that loads either whole contacts or only the requested columns.
+
+    :param fields: The names of the contact columns to load, or None to load ``Contact`` objects.
+    :type fields: Sequence[str] | None
+    :param required: Columns the query itself needs, e.g. for a cursor, loaded along with the requested ones.
+    :type required: str
+    :return: A SELECT of ``Contact`` or of the columns.
+    :rtype: Select
+    """
+    if not fields:
+        return select(Contact)
+    return select(*(getattr(Contact, name) for name in dict.fromkeys((*fields, *required))))
+
+
+def _fetch_all(result: Result, fields: Optional[Sequence[str]]) -> list:
+    """
+    The function returns the rows of a query started by ``_projection``.
+
+    :param result: The result of the query.
+    :type result: Result
+    :param fields: The fields passed to ``_projection``.
+    :type fields: Sequence[str] | None
+    :return: ``Contact`` objects, or rows with the requested columns as attributes.
+    :rtype: list
+    """
+    return result.all() if fields else result.scalars().all()
+
+
+async def get_contacts(
+        skip: int,
+        limit: int,
+        user: User,
+        db: AsyncSession,
+        cursor: Optional[str] = None,
+        order: ContactOrder = ContactOrder.id,
+        fields: Optional[Sequence[str]] = None
+) -> List[Contact]:
     """
     The function returns a list of contacts for a user with pagination param.
 
-    :param skip: A number of contacts to skip.
+    With a cursor the page starts right after the contact the cursor points to (keyset pagination),
+    otherwise ``skip`` contacts are skipped (offset pagination).
+
+    :param skip: A number of contacts to skip. Ignored when a cursor is provided.
     :type skip: int
     :param limit: A maximum contacts number to show.
     :type limit: int
     :param user: To get contacts for a specified user.
     :type user: User
     :param db: A database session.
-    :type db: Session
-    :return: A list of contacts.
+    :type db: AsyncSession
+    :param cursor: A cursor returned with a previous page.
+    :type cursor: str | None
+    :param order: A sort order: by id or by last and first name.
+    :type order: ContactOrder
+    :param fields: The contact columns to load; all of them when None.
+    :type fields: Sequence[str] | None
+    :return: A list of contacts, or of rows with the requested columns.
     :rtype: List[Contact]
+    :raises ValueError: If the cursor is invalid.
     """
-    return db.query(Contact).filter(Contact.user_id == user.id).offset(skip).limit(limit).all()
+    sort_key = _sort_key(order)
+    cursor_columns = ("last_name", "first_name", "id") if order == ContactOrder.name else ("id",)
+    stmt = _projection(fields, *cursor_columns).filter(Contact.user_id == user.id).order_by(*sort_key).limit(limit)
+    if cursor:
+        key = decode_cursor(cursor, order)
+        if order == ContactOrder.name:
+            # Lowercase on the database side so the cursor matches the collation of the sort key
+            key = [func.lower(key[0]), func.lower(key[1]), key[2]]
+        stmt = stmt.filter(tuple_(*sort_key) > tuple_(*key))
+    else:
+        stmt = stmt.offset(skip)
+    contacts = await db.execute(stmt)
+    return _fetch_all(contacts, fields)
 
 
-async def get_contact(contact_id: int, user: User, db: Session) -> Contact:
+async def get_contact(contact_id: int, user: User, db: AsyncSession) -> Contact:
     """
     The function returns a contact with a provided contact_id for a specified user.
 
@@ -42,14 +217,16 @@ async def get_contact(contact_id: int, user: User, db: Session) -> Contact:
     :param user: To get a contact for a specified user.
     :type user: User
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A contact with a provided contact_id or None if a contact with a provided id doesn't exist.
     :rtype: Contact | None
     """
-    return db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
+    stmt = select(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id))
+    contact = await db.execute(stmt)
+    return contact.scalar_one_or_none()
 
 
-async def create_contact(body: ContactCreate, user: User, db: Session) -> Contact:
+async def create_contact(body: ContactCreate, user: User, db: AsyncSession) -> Contact:
     """
     The function creates a new contact for a provided user.
 
@@ -58,26 +235,261 @@ async def create_contact(body: ContactCreate, user: User, db: Session) -> Contac
     :param user: To create a contact for a specified user.
     :type user: User
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A created contact.
     :rtype: Contact
     """
-    contact = Contact(
-        first_name=body.first_name,
-        last_name=body.last_name,
-        email=body.email,
-        phone=body.phone,
-        birthday=body.birthday,
-        additional_info=body.additional_info,
-        user_id=user.id
+    stmt = (
+        insert(Contact)
+        .values(**body.model_dump(), birthday_key=birthday_key(body.birthday), user_id=user.id)
+        .returning(Contact)
     )
-    db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    contact = (await db.execute(stmt)).scalar_one()
+    await _commit(user, db, added=1)
     return contact
 
 
-async def remove_contact(contact_id: int, user: User, db: Session) -> Contact | None:
+def _insert(db: AsyncSession):
+    """
+    The function returns the INSERT construct of the session's dialect, which supports ON CONFLICT.
+
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: An ``insert`` function for PostgreSQL or SQLite.
+    """
+    return pg_insert if _dialect(db) == "postgresql" else sqlite_insert
+
+
+async def _update_stats(user: User, db: AsyncSession, added: int = 0) -> None:
+    """
+    The function increments the version of a user's contacts collection and adjusts its total in the current
+    transaction.
+
+    Every write to a user's contacts calls it before committing, so the collection version changes
+    whenever any listing of the user's contacts could, and the total stays exact without counting rows.
+
+    :param user: The user whose contacts changed.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :param added: The number of contacts created minus the number of contacts removed.
+    :type added: int
+    """
+    stmt = (
+        _insert(db)(ContactStats)
+        .values(user_id=user.id, version=1, total=added)
+        .on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"version": ContactStats.version + 1, "total": ContactStats.total + added},
+        )
+    )
+    await db.execute(stmt)
+
+
+async def _commit(user: User, db: AsyncSession, changed: bool = True, added: int = 0) -> None:
+    """
+    The function commits a write to a user's contacts.
+
+    When the write changed anything, the collection stats are updated in the same transaction and the user's
+    cached responses are invalidated once the transaction is committed.
+
+    :param user: The user whose contacts were written.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :param changed: Whether the write changed any contact.
+    :type changed: bool
+    :param added: The number of contacts created minus the number of contacts removed.
+    :type added: int
+    """
+    if changed:
+        await _update_stats(user, db, added)
+    await db.commit()
+    if changed:
+        await response_cache.invalidate(user.id)
+
+
+async def get_contact_version(contact_id: int, user: User, db: AsyncSession) -> int | None:
+    """
+    The function returns the version of a user's contact without loading the contact.
+
+    :param contact_id: A contact id.
+    :type contact_id: int
+    :param user: To look up a contact of a specified user.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: The version of the contact or None if a contact with a provided id doesn't exist.
+    :rtype: int | None
+    """
+    stmt = select(Contact.version).filter(Contact.id == contact_id, Contact.user_id == user.id)
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def get_collection_stats(user: User, db: AsyncSession) -> Tuple[int, int]:
+    """
+    The function returns the version and the number of contacts of a user's contacts collection with one
+    primary-key lookup.
+
+    :param user: To look up the collection of a specified user.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: The collection version, which changes on every write to it, and the number of contacts.
+        Both are 0 if the user's contacts were never changed.
+    :rtype: Tuple[int, int]
+    """
+    stmt = select(ContactStats.version, ContactStats.total).filter(ContactStats.user_id == user.id)
+    stats = (await db.execute(stmt)).one_or_none()
+    return (stats[0], stats[1]) if stats else (0, 0)
+
+
+async def count_contacts(user: User, db: AsyncSession) -> int:
+    """
+    The function counts the contacts of a user with ``COUNT(*)``, served by the ``(user_id, id)`` index.
+
+    :param user: To count contacts of a specified user.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: The number of contacts.
+    :rtype: int
+    """
+    stmt = select(func.count()).select_from(Contact).filter(Contact.user_id == user.id)
+    return (await db.execute(stmt)).scalar_one()
+
+
+async def import_contacts(bodies: List[ContactCreate], user: User, db: AsyncSession) -> Set[str]:
+    """
+    The function inserts a batch of contacts for a provided user in one multi-row statement.
+
+    Contacts whose email the user already has are skipped.
+
+    :param bodies: Contacts' data, with distinct emails.
+    :type bodies: List[ContactCreate]
+    :param user: To create the contacts for a specified user.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: The emails of the inserted contacts.
+    :rtype: Set[str]
+    """
+    if not bodies:
+        return set()
+    rows = [
+        dict(body.model_dump(), birthday_key=birthday_key(body.birthday), user_id=user.id)
+        for body in bodies
+    ]
+    stmt = _insert(db)(Contact).on_conflict_do_nothing(index_elements=["user_id", "email"]).returning(Contact.email)
+    inserted = await db.execute(stmt, rows)
+    emails = set(inserted.scalars().all())
+    await _commit(user, db, changed=bool(emails), added=len(emails))
+    return emails
+
+
+async def apply_batch(operations: List[BatchOperation], user: User, db: AsyncSession) -> List[BatchItemResult]:
+    """
+    The function applies a batch of create, update and delete operations for a provided user in one transaction.
+
+    The operations are checked up front with one SELECT, then applied set-based: one DELETE, one executemany
+    UPDATE and one multi-row INSERT, whatever the size of the batch. Deletes run first, then updates, then
+    creates. An operation is rejected, without affecting the others, when its contact doesn't exist (404), when
+    its contact is already changed by an earlier accepted operation of the batch or when its email is taken (409).
+    An email is only freed by an accepted delete earlier in the batch.
+
+    :param operations: The operations to apply.
+    :type operations: List[BatchOperation]
+    :param user: To change contacts of a specified user.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: The result of every operation, in the order of the operations.
+    :rtype: List[BatchItemResult]
+    """
+    writes = [op for op in operations if not isinstance(op, BatchDelete)]
+    existing = {}
+    if writes:
+        update_ids = [op.id for op in writes if isinstance(op, BatchUpdate)]
+        emails = [op.contact.email for op in writes]
+        rows = await db.execute(
+            select(Contact.id, Contact.email, Contact.created_at)
+            .filter(Contact.user_id == user.id, or_(Contact.id.in_(update_ids), Contact.email.in_(emails)))
+        )
+        existing = {row.id: row for row in rows}
+    owners = {row.email: row.id for row in existing.values()}
+
+    results: List[Optional[BatchItemResult]] = [None] * len(operations)
+    # Only accepted operations change a contact or free its email, so a rejected one never blocks or unblocks another
+    touched, claimed = set(), set()
+    deletes, updates, creates = {}, {}, {}
+    removed_ids = set()
+    for index, op in enumerate(operations):
+        op_id = getattr(op, "id", None)
+        if op_id is not None and op_id in touched:
+            results[index] = BatchItemResult(status=409, id=op_id, detail="Contact is already changed in this batch")
+            continue
+        if isinstance(op, BatchDelete):
+            deletes[op_id] = index
+            touched.add(op_id)
+            continue
+        if isinstance(op, BatchUpdate) and op_id not in existing:
+            results[index] = BatchItemResult(status=404, id=op_id, detail="Contact not found")
+            continue
+        email = op.contact.email
+        owner = owners.get(email)
+        if email in claimed or (owner is not None and owner != op_id and owner not in deletes):
+            results[index] = BatchItemResult(status=409, id=op_id, detail="Contact with this email already exists")
+            continue
+        claimed.add(email)
+        if op_id is not None:
+            touched.add(op_id)
+        (updates if isinstance(op, BatchUpdate) else creates)[index] = op
+
+    if deletes:
+        removed = await db.execute(
+            delete(Contact)
+            .where(Contact.user_id == user.id, Contact.id.in_(deletes.keys()))
+            .returning(Contact.id)
+            .execution_options(synchronize_session=False)
+        )
+        removed_ids = set(removed.scalars().all())
+        for contact_id, index in deletes.items():
+            results[index] = (BatchItemResult(status=204, id=contact_id) if contact_id in removed_ids
+                              else BatchItemResult(status=404, id=contact_id, detail="Contact not found"))
+
+    if updates:
+        table = Contact.__table__
+        await db.execute(
+            update(table).where(table.c.id == bindparam("contact_id"), table.c.user_id == user.id),
+            [
+                dict(op.contact.model_dump(), birthday_key=birthday_key(op.contact.birthday), contact_id=op.id)
+                for op in updates.values()
+            ]
+        )
+        for index, op in updates.items():
+            contact = ContactResponse(id=op.id, created_at=existing[op.id].created_at, **op.contact.model_dump())
+            results[index] = BatchItemResult(status=200, id=op.id, contact=contact)
+
+    if creates:
+        inserted = await db.execute(
+            insert(Contact).returning(Contact.id, Contact.email, Contact.created_at),
+            [
+                dict(op.contact.model_dump(), birthday_key=birthday_key(op.contact.birthday), user_id=user.id)
+                for op in creates.values()
+            ]
+        )
+        # Emails are distinct within the batch, so they match the returned rows to the operations
+        created = {row.email: row for row in inserted}
+        for index, op in creates.items():
+            row = created[op.contact.email]
+            contact = ContactResponse(id=row.id, created_at=row.created_at, **op.contact.model_dump())
+            results[index] = BatchItemResult(status=201, id=row.id, contact=contact)
+
+    await _commit(user, db, changed=bool(removed_ids or updates or creates), added=len(creates) - len(removed_ids))
+    return results
+
+
+async def remove_contact(contact_id: int, user: User, db: AsyncSession) -> Contact | None:
     """
     The function removes a contact with a provided id for a provided user.
 
@@ -86,18 +498,51 @@ async def remove_contact(contact_id: int, user: User, db: Session) -> Contact |
     :param user: To remove a contact for a specified user.
     :type user: User
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A removed contact or None if a contact with a provided id doesn't exist.
     :rtype: Contact | None
     """
-    contact = db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
-    if contact:
-        db.delete(contact)
-        db.commit()
+    stmt = (
+        delete(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == user.id)
+        .returning(Contact)
+        .execution_options(synchronize_session=False)
+    )
+    contact = (await db.execute(stmt)).scalar_one_or_none()
+    await _commit(user, db, changed=contact is not None, added=-1)
     return contact
 
 
-async def update_contact(contact_id: int, body: ContactUpdate, user: User, db: Session) -> Contact | None:
+async def _update_returning(contact_id: int, values: dict, user: User, db: AsyncSession) -> Contact | None:
+    """
+    The function writes the provided columns of a user's contact with one UPDATE ... RETURNING statement.
+
+    :param contact_id: A contact id to update.
+    :type contact_id: int
+    :param values: The columns to write.
+    :type values: dict
+    :param user: To update a contact for a specified user.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: The updated contact or None if a contact with a provided id doesn't exist.
+    :rtype: Contact | None
+    """
+    if "birthday" in values:
+        values["birthday_key"] = birthday_key(values["birthday"])
+    stmt = (
+        update(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == user.id)
+        .values(**values)
+        .returning(Contact)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    contact = (await db.execute(stmt)).scalar_one_or_none()
+    await _commit(user, db, changed=contact is not None)
+    return contact
+
+
+async def update_contact(contact_id: int, body: ContactUpdate, user: User, db: AsyncSession) -> Contact | None:
     """
     The function updates contact info for a provided user.
 
@@ -108,34 +553,88 @@ async def update_contact(contact_id: int, body: ContactUpdate, user: User, db: S
     :param user: To update a contact for a specified user.
     :type user: User
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: An updated contact or None if a contact with a provided id doesn't exist.
     :rtype: Contact | None
     """
-    contact = db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
-    if contact:
-        contact.first_name = body.first_name
-        contact.last_name = body.last_name
-        contact.email = body.email
-        contact.phone = body.phone
-        contact.birthday = body.birthday
-        contact.additional_info = body.additional_info
-        db.commit()
-    return contact
+    return await _update_returning(contact_id, body.model_dump(), user, db)
+
+
+async def patch_contact(contact_id: int, body: ContactPatch, user: User, db: AsyncSession) -> Contact | None:
+    """
+    The function updates only the provided fields of a contact for a provided user.
+
+    :param contact_id: A contact id to update.
+    :type contact_id: int
+    :param body: The contact's fields to change; fields left out of the request are kept.
+    :type body: ContactPatch
+    :param user: To update a contact for a specified user.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: An updated contact or None if a contact with a provided id doesn't exist.
+    :rtype: Contact | None
+    """
+    values = body.model_dump(exclude_unset=True)
+    if not values:
+        return await get_contact(contact_id, user, db)
+    return await _update_returning(contact_id, values, user, db)
+
+
+def _contains(column, term: str):
+    """
+    The function builds a case-insensitive substring filter with LIKE wildcards in the term escaped.
+
+    On PostgreSQL it compiles to ``ILIKE '%term%'``, which the pg_trgm GIN indexes on contacts serve;
+    on SQLite it falls back to ``lower(column) LIKE lower('%term%')``.
+
+    :param column: A column to search in.
+    :param term: A substring to search for.
+    :type term: str
+    :return: A filter expression.
+    """
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+
+def _search_filters(user: User, first_name: Optional[str], last_name: Optional[str], email: Optional[str]) -> list:
+    """
+    The function builds the filters of ``search_contacts``.
+
+    :param user: To search for contacts of a specified user.
+    :type user: User
+    :param first_name: A substring of the first name, if any.
+    :type first_name: str | None
+    :param last_name: A substring of the last name, if any.
+    :type last_name: str | None
+    :param email: A substring of the email, if any.
+    :type email: str | None
+    :return: A list of filter expressions.
+    :rtype: list
+    """
+    filters = [Contact.user_id == user.id]
+    if first_name:
+        filters.append(_contains(Contact.first_name, first_name))
+    if last_name:
+        filters.append(_contains(Contact.last_name, last_name))
+    if email:
+        filters.append(_contains(Contact.email, email))
+    return filters
 
 
 async def search_contacts(
-        db: Session,
+        db: AsyncSession,
         first_name: Optional[str],
         last_name: Optional[str],
         email: Optional[str],
-        user: User
+        user: User,
+        fields: Optional[Sequence[str]] = None
 ) -> List[Contact]:
     """
     The function searches for contacts by a provided first name or last name or email.
 
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :param first_name: Will be used to search among a first name of all the contacts of a specified user.
     :type first_name: str
     :param last_name: Will be used to search among a last name of all the contacts of a specified user.
@@ -144,52 +643,165 @@ async def search_contacts(
     :type email: str
     :param user: To search for contacts of a specified user.
     :type user: User
-    :return: A list of the contacts with matches.
+    :param fields: The contact columns to load; all of them when None.
+    :type fields: Sequence[str] | None
+    :return: A list of the contacts with matches, or of rows with the requested columns.
     :rtype: List[Contact]
     """
-    query = db.query(Contact).filter(Contact.user_id == user.id)
+    stmt = _projection(fields).filter(*_search_filters(user, first_name, last_name, email))
+    contacts = await db.execute(stmt)
+    return _fetch_all(contacts, fields)
 
-    if first_name:
-        query = query.filter(Contact.first_name.ilike(f'%{first_name}%'))
-    if last_name:
-        query = query.filter(Contact.last_name.ilike(f'%{last_name}%'))
-    if email:
-        query = query.filter(Contact.email.ilike(f'%{email}%'))
 
-    contacts = query.all()
-    return contacts
+EXPORT_COLUMNS = (
+    Contact.id, Contact.first_name, Contact.last_name, Contact.email,
+    Contact.phone, Contact.birthday, Contact.additional_info, Contact.created_at,
+)
+
 
+async def stream_contacts(
+        user: User,
+        db: AsyncSession,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None,
+        email: Optional[str] = None,
+        batch_size: int = 1000
+) -> AsyncIterator[RowMapping]:
+    """
+    The function streams the contacts of a user, optionally filtered like ``search_contacts``, ordered by id.
 
-def get_upcoming_birthdays(db: Session, user: User, days: int = 7) -> List[Contact]:
+    Rows are fetched from a server-side cursor ``batch_size`` at a time and are plain column mappings,
+    not ORM objects, so memory stays constant however many contacts the user has.
+
+    :param user: To stream contacts of a specified user.
+    :type user: User
+    :param db: A database session, kept open until the stream is exhausted.
+    :type db: AsyncSession
+    :param first_name: A substring of the first name to filter by.
+    :type first_name: str | None
+    :param last_name: A substring of the last name to filter by.
+    :type last_name: str | None
+    :param email: A substring of the email to filter by.
+    :type email: str | None
+    :param batch_size: The number of rows fetched per round trip.
+    :type batch_size: int
+    :return: The contacts' columns named as in ``EXPORT_COLUMNS``.
+    :rtype: AsyncIterator[RowMapping]
+    """
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .filter(*_search_filters(user, first_name, last_name, email))
+        .order_by(Contact.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(stmt)
+    try:
+        async for row in result.mappings():
+            yield row
+    finally:
+        await result.close()
+
+
+async def full_text_search(
+        q: str,
+        limit: int,
+        user: User,
+        db: AsyncSession,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None
+) -> Tuple[List[Contact], Optional[str]]:
+    """
+    The function searches all the contact fields of a provided user and returns the best matches first.
+
+    On PostgreSQL the query is parsed with ``websearch_to_tsquery`` and matched against the stored
+    ``search_vector`` column (names, email, phone and additional info) through its GIN index, ranked with
+    ``ts_rank_cd``. Other databases fall back to case-insensitive substring matching of every word,
+    ranked by the number of matching fields.
+
+    :param q: A search query.
+    :type q: str
+    :param limit: A maximum contacts number to return.
+    :type limit: int
+    :param user: To search for contacts of a specified user.
+    :type user: User
+    :param db: A database session.
+    :type db: AsyncSession
+    :param cursor: A cursor returned with a previous page of the same search.
+    :type cursor: str | None
+    :param fields: The contact columns to load; all of them when None.
+    :type fields: Sequence[str] | None
+    :return: A list of the contacts, or of rows with the requested columns, ordered by relevance and a cursor
+        of the next page, if it may exist.
+    :rtype: Tuple[List[Contact], str | None]
+    :raises ValueError: If the cursor is invalid.
+    """
+    if _dialect(db) == "postgresql":
+        query = websearch_to_tsquery("simple", q)
+        vector = literal_column("contacts.search_vector", type_=TSVECTOR)
+        rank = func.ts_rank_cd(vector, query)
+        match = vector.op("@@")(query)
+    else:
+        columns = (Contact.first_name, Contact.last_name, Contact.email, Contact.phone, Contact.additional_info)
+        words = q.split() or [q]
+        rank = sum(case((_contains(column, word), 1), else_=0) for word in words for column in columns)
+        match = and_(*(or_(*(_contains(column, word) for column in columns)) for word in words))
+
+    rank = rank.label("rank")
+    stmt = _projection(fields, "id").add_columns(rank).filter(Contact.user_id == user.id, match)
+    if cursor:
+        last_rank, last_id = _unpack_cursor(cursor, "rank", 2)
+        stmt = stmt.filter(or_(rank < last_rank, and_(rank == last_rank, Contact.id > last_id)))
+    stmt = stmt.order_by(rank.desc(), Contact.id).limit(limit)
+
+    rows = (await db.execute(stmt)).all()
+    # Rows of requested columns are returned as they are; their extra rank column is not serialised
+    contacts = rows if fields else [row[0] for row in rows]
+    next_cursor = None
+    if len(rows) == limit:
+        # The rank is the last column of both kinds of rows
+        next_cursor = _pack_cursor("rank", [rows[-1][-1], contacts[-1].id])
+    return contacts, next_cursor
+
+
+async def get_upcoming_birthdays(
+        db: AsyncSession,
+        user: User,
+        days: int = 7,
+        today: Optional[date] = None,
+        fields: Optional[Sequence[str]] = None
+) -> List[Contact]:
     """
     The function returns contacts with upcoming birthdays within the specified number of days (7) for a provided user.
+
+    Birthdays are matched by the indexed ``MMDD`` birthday key, so any window, including one that wraps
+    from December into January, is one or two range scans. Contacts are ordered by days until their birthday.
+
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :param user: To search for contacts' upcoming birthdays of a specified user.
     :type user: User
     :param days: A number of days to search for upcoming birthdays (default is 7 days).
     :type days: int
-    :return: A list of contacts who have birthdays in the upcoming days.
+    :param today: The first day of the window (default is the current date).
+    :type today: date | None
+    :param fields: The contact columns to load; all of them when None.
+    :type fields: Sequence[str] | None
+    :return: A list of contacts, or of rows with the requested columns, who have birthdays in the upcoming days.
     :rtype: List[Contact]
     """
-    today = date.today()
-    end_date = today + timedelta(days=days)
-
-    # Extract the month and day from today's date
-    today_month = today.month
-    today_day = today.day
-
-    # Extract the month and day from the upcoming_date
-    upcoming_month = end_date.month
-    upcoming_day = end_date.day
-
-    # Query for contacts with birthdays in the next `days` days
-    contacts = db.query(Contact).filter(
-        Contact.user_id == user.id,
-        (func.extract('month', Contact.birthday) == today_month) &
-        (func.extract('day', Contact.birthday) >= today_day) |
-        (func.extract('month', Contact.birthday) == upcoming_month) &
-        (func.extract('day', Contact.birthday) <= upcoming_day)
-    ).all()
+    today = today or date.today()
+    start = birthday_key(today)
+    end = birthday_key(today + timedelta(days=days))
 
-    return contacts
+    owned = Contact.user_id == user.id
+    stmt = _projection(fields)
+    if days >= 365:
+        stmt = stmt.filter(owned)
+    elif start <= end:
+        stmt = stmt.filter(owned, Contact.birthday_key.between(start, end))
+    else:
+        # The window wraps around the end of the year: two ranges, each scoped by user so both seek the index
+        stmt = stmt.filter(or_(and_(owned, Contact.birthday_key >= start), and_(owned, Contact.birthday_key <= end)))
+    stmt = stmt.order_by(case((Contact.birthday_key >= start, 0), else_=1), Contact.birthday_key, Contact.id)
+    contacts = await db.execute(stmt)
+    return _fetch_all(contacts, fields)
@@ -0,0 +1,102 @@
+"""
+Email Outbox Repository Module
+
+This module provides functions for queueing emails in the outbox and for claiming and settling
+batches of them in the email worker.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import EmailOutbox
+
+
+def queue_email(kind: str, recipient: str, context: dict, db: AsyncSession) -> EmailOutbox:
+    """
+    The function adds an email to the outbox of the current transaction; it is queued when the caller commits.
+
+    :param kind: The kind of email, e.g. ``confirm_email``.
+    :type kind: str
+    :param recipient: The recipient's email address.
+    :type recipient: str
+    :param context: JSON-serialisable values for the email template.
+    :type context: dict
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: The queued email.
+    :rtype: EmailOutbox
+    """
+    email = EmailOutbox(kind=kind, recipient=recipient, context=context)
+    db.add(email)
+    return email
+
+
+async def claim_emails(limit: int, claim_timeout: float, db: AsyncSession) -> List[EmailOutbox]:
+    """
+    The function claims a batch of due emails, oldest first, with one UPDATE ... RETURNING statement.
+
+    Claimed emails are due again after ``claim_timeout`` seconds, so another worker takes them over if this one
+    dies before settling them. On PostgreSQL, rows claimed concurrently by another worker are skipped.
+
+    :param limit: The maximum number of emails to claim.
+    :type limit: int
+    :param claim_timeout: Seconds until unsettled emails are due again.
+    :type claim_timeout: float
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: The claimed emails with their attempts counted.
+    :rtype: List[EmailOutbox]
+    """
+    now = datetime.utcnow()
+    due = (
+        select(EmailOutbox.id)
+        .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.scalars(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due.scalar_subquery()))
+        .values(attempts=EmailOutbox.attempts + 1, next_attempt_at=now + timedelta(seconds=claim_timeout))
+        .returning(EmailOutbox)
+        .execution_options(synchronize_session=False)
+    )
+    emails = sorted(result.all(), key=lambda email: email.id)
+    await db.commit()
+    return emails
+
+
+async def settle_emails(sent: Sequence[int], failed: Sequence[Tuple[int, str, Optional[datetime]]],
+                        db: AsyncSession) -> None:
+    """
+    The function records the outcome of a claimed batch: one UPDATE for the sent emails and one executemany
+    UPDATE for the failed ones.
+
+    :param sent: Ids of the emails that were sent.
+    :type sent: Sequence[int]
+    :param failed: Ids of the emails that failed, with the error and when to retry, or None to give up.
+    :type failed: Sequence[tuple[int, str, datetime | None]]
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: None
+    :rtype: None
+    """
+    table = EmailOutbox.__table__
+    if sent:
+        await db.execute(
+            update(table).where(table.c.id.in_(sent)).values(status="sent", sent_at=datetime.utcnow(), last_error=None)
+        )
+    if failed:
+        await db.execute(
+            update(table).where(table.c.id == bindparam("email_id")),
+            [
+                dict(email_id=email_id, last_error=error[:1000], status="pending" if retry_at else "failed",
+                     next_attempt_at=retry_at or datetime.utcnow())
+                for email_id, error, retry_at in failed
+            ]
+        )
+    await db.commit()
@@ -1,34 +1,56 @@
 from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 from src.schemas import UserModel
+from src.services.cache import user_cache
 
 
-async def get_user_by_email(email: str, db: Session) -> User:
+async def get_user_by_email(email: str, db: AsyncSession) -> User:
     """
     The function returns a user by a provided email.
 
     :param email: An email to search for a user.
     :type email: str
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A user with the provided email or None if no user is found.
     :rtype: User | None
     """
-    return db.query(User).filter(User.email == email).first()
+    stmt = select(User).filter(User.email == email)
+    user = await db.execute(stmt)
+    return user.scalar_one_or_none()
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+def _insert(db: AsyncSession):
     """
-    The function creates a new user and assigns a Gravatar image if available.
+    The function returns the INSERT construct of the session's dialect, which supports ON CONFLICT.
+
+    :param db: A database session.
+    :type db: AsyncSession
+    :return: An ``insert`` function for PostgreSQL or SQLite.
+    """
+    return pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+
+async def create_user(body: UserModel, db: AsyncSession) -> User | None:
+    """
+    The function creates a new user and assigns a Gravatar image if available, with one
+    INSERT ... ON CONFLICT DO NOTHING RETURNING statement.
+
+    Nothing is committed if a user with the email already exists, so the caller can roll back whatever
+    else it added to the transaction.
 
     :param body: The user's data.
     :type body: UserModel
     :param db: A database session.
-    :type db: Session
-    :return: A created user.
-    :rtype: User
+    :type db: AsyncSession
+    :return: A created user or None if a user with the provided email already exists.
+    :rtype: User | None
+    :raises IntegrityError: If another unique constraint is violated.
     """
     avatar = None
     try:
@@ -36,61 +58,81 @@ async def create_user(body: UserModel, db: Session) -> User:
         avatar = g.get_image()
     except Exception as e:
         print(e)
-    new_user = User(**body.dict(), avatar=avatar)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    stmt = (
+        _insert(db)(User)
+        .values(**body.model_dump(), avatar=avatar)
+        .on_conflict_do_nothing(index_elements=["email"])
+        .returning(User)
+    )
+    new_user = (await db.execute(stmt)).scalar_one_or_none()
+    if new_user is not None:
+        await db.commit()
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_password(user: User, password: str, db: AsyncSession) -> None:
     """
-    The function updates the refresh token for a provided user.
+    The function replaces the password hash of a provided user, e.g. after rehashing it with a new cost factor.
 
-    :param user: The user to update the token for.
+    :param user: The user to update the password for.
     :type user: User
-    :param token: A new refresh token or None to remove it.
-    :type token: str | None
+    :param password: The new password hash.
+    :type password: str
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: None
     :rtype: None
     """
-    user.refresh_token = token
-    db.commit()
+    user.password = password
+    await db.commit()
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> User | None:
     """
-    The function confirms the email of a user.
+    The function confirms the email of a user with one UPDATE ... RETURNING statement.
 
     :param email: The email to confirm for a user.
     :type email: str
     :param db: A database session.
-    :type db: Session
-    :return: None
-    :rtype: None
+    :type db: AsyncSession
+    :return: The confirmed user or None if no unconfirmed user has the provided email.
+    :rtype: User | None
     """
-    user = await get_user_by_email(email, db)
-    user.confirmed = True
-    db.commit()
+    stmt = (
+        update(User)
+        .where(User.email == email, User.confirmed.isnot(True))
+        .values(confirmed=True)
+        .returning(User)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    user = (await db.execute(stmt)).scalar_one_or_none()
+    if user is not None:
+        await db.commit()
+        await user_cache.invalidate(email)
+    return user
 
 
-async def update_avatar(email, url: str, db: Session) -> User:
+async def update_avatar(user: User, url: str, db: AsyncSession) -> User | None:
     """
-    The function updates the avatar URL for a user by their email.
+    The function updates the avatar URL of a user with one UPDATE ... RETURNING statement.
 
-    :param email: The email of the user to update the avatar for.
-    :type email: str
+    :param user: The user to update the avatar for.
+    :type user: User
     :param url: The new avatar URL.
     :type url: str
     :param db: A database session.
-    :type db: Session
-    :return: The updated user.
-    :rtype: User
+    :type db: AsyncSession
+    :return: The updated user or None if the user no longer exists.
+    :rtype: User | None
     """
-    user = await get_user_by_email(email, db)
-    user.avatar = url
-    db.commit()
-    return user
-
+    stmt = (
+        update(User)
+        .where(User.id == user.id)
+        .values(avatar=url)
+        .returning(User)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    updated = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    await user_cache.invalidate(user.email)
+    return updated
@@ -1,14 +1,16 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 from src.repository import users as repository_users
 from src.services.auth import auth_service
-from src.services.email import send_email
+from src.services.email import queue_confirmation_email
+from src.services.refresh_tokens import RefreshTokenStore, get_refresh_token_store
 
 
 router = APIRouter(prefix='/auth', tags=["auth"])
@@ -16,39 +18,44 @@ security = HTTPBearer()
 
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, request: Request, db: AsyncSession = Depends(get_db)):
     """
-    Registers a new user, hashes their password, and sends a confirmation email.
+    Registers a new user, hashes their password, and queues a confirmation email.
 
     :param body: User information for signup.
     :type body: UserModel
-    :param background_tasks: FastAPI background tasks for email sending.
-    :type background_tasks: BackgroundTasks
     :param request: The current request to extract the base URL for the email link.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A message confirming user creation and email sent.
     :rtype: dict
     """
-    exist_user = await repository_users.get_user_by_email(body.email, db)
-    if exist_user:
+    body.password = await auth_service.get_password_hash(body.password)
+    # Queued in the transaction that creates the user
+    queue_confirmation_email(body.email, body.username, request.base_url, db)
+    try:
+        new_user = await repository_users.create_user(body, db)
+    except IntegrityError:
+        new_user = None
+    if new_user is None:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
     return {"user": new_user, "detail": "User successfully created. Check your email for confirmation."}
 
 
 @router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db),
+                tokens: RefreshTokenStore = Depends(get_refresh_token_store)):
     """
-    Authenticates a user and returns an access token and refresh token.
+    Authenticates a user and returns an access token and a refresh token starting a new session.
 
     :param body: The login credentials (username and password).
     :type body: OAuth2PasswordRequestForm
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param tokens: The refresh token store.
+    :type tokens: RefreshTokenStore
     :return: Access and refresh tokens.
     :rtype: dict
     """
@@ -57,83 +64,86 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_and_update_password(body.password, user.password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
+    if new_hash:
+        await repository_users.update_password(user, new_hash, db)
     # Generate JWT
     access_token = await auth_service.create_access_token(data={"sub": user.email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repository_users.update_token(user, refresh_token, db)
+    refresh_token = await tokens.issue(user.email)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security),
+                        db: AsyncSession = Depends(get_db),
+                        tokens: RefreshTokenStore = Depends(get_refresh_token_store)):
     """
-    Refreshes an access token using the provided refresh token.
+    Refreshes an access token using the provided refresh token, which is rotated. Reusing a rotated
+    refresh token revokes the session it belongs to.
 
     :param credentials: The refresh token credentials.
     :type credentials: HTTPAuthorizationCredentials
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param tokens: The refresh token store.
+    :type tokens: RefreshTokenStore
     :return: New access and refresh tokens.
     :rtype: dict
     """
-    token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
+    claims = await auth_service.decode_refresh_token(credentials.credentials)
+    email = claims["sub"]
     user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
+    if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
+    refresh_token = await tokens.rotate(claims)
     access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repository_users.update_token(user, refresh_token, db)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     Confirms a user's email using a token sent via email.
 
     :param token: The token sent to the user's email.
     :type token: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A message confirming the email.
     :rtype: dict
     """
     email = await auth_service.get_email_from_token(token)
-    user = await repository_users.get_user_by_email(email, db)
-    if user is None:
+    if await repository_users.confirmed_email(email, db):
+        return {"message": "Email confirmed"}
+    # Nothing was updated: the email is either unknown or already confirmed
+    if await repository_users.get_user_by_email(email, db) is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Verification error")
-    if user.confirmed:
-        return {"message": "Your email is already confirmed"}
-    await repository_users.confirmed_email(email, db)
-    return {"message": "Email confirmed"}
+    return {"message": "Your email is already confirmed"}
 
 
 @router.post('/request_email')
-async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+async def request_email(body: RequestEmail, request: Request, db: AsyncSession = Depends(get_db)):
     """
-    Resends the confirmation email to the user.
+    Queues the confirmation email for the user again.
 
     :param body: The request body containing the user's email.
     :type body: RequestEmail
-    :param background_tasks: FastAPI background tasks for sending the email.
-    :type background_tasks: BackgroundTasks
     :param request: The current request to extract the base URL for the email link.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A message indicating that the email has been resent.
     :rtype: dict
     """
     user = await repository_users.get_user_by_email(body.email, db)
 
+    if user is None:
+        return {"message": "Check your email for confirmation."}
     if user.confirmed:
         return {"message": "Your email is already confirmed."}
-    if user:
-        background_tasks.add_task(send_email, user.email, user.username, request.base_url)
+    queue_confirmation_email(user.email, user.username, request.base_url, db)
+    await db.commit()
     return {"message": "Check your email for confirmation."}
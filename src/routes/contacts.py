@@ -1,122 +1,489 @@
-from typing import List, Optional
+from datetime import date
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Depends, status, Query
-from fastapi_limiter.depends import RateLimiter
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Header, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from src.database.db import get_db
-from src.schemas import ContactCreate, ContactUpdate, ContactResponse
+from src.database.db import get_db, get_session_maker
+from src.schemas import (BatchRequest, BatchResponse, ContactCreate, ContactUpdate, ContactPatch, ContactResponse,
+                         ContactOrder, ExportFormat, ImportReport, ImportRowError, contact_fields_model,
+                         parse_contact_fields)
 from src.repository import contacts as repository_contacts
 
 from src.database.models import User
 from src.services.auth import auth_service
+from src.services.cache import CachedResponse, response_cache
+from src.services.contacts_export import EXPORTERS, iter_chunks
+from src.services.contacts_import import RecordTooLong, iter_csv, iter_ndjson
+from src.services.etag import collection_etag, contact_etag, etag_matches
+from src.services.rate_limit import RateLimit
+from src.conf.config import settings
 
 router = APIRouter(prefix='/contacts', tags=["contacts"])
 
+FIELDS_DESCRIPTION = "Comma-separated contact fields to return, e.g. id,first_name,last_name,phone"
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parses a ``fields`` query parameter, rejecting unknown field names with HTTP 400.
+
+    :param fields: The ``fields`` query parameter.
+    :type fields: str | None
+    :return: The requested contact fields, or None for all of them.
+    :rtype: Tuple[str, ...] | None
+    """
+    try:
+        return parse_contact_fields(fields)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+
+
+# PostgreSQL names the violated constraint, SQLite only its columns
+EMAIL_CONFLICT_MARKERS = ("uq_contacts_user_id_email", "contacts.user_id, contacts.email")
+
+
+def _is_email_conflict(err: IntegrityError) -> bool:
+    """
+    Checks whether an integrity error is a violation of the unique email of a user's contacts.
+
+    :param err: The error raised by a contact write.
+    :type err: IntegrityError
+    :return: True if the user already has a contact with the email.
+    :rtype: bool
+    """
+    message = str(err.orig)
+    return any(marker in message for marker in EMAIL_CONFLICT_MARKERS)
+
+
+@lru_cache(maxsize=None)
+def _contact_list(fields: Optional[Tuple[str, ...]]) -> TypeAdapter:
+    return TypeAdapter(List[ContactResponse if fields is None else contact_fields_model(fields)])
+
+
+def _dump_contacts(contacts: list, fields: Optional[Tuple[str, ...]]) -> bytes:
+    """
+    Serialises contacts, or rows of their requested columns, to JSON with only the requested fields.
+
+    :param contacts: Contacts or rows returned by the repository.
+    :type contacts: list
+    :param fields: The requested contact fields, or None for all of them.
+    :type fields: Tuple[str, ...] | None
+    :return: A JSON array.
+    :rtype: bytes
+    """
+    adapter = _contact_list(fields)
+    return adapter.dump_json(adapter.validate_python(contacts, from_attributes=True))
+
+
+def _no_cache(cache_control: Optional[str]) -> bool:
+    """
+    Checks whether a ``Cache-Control`` request header asks to bypass cached responses.
+
+    :param cache_control: The ``Cache-Control`` request header, if any.
+    :type cache_control: str | None
+    :return: True for ``no-cache`` or ``no-store``.
+    :rtype: bool
+    """
+    directives = {directive.strip().lower() for directive in (cache_control or "").split(",")}
+    return bool(directives & {"no-cache", "no-store"})
+
 
 @router.get("/",
             response_model=List[ContactResponse],
             description='No more than 12 requests per minute',
-            dependencies=[Depends(RateLimiter(times=12, seconds=60))])
+            dependencies=[Depends(RateLimit("contacts_list"))])
 async def read_contacts(
-        skip: int = 0,
-        limit: int = 100,
-        db: Session = Depends(get_db),
+        request: Request,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=settings.contacts_max_page_size),
+        cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of a previous page"),
+        order: ContactOrder = Query(ContactOrder.id, description="Sort by id or by last and first name"),
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        exact: bool = Query(False, description="Count the contacts for X-Total-Count instead of using the counter"),
+        if_none_match: Optional[str] = Header(None),
+        cache_control: Optional[str] = Header(None),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user)
 ):
     """
     The function returns a paginated list of contacts for the current user.
 
+    A full page carries an ``X-Next-Cursor`` header; pass it back as ``cursor`` to fetch the next page.
+    Offset pagination with ``skip`` is kept for compatibility and is ignored when a cursor is given.
+
+    Every page carries an ``ETag`` derived from the version of the user's contacts collection; a request whose
+    ``If-None-Match`` still matches it gets an empty 304 response without the contacts being loaded.
+    Serialised pages are kept in the response cache until the user's contacts change;
+    ``Cache-Control: no-cache`` bypasses it.
+
+    ``X-Total-Count`` carries the number of the user's contacts from a counter kept by every write, read along
+    with the collection version; ``exact=true`` counts the rows over the ``(user_id, id)`` index instead.
+
+    :param request: The incoming request, whose query parameters are part of the ETag and the cache key.
+    :type request: Request
     :param skip: The number of contacts to skip.
     :type skip: int
     :param limit: The maximum number of contacts to return.
     :type limit: int
+    :param cursor: The cursor of the page to return.
+    :type cursor: str | None
+    :param order: The sort order of the contacts.
+    :type order: ContactOrder
+    :param fields: The contact fields to return; only their columns are loaded.
+    :type fields: str | None
+    :param exact: Whether to count the contacts rather than read the counter.
+    :type exact: bool
+    :param if_none_match: The ETag of the page the client holds.
+    :type if_none_match: str | None
+    :param cache_control: The ``Cache-Control`` request header.
+    :type cache_control: str | None
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: A list of contacts.
     :rtype: List[ContactResponse]
     """
-    contacts = await repository_contacts.get_contacts(skip, limit, current_user, db)
-    return contacts
+    fields = _parse_fields(fields)
+    key = response_cache.key(current_user.id, "contacts", request.query_params)
+    generation, cached = await response_cache.get(current_user.id, key, bypass=_no_cache(cache_control))
+    if cached is None:
+        # Read the version before the rows: a write in between then yields a stale tag, never a stale 304
+        version, total = await repository_contacts.get_collection_stats(current_user, db)
+        etag = collection_etag(current_user.id, version, request.query_params)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        try:
+            contacts = await repository_contacts.get_contacts(skip, limit, current_user, db, cursor, order, fields)
+        except ValueError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+        if exact:
+            total = await repository_contacts.count_contacts(current_user, db)
+        headers = {"ETag": etag, "X-Total-Count": str(total)}
+        if len(contacts) == limit:
+            headers["X-Next-Cursor"] = repository_contacts.encode_cursor(contacts[-1], order)
+        cached = CachedResponse(headers, _dump_contacts(contacts, fields))
+        await response_cache.set(key, generation, cached)
+    elif etag_matches(if_none_match, cached.headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": cached.headers["ETag"]})
+    return Response(content=cached.body, media_type="application/json", headers=cached.headers)
 
 
-@router.get("/search", response_model=List[ContactResponse])
+@router.get("/search", response_model=List[ContactResponse],
+            description='No more than 60 requests per minute',
+            dependencies=[Depends(RateLimit("contacts_search"))])
 async def search_contacts(
+        q: Optional[str] = Query(None, min_length=1, max_length=200,
+                                 description="Full-text query over names, email, phone and additional info"),
         first_name: Optional[str] = Query(None, description="First name to search"),
         last_name: Optional[str] = Query(None, description="Last name to search"),
         email: Optional[str] = Query(None, description="Email to search"),
-        db: Session = Depends(get_db),
+        limit: int = Query(20, ge=1, le=settings.contacts_max_page_size),
+        cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of a previous page"),
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user)
 ):
     """
-    The function searches for contacts by first name, last name, or email for the current user.
+    The function searches for contacts of the current user.
+
+    With ``q`` it runs a ranked full-text search over all the contact fields and returns the best matches
+    first, ``limit`` at a time; a full page carries an ``X-Next-Cursor`` header for the next one.
+    Otherwise it returns all the contacts matching first name, last name and email substrings.
 
+    :param q: Full-text search query.
+    :type q: str | None
     :param first_name: First name to search.
     :type first_name: str | None
     :param last_name: Last name to search.
     :type last_name: str | None
     :param email: Email to search.
     :type email: str | None
+    :param limit: The maximum number of contacts to return for a full-text search.
+    :type limit: int
+    :param cursor: The cursor of the full-text search page to return.
+    :type cursor: str | None
+    :param fields: The contact fields to return; only their columns are loaded.
+    :type fields: str | None
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: A list of contacts matching the search criteria.
     :rtype: List[ContactResponse]
     """
-    contacts = await repository_contacts.search_contacts(db, first_name, last_name, email,  current_user)
-    return contacts
+    fields = _parse_fields(fields)
+    headers = {}
+    if q:
+        try:
+            contacts, next_cursor = await repository_contacts.full_text_search(q, limit, current_user, db, cursor,
+                                                                               fields)
+        except ValueError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+    else:
+        contacts = await repository_contacts.search_contacts(db, first_name, last_name, email,  current_user, fields)
+    return Response(content=_dump_contacts(contacts, fields), media_type="application/json", headers=headers)
 
 
-@router.get("/birthdays", response_model=List[ContactResponse])
+@router.get("/birthdays", response_model=List[ContactResponse],
+            description='No more than 60 requests per minute',
+            dependencies=[Depends(RateLimit("contacts_birthdays"))])
 async def get_upcoming_birthdays(
-    days: int = Query(default=7),
-    db: Session = Depends(get_db),
+    request: Request,
+    days: int = Query(default=7, ge=0, le=366),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    cache_control: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
 ):
     """
     The function returns contacts with upcoming birthdays within the specified number of days.
 
+    Serialised results are kept in the response cache until the user's contacts change or the date does;
+    ``Cache-Control: no-cache`` bypasses it.
+
+    :param request: The incoming request, whose query parameters are part of the cache key.
+    :type request: Request
     :param days: Number of days to look ahead for upcoming birthdays (default is 7 days).
     :type days: int
+    :param fields: The contact fields to return; only their columns are loaded.
+    :type fields: str | None
+    :param cache_control: The ``Cache-Control`` request header.
+    :type cache_control: str | None
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: A list of contacts with upcoming birthdays.
     :rtype: List[ContactResponse]
     """
-    contacts = repository_contacts.get_upcoming_birthdays(db,  current_user, days)
-    return contacts
+    fields = _parse_fields(fields)
+    today = date.today()
+    key = response_cache.key(current_user.id, f"birthdays:{today.isoformat()}", request.query_params)
+    generation, cached = await response_cache.get(current_user.id, key, bypass=_no_cache(cache_control))
+    if cached is None:
+        contacts = await repository_contacts.get_upcoming_birthdays(db,  current_user, days, today, fields)
+        cached = CachedResponse({}, _dump_contacts(contacts, fields))
+        await response_cache.set(key, generation, cached)
+    return Response(content=cached.body, media_type="application/json", headers=cached.headers)
+
+
+IMPORT_PARSERS = {
+    "text/csv": iter_csv,
+    "application/x-ndjson": iter_ndjson,
+    "application/ndjson": iter_ndjson,
+}
+
+
+def _add_import_error(report: ImportReport, line: int, detail: str) -> None:
+    report.failed += 1
+    if len(report.errors) < settings.contacts_import_max_errors:
+        report.errors.append(ImportRowError(line=line, detail=detail))
+
+
+async def _import_batch(batch: list, report: ImportReport, user: User, db: AsyncSession) -> None:
+    bodies, lines = {}, {}
+    for line, body in batch:
+        if body.email in bodies:
+            _add_import_error(report, line, "Duplicate email in the import")
+            continue
+        bodies[body.email], lines[body.email] = body, line
+    inserted = await repository_contacts.import_contacts(list(bodies.values()), user, db)
+    report.imported += len(inserted)
+    for email in sorted(bodies.keys() - inserted, key=lines.get):
+        _add_import_error(report, lines[email], "Contact with this email already exists")
+    batch.clear()
+
+
+@router.post("/import",
+             response_model=ImportReport,
+             description='No more than 2 requests per minute',
+             dependencies=[Depends(RateLimit("contacts_import"))])
+async def import_contacts(
+        request: Request,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    The function imports contacts for the current user from a CSV or NDJSON request body.
+
+    The body is parsed while it is received and valid rows are inserted in batches, so the upload is never
+    held in memory. CSV needs a header row with the contact field names. Rows that fail validation or whose
+    email the user already has are skipped and reported with their line numbers. A record longer than 64 KiB
+    aborts the import with 413; batches inserted before it stay imported.
+
+    :param request: The incoming request with a ``text/csv`` or ``application/x-ndjson`` body.
+    :type request: Request
+    :param db: A database session.
+    :type db: AsyncSession
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :return: The number of imported and failed rows and the first errors.
+    :rtype: ImportReport
+    :raises HTTPException: 415 for an unsupported content type, 413 for a record that is too long.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    parser = IMPORT_PARSERS.get(media_type)
+    if parser is None:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Send text/csv or application/x-ndjson")
+
+    report = ImportReport()
+    batch = []
+    try:
+        async for line, record in parser(request.stream()):
+            if isinstance(record, ValueError):
+                _add_import_error(report, line, str(record))
+                continue
+            try:
+                batch.append((line, ContactCreate.model_validate(record)))
+            except ValidationError as err:
+                detail = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in err.errors())
+                _add_import_error(report, line, detail)
+                continue
+            if len(batch) >= settings.contacts_import_batch_size:
+                await _import_batch(batch, report, current_user, db)
+    except RecordTooLong as err:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(err))
+    await _import_batch(batch, report, current_user, db)
+    return report
+
+
+@router.get("/export",
+            response_class=StreamingResponse,
+            description='No more than 2 requests per minute',
+            dependencies=[Depends(RateLimit("contacts_export"))])
+async def export_contacts(
+        format: ExportFormat = Query(ExportFormat.ndjson, description="Export as NDJSON, CSV or vCard"),
+        first_name: Optional[str] = Query(None, description="First name to search"),
+        last_name: Optional[str] = Query(None, description="Last name to search"),
+        email: Optional[str] = Query(None, description="Email to search"),
+        session_maker: async_sessionmaker = Depends(get_session_maker),
+        current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    The function streams all contacts of the current user, optionally filtered like the search, as a file.
+
+    Contacts are read from a server-side cursor and encoded while the response is sent, so memory use does
+    not depend on the number of contacts. The stream uses its own database session, since the request's
+    session is closed once the handler returns.
+
+    :param format: The export format.
+    :type format: ExportFormat
+    :param first_name: First name to search.
+    :type first_name: str | None
+    :param last_name: Last name to search.
+    :type last_name: str | None
+    :param email: Email to search.
+    :type email: str | None
+    :param session_maker: The database session factory.
+    :type session_maker: async_sessionmaker
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :return: The streamed export.
+    :rtype: StreamingResponse
+    """
+    exporter = EXPORTERS[format]
+
+    async def body():
+        async with session_maker() as db:
+            rows = repository_contacts.stream_contacts(current_user, db, first_name, last_name, email,
+                                                       batch_size=settings.contacts_export_batch_size)
+            async for chunk in iter_chunks(exporter.encode(rows)):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=exporter.media_type,
+        headers={"Content-Disposition": f'attachment; filename="contacts.{exporter.extension}"'},
+    )
+
+
+@router.post("/batch",
+             response_model=BatchResponse,
+             description='No more than 12 requests per minute',
+             dependencies=[Depends(RateLimit("contacts_batch"))])
+async def batch_contacts(
+        body: BatchRequest,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    The function applies a list of create, update and delete operations to the current user's contacts
+    in one transaction.
+
+    Every operation gets its own result with an HTTP-like status: 201 for a created contact, 200 for an updated
+    one, 204 for a deleted one, 404 when the contact doesn't exist and 409 when its email is taken or the batch
+    already changes the contact.
+
+    :param body: The operations to apply.
+    :type body: BatchRequest
+    :param db: A database session.
+    :type db: AsyncSession
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :return: The results of the operations, in order.
+    :rtype: BatchResponse
+    """
+    if len(body.operations) > settings.contacts_batch_max_size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"A batch has at most {settings.contacts_batch_max_size} operations")
+    try:
+        results = await repository_contacts.apply_batch(body.operations, current_user, db)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="The batch conflicts with a concurrent change, nothing was applied")
+    return BatchResponse(results=results)
 
 
 @router.get("/{contact_id}",
             response_model=ContactResponse,
             description='No more than 12 requests per minute',
-            dependencies=[Depends(RateLimiter(times=12, seconds=60))]
+            dependencies=[Depends(RateLimit("contacts_read"))]
             )
 async def read_contact(
         contact_id: int,
-        db: Session = Depends(get_db),
+        response: Response,
+        if_none_match: Optional[str] = Header(None),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user)
 ):
     """
     The function returns a contact by ID for the current user.
 
+    The contact carries an ``ETag`` derived from its version. When ``If-None-Match`` is sent, only the version
+    is looked up first, and an empty 304 response is returned if the client's copy is current.
+
     :param contact_id: The contact ID to retrieve.
     :type contact_id: int
+    :param response: The outgoing response, used to set the ``ETag`` header.
+    :type response: Response
+    :param if_none_match: The ETag of the contact the client holds.
+    :type if_none_match: str | None
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The contact with the provided contact ID or raises HTTP 404 if not found.
     :rtype: ContactResponse
     """
+    if if_none_match:
+        version = await repository_contacts.get_contact_version(contact_id, current_user, db)
+        etag = contact_etag(contact_id, version)
+        if version is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
     contact = await repository_contacts.get_contact(contact_id,  current_user, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    response.headers["ETag"] = contact_etag(contact.id, contact.version)
     return contact
 
 
@@ -124,10 +491,10 @@ async def read_contact(
              response_model=ContactResponse,
              status_code=status.HTTP_201_CREATED,
              description='No more than 12 requests per minute',
-             dependencies=[Depends(RateLimiter(times=12, seconds=60))])
+             dependencies=[Depends(RateLimit("contacts_create"))])
 async def create_contact(
         body: ContactCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user)
 ):
     """
@@ -136,20 +503,28 @@ async def create_contact(
     :param body: The contact's creation data.
     :type body: ContactCreate
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
-    :return: The newly created contact.
+    :return: The newly created contact or raises HTTP 409 if the user has a contact with its email.
     :rtype: ContactResponse
     """
-    return await repository_contacts.create_contact(body,  current_user, db)
+    try:
+        return await repository_contacts.create_contact(body,  current_user, db)
+    except IntegrityError as err:
+        await db.rollback()
+        if not _is_email_conflict(err):
+            raise
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email already exists")
 
 
-@router.put("/{contact_id}", response_model=ContactResponse)
+@router.put("/{contact_id}", response_model=ContactResponse,
+            description='No more than 60 requests per minute',
+            dependencies=[Depends(RateLimit("contacts_update"))])
 async def update_contact(
         body: ContactUpdate,
         contact_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user)
 ):
     """
@@ -160,22 +535,65 @@ async def update_contact(
     :param contact_id: The contact ID to update.
     :type contact_id: int
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :return: The updated contact or raises HTTP 404 if not found, or HTTP 409 if its new email is taken.
+    :rtype: ContactResponse
+    """
+    try:
+        contact = await repository_contacts.update_contact(contact_id, body,  current_user, db)
+    except IntegrityError as err:
+        await db.rollback()
+        if not _is_email_conflict(err):
+            raise
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email already exists")
+    if contact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    return contact
+
+
+@router.patch("/{contact_id}", response_model=ContactResponse,
+              description='No more than 60 requests per minute',
+              dependencies=[Depends(RateLimit("contacts_patch"))])
+async def patch_contact(
+        body: ContactPatch,
+        contact_id: int,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(auth_service.get_current_user)
+):
+    """
+    The function changes only the provided fields of an existing contact by ID for the current user.
+
+    :param body: The contact fields to change.
+    :type body: ContactPatch
+    :param contact_id: The contact ID to update.
+    :type contact_id: int
+    :param db: A database session.
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
-    :return: The updated contact or raises HTTP 404 if not found.
+    :return: The updated contact or raises HTTP 404 if not found, or HTTP 409 if its new email is taken.
     :rtype: ContactResponse
     """
-    contact = await repository_contacts.update_contact(contact_id, body,  current_user, db)
+    try:
+        contact = await repository_contacts.patch_contact(contact_id, body, current_user, db)
+    except IntegrityError as err:
+        await db.rollback()
+        if not _is_email_conflict(err):
+            raise
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email already exists")
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
     return contact
 
 
-@router.delete("/{contact_id}", response_model=ContactResponse)
+@router.delete("/{contact_id}", response_model=ContactResponse,
+               description='No more than 60 requests per minute',
+               dependencies=[Depends(RateLimit("contacts_delete"))])
 async def remove_contact(
         contact_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user)
 ):
     """
@@ -184,7 +602,7 @@ async def remove_contact(
     :param contact_id: The contact ID to remove.
     :type contact_id: int
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user.
     :type current_user: User
     :return: The removed contact or raises HTTP 404 if not found.
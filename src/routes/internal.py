@@ -0,0 +1,65 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from src.conf.config import settings
+from src.database.db import engine
+from src.database.pool import pool_status
+from src.services.cache import response_cache, user_cache
+from src.services.rate_limit import rate_limiter
+
+
+async def verify_internal_token(x_internal_token: Optional[str] = Header(None)):
+    """
+    Guards internal endpoints with ``settings.internal_api_token``. Without a configured token the
+    endpoints are disabled and answer 404.
+
+    :param x_internal_token: The value of the ``X-Internal-Token`` header.
+    :type x_internal_token: str | None
+    :raises HTTPException: 404 if no token is configured, 403 if the header doesn't match it.
+    :rtype: None
+    """
+    if not settings.internal_api_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_internal_token or not hmac.compare_digest(x_internal_token.encode(),
+                                                       settings.internal_api_token.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+router = APIRouter(prefix="/internal", tags=["internal"], include_in_schema=False,
+                   dependencies=[Depends(verify_internal_token)])
+
+
+@router.get("/pool")
+async def read_pool_status():
+    """
+    The function returns connection pool statistics of the current worker process.
+
+    :return: Pool size, checked-out and overflow connections, checkout wait time and connect latency histograms.
+    :rtype: dict
+    """
+    return pool_status(engine.sync_engine.pool)
+
+
+@router.get("/cache")
+async def read_cache_stats():
+    """
+    The function returns user and response cache hit and miss counters of the current worker process.
+
+    :return: Local and Redis hits, misses and the local tier size of the user cache, and hits, misses,
+        bypasses and the hit ratio of the response cache.
+    :rtype: dict
+    """
+    return {"user": user_cache.stats(), "responses": response_cache.stats()}
+
+
+@router.get("/rate-limit")
+async def read_rate_limit_stats():
+    """
+    The function returns rate limiter counters of the current worker process.
+
+    :return: Requests admitted from local leases, Redis round trips, rejected requests and the number of leases.
+    :rtype: dict
+    """
+    return rate_limiter.stats()
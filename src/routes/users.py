@@ -1,13 +1,11 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.database.models import User
 from src.repository import users as repository_users
 from src.services.auth import auth_service
-from src.conf.config import settings
+from src.services.avatars import AvatarError, AvatarStorage, AvatarTooLarge, get_avatar_storage, process_avatar
 from src.schemas import UserDb
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -28,28 +26,32 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 
 @router.patch('/avatar', response_model=UserDb)
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+                             db: AsyncSession = Depends(get_db),
+                             storage: AvatarStorage = Depends(get_avatar_storage)):
     """
-    The function updates the current user's avatar by uploading a new image to Cloudinary.
+    The function updates the current user's avatar with an uploaded image, cropped to a square and stored
+    in the configured avatar storage. Uploading the current avatar again changes nothing.
 
     :param file: The uploaded avatar file.
     :type file: UploadFile
     :param current_user: The current authenticated user.
     :type current_user: User
     :param db: A database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param storage: The avatar storage backend.
+    :type storage: AvatarStorage
     :return: The updated user information with the new avatar URL.
     :rtype: UserDb
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'NotesApp/{current_user.username}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
-    user = await repository_users.update_avatar(current_user.email, src_url, db)
+    try:
+        url = await process_avatar(file, storage, current_user.avatar)
+    except AvatarTooLarge as err:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(err))
+    except AvatarError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    if url == current_user.avatar:
+        return current_user
+    user = await repository_users.update_avatar(current_user, url, db)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
     return user
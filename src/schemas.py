@@ -1,6 +1,8 @@
 from datetime import datetime, date
-from typing import List, Optional
-from pydantic import BaseModel, Field, EmailStr
+from enum import Enum
+from functools import lru_cache
+from typing import Annotated, List, Literal, Optional, Tuple, Type, Union
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, create_model, field_validator
 
 
 class ContactBase(BaseModel):
@@ -24,6 +26,40 @@ class ContactUpdate(BaseModel):
     birthday: Optional[date]
     additional_info: Optional[str] = Field(None, max_length=350)
 
+    @field_validator("first_name", "last_name", "email", "phone", "birthday")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+
+class ContactPatch(BaseModel):
+    first_name: Optional[str] = Field(None, max_length=50)
+    last_name: Optional[str] = Field(None, max_length=50)
+    email: Optional[str] = Field(None, max_length=320)
+    phone: Optional[str] = Field(None, max_length=15)
+    birthday: Optional[date] = None
+    additional_info: Optional[str] = Field(None, max_length=350)
+
+    @field_validator("first_name", "last_name", "email", "phone", "birthday")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
+
+class ContactOrder(str, Enum):
+    id = "id"
+    name = "name"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+    vcard = "vcard"
+
 
 class ContactResponse(ContactBase):
     id: int
@@ -33,6 +69,90 @@ class ContactResponse(ContactBase):
         orm_mode = True
 
 
+CONTACT_FIELDS = tuple(ContactResponse.model_fields)
+
+
+def parse_contact_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parses a comma-separated ``fields`` parameter into contact field names, in ``ContactResponse`` order.
+
+    :param value: The parameter value, e.g. ``id,first_name,phone``.
+    :type value: str | None
+    :return: The requested field names, or None to return every field.
+    :rtype: Tuple[str, ...] | None
+    :raises ValueError: If a name is not a contact field.
+    """
+    if not value:
+        return None
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = names.difference(CONTACT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in CONTACT_FIELDS if name in names) or None
+
+
+@lru_cache(maxsize=None)
+def contact_fields_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Builds a reduced ``ContactResponse`` with only the requested fields.
+
+    :param fields: Field names returned by ``parse_contact_fields``.
+    :type fields: Tuple[str, ...]
+    :return: A response model reading its fields from attributes.
+    :rtype: Type[BaseModel]
+    """
+    return create_model(
+        "ContactFields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (ContactResponse.model_fields[name].annotation, ...) for name in fields},
+    )
+
+
+class ImportRowError(BaseModel):
+    line: int
+    detail: str
+
+
+class ImportReport(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
+
+class BatchCreate(BaseModel):
+    op: Literal["create"]
+    contact: ContactCreate
+
+
+class BatchUpdate(BaseModel):
+    op: Literal["update"]
+    id: int
+    contact: ContactCreate
+
+
+class BatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+
+BatchOperation = Annotated[Union[BatchCreate, BatchUpdate, BatchDelete], Field(discriminator="op")]
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1)
+
+
+class BatchItemResult(BaseModel):
+    status: int
+    id: Optional[int] = None
+    contact: Optional[ContactResponse] = None
+    detail: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+
+
 class UserModel(BaseModel):
     username: str = Field(min_length=5, max_length=100)
     email: str
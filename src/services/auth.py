@@ -1,34 +1,58 @@
-from typing import Optional
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
 
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.repository import users as repository_users
 
 from src.conf.config import settings
-
-import pickle
-import redis
+from src.services.cache import LocalTTLCache, user_cache
 
 
 class Auth:
     """
     Auth class handles password hashing, JWT token generation, decoding, and user authentication.
     """
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+    # bcrypt releases the GIL, so a small dedicated pool keeps hashing off the event loop and caps its CPU use
+    hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+    # The executor queues without limit, so hashing jobs are counted and shed beyond this many per process
+    hash_max_pending = settings.password_hash_workers + settings.password_hash_queue_size
+    hash_pending = 0
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    token_cache = LocalTTLCache(settings.token_cache_size, ttl=0)
+    revoked_tokens = LocalTTLCache(settings.token_cache_size, ttl=0)
+
+    async def _run_hasher(self, func, *args):
+        """
+        Runs a hashing function in the password hashing pool, unless the pool is already saturated.
+
+        :raises HTTPException: 503 if ``hash_max_pending`` jobs are already running or waiting.
+        """
+        if self.hash_pending >= self.hash_max_pending:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Too many concurrent sign-ins, try again shortly",
+                                headers={"Retry-After": "1"})
+        self.hash_pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.hash_executor, func, *args)
+        finally:
+            self.hash_pending -= 1
 
-    def verify_password(self, plain_password, hashed_password):
+    async def verify_password(self, plain_password, hashed_password):
         """
-        Verifies a plain password against its hashed version.
+        Verifies a plain password against its hashed version in the password hashing pool.
 
         :param plain_password: The plain password to verify.
         :type plain_password: str
@@ -37,18 +61,31 @@ class Auth:
         :return: True if the password matches, False otherwise.
         :rtype: bool
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return await self._run_hasher(self.pwd_context.verify, plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
+    async def verify_and_update_password(self, plain_password: str, hashed_password: str):
         """
-        Hashes a plain password using bcrypt.
+        Verifies a plain password and rehashes it if its hash uses an outdated cost factor.
+
+        :param plain_password: The plain password to verify.
+        :type plain_password: str
+        :param hashed_password: The hashed password to compare.
+        :type hashed_password: str
+        :return: Whether the password matches and a new hash to store, or None if the hash is up to date.
+        :rtype: tuple[bool, str | None]
+        """
+        return await self._run_hasher(self.pwd_context.verify_and_update, plain_password, hashed_password)
+
+    async def get_password_hash(self, password: str):
+        """
+        Hashes a plain password using bcrypt in the password hashing pool.
 
         :param password: The plain password to hash.
         :type password: str
         :return: The hashed password.
         :rtype: str
         """
-        return self.pwd_context.hash(password)
+        return await self._run_hasher(self.pwd_context.hash, password)
 
     # define a function to generate a new access token
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
@@ -94,31 +131,74 @@ class Auth:
 
     async def decode_refresh_token(self, refresh_token: str):
         """
-        Decodes a refresh token and extracts the email (subject) if valid.
+        Decodes a refresh token and returns its claims if valid.
 
         :param refresh_token: The refresh token to decode.
         :type refresh_token: str
-        :return: The email from the decoded token.
-        :rtype: str
+        :return: The claims of the token: the email (subject), and the token family and id.
+        :rtype: dict
         :raises HTTPException: If the token is invalid or has an invalid scope.
         """
         try:
             payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             if payload['scope'] == 'refresh_token':
-                email = payload['sub']
-                return email
+                return payload
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid scope for token')
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    @staticmethod
+    def _token_key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def decode_access_token(self, token: str) -> dict:
+        """
+        Verifies a token and returns its claims, reusing claims verified earlier until the token expires.
+
+        Tokens are cached by their SHA-256 digest, so raw tokens are never kept in memory.
+
+        :param token: The JWT token to decode.
+        :type token: str
+        :return: The claims of the token.
+        :rtype: dict
+        :raises JWTError: If the token is invalid, expired or revoked.
+        """
+        key = self._token_key(token)
+        if self.revoked_tokens.get(key):
+            raise JWTError("Token has been revoked")
+        payload = self.token_cache.get(key)
+        if payload is None:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            ttl = payload.get("exp", 0) - time.time()
+            if ttl > 0:
+                self.token_cache.set(key, payload, ttl)
+        return payload
+
+    def revoke_token(self, token: str) -> None:
+        """
+        Revocation hook: evicts a token from the verified-token cache and rejects it until it expires.
+
+        :param token: The JWT token to revoke.
+        :type token: str
+        :rtype: None
+        """
+        key = self._token_key(token)
+        self.token_cache.pop(key)
+        try:
+            ttl = jwt.get_unverified_claims(token).get("exp", 0) - time.time()
+        except JWTError:
+            return
+        if ttl > 0:
+            self.revoked_tokens.set(key, True, ttl)
+
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
         """
         Gets the current authenticated user based on the access token.
 
         :param token: The JWT token from the OAuth2 scheme.
         :type token: str
         :param db: The database session.
-        :type db: Session
+        :type db: AsyncSession
         :return: The current authenticated user.
         :rtype: User
         :raises HTTPException: If credentials are invalid or user is not found.
@@ -131,7 +211,7 @@ class Auth:
 
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_access_token(token)
             if payload['scope'] == 'access_token':
                 email = payload["sub"]
                 if email is None:
@@ -141,15 +221,12 @@ class Auth:
         except JWTError as e:
             raise credentials_exception
 
-        user = self.r.get(f"user:{email}")
+        user = await user_cache.get(email)
         if user is None:
             user = await repository_users.get_user_by_email(email, db)
             if user is None:
                 raise credentials_exception
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
-        else:
-            user = pickle.loads(user)
+            await user_cache.set(user)
         return user
 
     def create_email_token(self, data: dict):
@@ -167,6 +244,23 @@ class Auth:
         token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
         return token
 
+    def create_email_tokens(self, emails: Sequence[str]) -> List[str]:
+        """
+        Generates email confirmation tokens for many recipients at once.
+
+        The tokens share their issue time and expiry, which are computed once per call. The tokens are identical
+        to the ones ``create_email_token`` issues at the same second.
+
+        :param emails: The recipients' email addresses.
+        :type emails: Sequence[str]
+        :return: The encoded email confirmation tokens, in the order of the emails.
+        :rtype: List[str]
+        """
+        issued_at = datetime.utcnow()
+        expire = issued_at + timedelta(days=7)
+        return [jwt.encode({"sub": email, "iat": issued_at, "exp": expire}, self.SECRET_KEY, algorithm=self.ALGORITHM)
+                for email in emails]
+
     async def get_email_from_token(self, token: str):
         """
         Extracts the email from an email confirmation token.
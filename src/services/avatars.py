@@ -0,0 +1,257 @@
+"""
+Avatars Module
+
+This module processes avatar uploads without blocking the event loop. The upload is read in chunks up to a
+size cap and hashed as it is read, the image is cropped and re-encoded to a square JPEG in a worker thread,
+and the result is stored under its content hash in a pluggable storage backend. Uploading the image the
+user already has skips processing and storage altogether.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from src.conf.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+
+
+class AvatarError(ValueError):
+    """
+    Raised for uploads that are not a supported image.
+    """
+
+
+class AvatarTooLarge(AvatarError):
+    """
+    Raised for uploads over ``settings.avatar_max_bytes``.
+    """
+
+
+async def read_upload(file: UploadFile, max_bytes: int) -> tuple[bytes, str]:
+    """
+    Reads an upload in chunks, stopping as soon as it exceeds ``max_bytes``, and hashes it on the way.
+
+    :param file: The uploaded file.
+    :type file: UploadFile
+    :param max_bytes: The largest accepted upload in bytes.
+    :type max_bytes: int
+    :return: The content of the upload and its SHA-256 hex digest.
+    :rtype: tuple[bytes, str]
+    :raises AvatarTooLarge: If the upload is larger than ``max_bytes``.
+    """
+    digest = hashlib.sha256()
+    chunks, size = [], 0
+    while chunk := await file.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise AvatarTooLarge(f"Avatar must not be larger than {max_bytes} bytes")
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+def normalise_image(data: bytes, size: int, max_pixels: int) -> bytes:
+    """
+    Crops an image to a centred square of ``size`` pixels and re-encodes it as a JPEG without metadata.
+
+    The EXIF orientation is applied first, so photos from phones are not stored sideways.
+
+    :param data: The uploaded image.
+    :type data: bytes
+    :param size: The width and height of the avatar in pixels.
+    :type size: int
+    :param max_pixels: The largest accepted image in pixels, checked before the image is decoded.
+    :type max_pixels: int
+    :return: The avatar as a JPEG.
+    :rtype: bytes
+    :raises AvatarError: If the data is not an image in an accepted format or is too large.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in ACCEPTED_FORMATS:
+                raise AvatarError(f"Unsupported image format: {image.format}")
+            if image.width * image.height > max_pixels:
+                raise AvatarError("Image dimensions are too large")
+            image.draft("RGB", (size, size))
+            image = ImageOps.exif_transpose(image)
+            avatar = ImageOps.fit(image.convert("RGB"), (size, size), Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as err:
+        raise AvatarError("Invalid image") from err
+    output = io.BytesIO()
+    avatar.save(output, format="JPEG", quality=85, optimize=True)
+    return output.getvalue()
+
+
+class AvatarStorage(ABC):
+    """
+    Base class of avatar storage backends. Avatars are stored under their content key, so a stored
+    avatar never changes and its URL can be cached forever.
+    """
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """
+        Returns the URL of a stored avatar.
+
+        :param key: The content key of the avatar.
+        :type key: str
+        :return: The URL of the avatar.
+        :rtype: str
+        """
+
+    @abstractmethod
+    async def save(self, key: str, data: bytes) -> str:
+        """
+        Stores an avatar unless it is already stored.
+
+        :param key: The content key of the avatar.
+        :type key: str
+        :param data: The avatar as a JPEG.
+        :type data: bytes
+        :return: The URL of the avatar.
+        :rtype: str
+        """
+
+
+class CloudinaryStorage(AvatarStorage):
+    """
+    Stores avatars in Cloudinary. The blocking SDK calls run in a worker thread.
+    """
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str, folder: str = "NotesApp/avatars"):
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+        self.folder = folder
+
+    def public_id(self, key: str) -> str:
+        return f"{self.folder}/{key}"
+
+    def url(self, key: str) -> str:
+        return cloudinary.CloudinaryImage(self.public_id(key)).build_url(format="jpg")
+
+    def _upload(self, key: str, data: bytes) -> None:
+        # Without overwrite, Cloudinary keeps an asset already stored under the key, e.g. another user's, and
+        # reports it as existing; this avoids a lookup through the Admin API, which is rate limited per hour
+        result = cloudinary.uploader.upload(data, public_id=self.public_id(key), overwrite=False, resource_type="image")
+        if result.get("existing"):
+            logger.debug("Avatar %s is already stored", key)
+
+    async def save(self, key: str, data: bytes) -> str:
+        await asyncio.to_thread(self._upload, key, data)
+        return self.url(key)
+
+
+class LocalStorage(AvatarStorage):
+    """
+    Stores avatars as files in a directory served by the application, for tests and deployments
+    without access to Cloudinary.
+    """
+
+    def __init__(self, root: str | Path, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}.jpg"
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}.jpg"
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file and renamed, so a concurrent reader never sees a partial avatar
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    async def save(self, key: str, data: bytes) -> str:
+        await asyncio.to_thread(self._write, key, data)
+        return self.url(key)
+
+
+def create_storage() -> AvatarStorage:
+    """
+    Creates the storage backend selected by ``settings.avatar_storage``.
+
+    :return: The storage backend.
+    :rtype: AvatarStorage
+    :raises ValueError: If the backend is unknown.
+    """
+    if settings.avatar_storage == "cloudinary":
+        return CloudinaryStorage(settings.cloudinary_name, settings.cloudinary_api_key, settings.cloudinary_api_secret)
+    if settings.avatar_storage == "local":
+        return LocalStorage(settings.avatar_local_dir, settings.avatar_local_url)
+    raise ValueError(f"Unknown avatar storage: {settings.avatar_storage}")
+
+
+avatar_storage = create_storage()
+
+
+def get_avatar_storage() -> AvatarStorage:
+    """
+    Returns the avatar storage backend configured at startup.
+
+    :return: The storage backend.
+    :rtype: AvatarStorage
+    """
+    return avatar_storage
+
+
+def avatar_key(digest: str, size: int) -> str:
+    """
+    Returns the content key of an avatar: the hash of the upload and the avatar size, which together
+    determine the stored image.
+
+    :param digest: The SHA-256 hex digest of the upload.
+    :type digest: str
+    :param size: The avatar size in pixels.
+    :type size: int
+    :return: The content key.
+    :rtype: str
+    """
+    return f"{digest[:32]}-{size}"
+
+
+async def process_avatar(file: UploadFile, storage: AvatarStorage, current_url: str | None = None) -> str:
+    """
+    Turns an upload into a stored avatar.
+
+    :param file: The uploaded image.
+    :type file: UploadFile
+    :param storage: The storage backend.
+    :type storage: AvatarStorage
+    :param current_url: The URL of the user's current avatar, if any.
+    :type current_url: str | None
+    :return: The URL of the avatar, which is ``current_url`` if the user uploaded the same image again.
+    :rtype: str
+    :raises AvatarError: If the upload is too large or not a supported image.
+    """
+    data, digest = await read_upload(file, settings.avatar_max_bytes)
+    key = avatar_key(digest, settings.avatar_size)
+    url = storage.url(key)
+    if url == current_url:
+        return url
+    avatar = await asyncio.to_thread(normalise_image, data, settings.avatar_size, settings.avatar_max_pixels)
+    return await storage.save(key, avatar)
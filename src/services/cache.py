@@ -0,0 +1,373 @@
+"""
+Cache Module
+
+This module provides a bounded in-process LRU/TTL cache, the two-tier user cache used by
+``Auth.get_current_user``: the local tier answers hot users without a network round trip and
+Redis shares snapshots between workers, and the Redis cache of serialised contact responses.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Hashable, NamedTuple, Optional
+from urllib.parse import urlencode
+
+from redis.exceptions import RedisError
+from starlette.datastructures import QueryParams
+
+from src.conf.config import settings
+from src.database.models import User
+from src.services.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTTLCache:
+    """
+    A bounded least-recently-used cache whose entries expire after a time to live.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns a cached value and marks it as recently used.
+
+        :param key: The cache key.
+        :type key: Hashable
+        :return: The cached value or None if it is missing or expired.
+        :rtype: Any | None
+        """
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Caches a value, evicting the least recently used entry when the cache is full.
+
+        :param key: The cache key.
+        :type key: Hashable
+        :param value: The value to cache.
+        :type value: Any
+        :param ttl: Time to live in seconds, defaults to the cache's ttl.
+        :type ttl: float | None
+        :rtype: None
+        """
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """
+        Removes a value from the cache if it is there.
+
+        :param key: The cache key.
+        :type key: Hashable
+        :rtype: None
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Removes all the values from the cache.
+
+        :rtype: None
+        """
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+USER_SNAPSHOT_FIELDS = ("id", "username", "email", "created_at", "avatar", "confirmed")
+
+
+def dump_user(user: User) -> bytes:
+    """
+    Serialises the fields of a user needed by authenticated requests into a compact JSON snapshot.
+
+    :param user: The user to serialise.
+    :type user: User
+    :return: The JSON snapshot.
+    :rtype: bytes
+    """
+    snapshot = {field: getattr(user, field) for field in USER_SNAPSHOT_FIELDS}
+    if snapshot["created_at"] is not None:
+        snapshot["created_at"] = snapshot["created_at"].isoformat()
+    return json.dumps(snapshot, separators=(",", ":")).encode()
+
+
+def load_user(data: bytes) -> User:
+    """
+    Builds a detached user from a snapshot made by ``dump_user``.
+
+    :param data: The JSON snapshot.
+    :type data: bytes
+    :return: A user that is not attached to any database session.
+    :rtype: User
+    """
+    snapshot = json.loads(data)
+    if snapshot["created_at"] is not None:
+        snapshot["created_at"] = datetime.fromisoformat(snapshot["created_at"])
+    return User(**snapshot)
+
+
+class UserCache:
+    """
+    A two-tier cache of user snapshots keyed by email: an in-process LRU/TTL tier in front of Redis.
+    """
+    INVALIDATION_CHANNEL = "user-cache:invalidate"
+
+    def __init__(self, redis, ttl: int, local_ttl: float, local_size: int):
+        self.redis = redis
+        self.ttl = ttl
+        self.local = LocalTTLCache(local_size, local_ttl)
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(email: str) -> str:
+        return f"user:{email}"
+
+    async def get(self, email: str) -> Optional[User]:
+        """
+        Returns a cached user, looking in the local tier first and then in Redis.
+
+        :param email: The email of the user.
+        :type email: str
+        :return: A detached user or None on a miss.
+        :rtype: User | None
+        """
+        data = self.local.get(email)
+        if data is not None:
+            self.local_hits += 1
+            return load_user(data)
+        try:
+            data = await self.redis.get(self.key(email))
+        except RedisError as err:
+            logger.warning("User cache read failed: %s", err)
+            data = None
+        if data is None:
+            self.misses += 1
+            return None
+        self.redis_hits += 1
+        self.local.set(email, data)
+        return load_user(data)
+
+    async def set(self, user: User) -> None:
+        """
+        Stores a user snapshot in both tiers.
+
+        :param user: The user to cache.
+        :type user: User
+        :rtype: None
+        """
+        data = dump_user(user)
+        self.local.set(user.email, data)
+        try:
+            await self.redis.setex(self.key(user.email), self.ttl, data)
+        except RedisError as err:
+            logger.warning("User cache write failed: %s", err)
+
+    async def invalidate(self, email: str) -> None:
+        """
+        Drops a user from both tiers and tells the other workers to drop it from their local tiers.
+
+        :param email: The email of the user that has changed.
+        :type email: str
+        :rtype: None
+        """
+        self.local.pop(email)
+        try:
+            await self.redis.delete(self.key(email))
+            await self.redis.publish(self.INVALIDATION_CHANNEL, email)
+        except RedisError as err:
+            logger.warning("User cache invalidation failed: %s", err)
+
+    async def listen(self) -> None:
+        """
+        Evicts users invalidated by other workers from the local tier until cancelled.
+
+        The local tier is cleared whenever the subscription is (re)established, since invalidations
+        published while it was down are lost.
+
+        :rtype: None
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.local.pop(message["data"].decode())
+            except RedisError as err:
+                logger.warning("User cache invalidation listener failed: %s", err)
+                self.local.clear()
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        """
+        Returns hit and miss counters of the current worker process.
+
+        :return: Local and Redis hits, misses and the number of locally cached users.
+        :rtype: dict
+        """
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "local_size": len(self.local),
+        }
+
+
+class CachedResponse(NamedTuple):
+    headers: dict
+    body: bytes
+
+
+class ResponseCache:
+    """
+    A Redis cache of serialised JSON responses keyed by user, endpoint and normalised query parameters.
+
+    Each user has a generation counter which every write to their contacts increments. Entries are stored with
+    the generation they were built at and are only served while it is current, so one ``INCR`` invalidates all
+    of a user's entries. The generation and an entry are read together with one ``MGET``.
+    """
+
+    def __init__(self, redis, ttl: int, enabled: bool = True):
+        self.redis = redis
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    @staticmethod
+    def generation_key(user_id: int) -> str:
+        return f"responses:{user_id}:generation"
+
+    @staticmethod
+    def key(user_id: int, endpoint: str, params: QueryParams) -> str:
+        """
+        Builds the cache key of a response; query parameters are sorted so their order doesn't matter.
+
+        :param user_id: The id of the user the response belongs to.
+        :type user_id: int
+        :param endpoint: The name of the endpoint, with anything else the response depends on.
+        :type endpoint: str
+        :param params: The query parameters of the request.
+        :type params: QueryParams
+        :return: The cache key.
+        :rtype: str
+        """
+        return f"responses:{user_id}:{endpoint}?{urlencode(sorted(params.multi_items()))}"
+
+    async def get(self, user_id: int, key: str, bypass: bool = False) -> tuple[Optional[bytes], Optional[CachedResponse]]:
+        """
+        Looks up a cached response.
+
+        :param user_id: The id of the user the response belongs to.
+        :type user_id: int
+        :param key: The cache key made by ``key``.
+        :type key: str
+        :param bypass: Skip the cached response, e.g. for ``Cache-Control: no-cache``; a fresh one may still be stored.
+        :type bypass: bool
+        :return: The current generation of the user, to pass to ``set``, and the cached response or None on a miss.
+            The generation is None when the cache is disabled or unavailable.
+        :rtype: tuple[bytes | None, CachedResponse | None]
+        """
+        if not self.enabled:
+            return None, None
+        try:
+            generation, data = await self.redis.mget(self.generation_key(user_id), key)
+        except RedisError as err:
+            logger.warning("Response cache read failed: %s", err)
+            self.misses += 1
+            return None, None
+        generation = generation or b"0"
+        if bypass:
+            self.bypasses += 1
+            return generation, None
+        if data is not None:
+            stored_generation, headers, body = data.split(b"\n", 2)
+            if stored_generation == generation:
+                self.hits += 1
+                return generation, CachedResponse(json.loads(headers), body)
+        self.misses += 1
+        return generation, None
+
+    async def set(self, key: str, generation: Optional[bytes], response: CachedResponse) -> None:
+        """
+        Stores a response built from data read after ``get`` returned ``generation``.
+
+        A write committed in between has already moved the generation on, so such a response is never served.
+
+        :param key: The cache key made by ``key``.
+        :type key: str
+        :param generation: The generation returned by ``get``; nothing is stored if it is None.
+        :type generation: bytes | None
+        :param response: The response headers and serialised body.
+        :type response: CachedResponse
+        :rtype: None
+        """
+        if generation is None:
+            return
+        data = b"\n".join((generation, json.dumps(response.headers, separators=(",", ":")).encode(), response.body))
+        try:
+            await self.redis.setex(key, self.ttl, data)
+        except RedisError as err:
+            logger.warning("Response cache write failed: %s", err)
+
+    async def invalidate(self, user_id: int) -> None:
+        """
+        Invalidates all cached responses of a user. Called after a write to the user's contacts is committed.
+
+        If Redis is unavailable the entries expire after the cache's ttl.
+
+        :param user_id: The id of the user whose contacts changed.
+        :type user_id: int
+        :rtype: None
+        """
+        if not self.enabled:
+            return
+        try:
+            await self.redis.incr(self.generation_key(user_id))
+        except RedisError as err:
+            logger.warning("Response cache invalidation failed: %s", err)
+
+    def stats(self) -> dict:
+        """
+        Returns hit and miss counters of the current worker process.
+
+        :return: Hits, misses, bypassed lookups and the hit ratio.
+        :rtype: dict
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+user_cache = UserCache(redis_client, settings.user_cache_ttl, settings.user_cache_local_ttl,
+                       settings.user_cache_local_size)
+
+response_cache = ResponseCache(redis_client, settings.response_cache_ttl, settings.response_cache_enabled)
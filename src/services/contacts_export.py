@@ -0,0 +1,155 @@
+"""
+Contacts Export Module
+
+This module encodes a stream of contact rows as NDJSON, CSV or vCard 3.0 and groups the output
+into byte chunks for a streamed response, holding no more than one chunk in memory.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Callable, Mapping, NamedTuple
+
+from src.schemas import ExportFormat
+
+EXPORT_FIELDS = ("id", "first_name", "last_name", "email", "phone", "birthday", "additional_info", "created_at")
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def encode_ndjson(rows: AsyncIterator[Mapping]) -> AsyncIterator[str]:
+    """
+    Encodes contacts as one JSON object per line.
+
+    :param rows: The contacts to export.
+    :type rows: AsyncIterator[Mapping]
+    :return: The lines of the export.
+    :rtype: AsyncIterator[str]
+    """
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_json_default)
+    async for row in rows:
+        yield encoder.encode({field: row[field] for field in EXPORT_FIELDS}) + "\n"
+
+
+async def encode_csv(rows: AsyncIterator[Mapping]) -> AsyncIterator[str]:
+    """
+    Encodes contacts as CSV with a header row, in the format accepted by the contacts import.
+
+    :param rows: The contacts to export.
+    :type rows: AsyncIterator[Mapping]
+    :return: The records of the export.
+    :rtype: AsyncIterator[str]
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    def record(values) -> str:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(values)
+        return buffer.getvalue()
+
+    yield record(EXPORT_FIELDS)
+    async for row in rows:
+        yield record([
+            value.isoformat() if isinstance(value, (date, datetime)) else value
+            for value in (row[field] for field in EXPORT_FIELDS)
+        ])
+
+
+def _vcard_escape(value) -> str:
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _vcard_fold(line: str) -> str:
+    """
+    Folds a content line to lines of at most 75 octets, as RFC 6350 requires.
+
+    :param line: A content line without its line break.
+    :type line: str
+    :return: The folded line, ending with a line break.
+    :rtype: str
+    """
+    if len(line) <= 75 and line.isascii():
+        return line + "\r\n"
+    parts, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            parts.append("".join(current))
+            # Continuation lines start with a space, which counts towards their length
+            current, size = [" "], 1
+        current.append(char)
+        size += width
+    parts.append("".join(current))
+    return "\r\n".join(parts) + "\r\n"
+
+
+async def encode_vcard(rows: AsyncIterator[Mapping]) -> AsyncIterator[str]:
+    """
+    Encodes contacts as vCard 3.0 cards.
+
+    :param rows: The contacts to export.
+    :type rows: AsyncIterator[Mapping]
+    :return: The cards of the export.
+    :rtype: AsyncIterator[str]
+    """
+    async for row in rows:
+        first_name, last_name = _vcard_escape(row["first_name"]), _vcard_escape(row["last_name"])
+        lines = [
+            "BEGIN:VCARD",
+            "VERSION:3.0",
+            f"N:{last_name};{first_name};;;",
+            f"FN:{first_name} {last_name}",
+            f"EMAIL;TYPE=INTERNET:{_vcard_escape(row['email'])}",
+            f"TEL:{_vcard_escape(row['phone'])}",
+            f"BDAY:{row['birthday'].isoformat()}",
+        ]
+        if row["additional_info"]:
+            lines.append(f"NOTE:{_vcard_escape(row['additional_info'])}")
+        lines.append("END:VCARD")
+        yield "".join(_vcard_fold(line) for line in lines)
+
+
+async def iter_chunks(parts: AsyncIterator[str], chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Groups encoded records into UTF-8 chunks of about ``chunk_size`` bytes, so a response is
+    not sent one small record at a time.
+
+    :param parts: The encoded records.
+    :type parts: AsyncIterator[str]
+    :param chunk_size: The approximate size of a chunk in bytes.
+    :type chunk_size: int
+    :return: The chunks of the export.
+    :rtype: AsyncIterator[bytes]
+    """
+    pending, size = [], 0
+    async for part in parts:
+        pending.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(pending).encode()
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending).encode()
+
+
+class Exporter(NamedTuple):
+    media_type: str
+    extension: str
+    encode: Callable[[AsyncIterator[Mapping]], AsyncIterator[str]]
+
+
+EXPORTERS = {
+    ExportFormat.ndjson: Exporter("application/x-ndjson", "ndjson", encode_ndjson),
+    ExportFormat.csv: Exporter("text/csv; charset=utf-8", "csv", encode_csv),
+    ExportFormat.vcard: Exporter("text/vcard; charset=utf-8", "vcf", encode_vcard),
+}
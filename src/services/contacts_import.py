@@ -0,0 +1,131 @@
+"""
+Contacts Import Module
+
+This module parses CSV and NDJSON contact uploads incrementally from a stream of byte chunks,
+so an import never holds more than one record of the upload in memory.
+"""
+
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Union
+
+MAX_RECORD_LENGTH = 64 * 1024
+
+ImportRecord = tuple[int, Union[dict, ValueError]]
+
+
+class RecordTooLong(ValueError):
+    """
+    Raised when a record of an upload is longer than MAX_RECORD_LENGTH characters.
+    """
+
+    def __init__(self, line: int):
+        super().__init__(f"Record on line {line} is longer than {MAX_RECORD_LENGTH} characters")
+        self.line = line
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Splits a stream of UTF-8 byte chunks into lines without their line endings.
+
+    The upload is rejected as soon as the unterminated tail grows past MAX_RECORD_LENGTH, so a body
+    without line breaks is never buffered whole.
+
+    :param chunks: The byte chunks of an upload.
+    :type chunks: AsyncIterator[bytes]
+    :return: The lines of the upload.
+    :rtype: AsyncIterator[str]
+    :raises RecordTooLong: If a line is longer than MAX_RECORD_LENGTH.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending, line_no = "", 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line_no += 1
+            line = line.removesuffix("\r")
+            if len(line) > MAX_RECORD_LENGTH:
+                raise RecordTooLong(line_no)
+            yield line
+        if len(pending) > MAX_RECORD_LENGTH + 1:
+            raise RecordTooLong(line_no + 1)
+    pending = (pending + decoder.decode(b"", final=True)).removesuffix("\r")
+    if len(pending) > MAX_RECORD_LENGTH:
+        raise RecordTooLong(line_no + 1)
+    if pending:
+        yield pending
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[ImportRecord]:
+    """
+    Parses an NDJSON upload, one JSON object per line.
+
+    :param chunks: The byte chunks of an upload.
+    :type chunks: AsyncIterator[bytes]
+    :return: Line numbers with the parsed objects, or with the error of a malformed line.
+    :rtype: AsyncIterator[tuple[int, dict | ValueError]]
+    :raises RecordTooLong: If a line is longer than MAX_RECORD_LENGTH.
+    """
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as err:
+            yield line_no, ValueError(f"Invalid JSON: {err}")
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ValueError("Expected a JSON object")
+            continue
+        yield line_no, record
+
+
+async def iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[ImportRecord]:
+    """
+    Parses a CSV upload whose first record is a header with contact field names.
+
+    Quoted fields may span lines: physical lines are joined until their quotes are balanced.
+    Empty cells are returned as None.
+
+    :param chunks: The byte chunks of an upload.
+    :type chunks: AsyncIterator[bytes]
+    :return: Line numbers with the parsed records, or with the error of a malformed record.
+    :rtype: AsyncIterator[tuple[int, dict | ValueError]]
+    :raises RecordTooLong: If a record is longer than MAX_RECORD_LENGTH.
+    """
+    header = None
+    record, start, line_no = "", 0, 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not record:
+            start = line_no
+            record = line
+        else:
+            record += "\n" + line
+        if len(record) > MAX_RECORD_LENGTH:
+            raise RecordTooLong(start)
+        if record.count('"') % 2:
+            continue
+
+        text, record = record, ""
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as err:
+            yield start, ValueError(f"Invalid CSV: {err}")
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, ValueError(f"Expected {len(header)} fields, got {len(values)}")
+            continue
+        yield start, {name: value or None for name, value in zip(header, values)}
+
+    if record:
+        yield start, ValueError("Unterminated quoted field")
@@ -1,32 +1,99 @@
+"""
+Email Module
+
+This module queues emails in the outbox and renders outbox rows into messages with templates compiled
+at startup. ``SMTPSender`` delivers them over one persistent SMTP connection; the email worker
+(``src.services.email_worker``) drives it.
+"""
+
+from collections import defaultdict
+from email.message import Message
+from email.mime.text import MIMEText
+from email.utils import formataddr
 from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Sequence, Union
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.conf.config import settings
+from src.database.models import EmailOutbox
+from src.repository.email_outbox import queue_email
 from src.services.auth import auth_service
 
-from src.conf.config import settings
+TEMPLATE_FOLDER = Path(__file__).parent / 'templates'
+
+
+class TemplateRenderer:
+    """
+    Renders email templates, which are all compiled when the renderer is created.
+
+    Compiled templates are never checked for changes on disk, and a batch is rendered with one template lookup.
+    """
+
+    def __init__(self, folder: Path):
+        self.environment = Environment(loader=FileSystemLoader(folder), autoescape=select_autoescape(["html"]),
+                                       auto_reload=False)
+        self.templates = {name: self.environment.get_template(name) for name in self.environment.list_templates()}
+
+    def render(self, name: str, context: dict) -> str:
+        """
+        Renders a template.
 
+        :param name: The template name.
+        :type name: str
+        :param context: The template variables.
+        :type context: dict
+        :return: The rendered template.
+        :rtype: str
+        """
+        return self.render_many(name, [context])[0]
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="Anonymous Name",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+    def render_many(self, name: str, contexts: Sequence[dict]) -> List[str]:
+        """
+        Renders a template once per context.
 
+        :param name: The template name.
+        :type name: str
+        :param contexts: The template variables of each rendering.
+        :type contexts: Sequence[dict]
+        :return: The rendered templates, in the order of the contexts.
+        :rtype: List[str]
+        :raises KeyError: If there is no such template.
+        """
+        template = self.templates[name]
+        return [template.render(context) for context in contexts]
 
-async def send_email(email: EmailStr, username: str, host: str):
+
+renderer = TemplateRenderer(TEMPLATE_FOLDER)
+
+
+class EmailKind(NamedTuple):
+    subject: str
+    template: str
+    # Completes the queued contexts of a batch at send time, e.g. with tokens that shouldn't be stored in the outbox
+    build_contexts: Callable[[List[str], List[dict]], List[dict]]
+
+
+def _confirmation_contexts(recipients: List[str], contexts: List[dict]) -> List[dict]:
+    tokens = auth_service.create_email_tokens(recipients)
+    return [{**context, "token": token} for context, token in zip(contexts, tokens)]
+
+
+EMAIL_KINDS = {
+    "confirm_email": EmailKind(
+        subject="Confirm your email address ",
+        template="email_template.html",
+        build_contexts=_confirmation_contexts,
+    ),
+}
+
+
+def queue_confirmation_email(email: EmailStr, username: str, host: str, db: AsyncSession) -> None:
     """
-    Sends an email to the user for email confirmation with a token.
+    Queues an email confirmation for the user; it is sent by the email worker once the caller commits.
 
     :param email: The recipient's email address.
     :type email: EmailStr
@@ -34,19 +101,139 @@ async def send_email(email: EmailStr, username: str, host: str):
     :type username: str
     :param host: The host address to be included in the confirmation link.
     :type host: str
-    :raises ConnectionErrors: If there is an issue with the email connection.
+    :param db: A database session.
+    :type db: AsyncSession
     :rtype: None
     """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email address ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+    queue_email("confirm_email", email, {"username": username, "host": str(host)}, db)
+
+
+def build_messages(emails: Sequence[EmailOutbox]) -> List[Union[Message, Exception]]:
+    """
+    Renders outbox emails into messages, one batch per kind of email.
+
+    :param emails: The emails to render.
+    :type emails: Sequence[EmailOutbox]
+    :return: The messages in the order of the emails, or the error that prevented rendering one.
+    :rtype: List[Message | Exception]
+    """
+    sender = formataddr((settings.mail_from_name, settings.mail_from))
+    by_kind = defaultdict(list)
+    for index, email in enumerate(emails):
+        by_kind[email.kind].append(index)
+
+    messages: List[Union[Message, Exception]] = [None] * len(emails)
+    for name, indexes in by_kind.items():
+        kind = EMAIL_KINDS.get(name)
+        batch = [emails[index] for index in indexes]
+        if kind is None:
+            bodies = [KeyError(f"Unknown kind of email: {name}")] * len(batch)
+        else:
+            try:
+                contexts = kind.build_contexts([email.recipient for email in batch],
+                                               [email.context for email in batch])
+                bodies = renderer.render_many(kind.template, contexts)
+            except Exception:
+                # Find the emails that can't be rendered, so they don't hold back the rest of the batch
+                bodies = []
+                for email in batch:
+                    try:
+                        context, = kind.build_contexts([email.recipient], [email.context])
+                        bodies.append(renderer.render(kind.template, context))
+                    except Exception as err:
+                        bodies.append(err)
+        for index, email, body in zip(indexes, batch, bodies):
+            if isinstance(body, Exception):
+                messages[index] = body
+                continue
+            # MIMEText with the compat32 policy builds an order of magnitude faster than EmailMessage
+            message = MIMEText(body, "html", "utf-8")
+            message["From"] = sender
+            message["To"] = email.recipient
+            message["Subject"] = kind.subject
+            messages[index] = message
+    return messages
+
+
+def build_message(email: EmailOutbox) -> Message:
+    """
+    Renders an outbox email into a message.
+
+    :param email: The email to render.
+    :type email: EmailOutbox
+    :return: The message, ready to be sent.
+    :rtype: Message
+    :raises Exception: If the email can't be rendered, e.g. ``KeyError`` for an unknown kind of email.
+    """
+    message, = build_messages([email])
+    if isinstance(message, Exception):
+        raise message
+    return message
+
+
+class SMTPSender:
+    """
+    Sends messages over one SMTP connection, which is opened on first use, kept open between batches
+    and reopened once if the server dropped it.
+    """
+
+    def __init__(self, hostname: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = True, start_tls: bool = False, validate_certs: bool = True, timeout: float = 30):
+        self.options = dict(hostname=hostname, port=port, username=username, password=password, use_tls=use_tls,
+                            start_tls=start_tls, validate_certs=validate_certs, timeout=timeout)
+        self.client: Optional[aiosmtplib.SMTP] = None
+        self.connections = 0
+
+    @classmethod
+    def from_settings(cls) -> "SMTPSender":
+        """
+        Creates a sender for the SMTP server configured in ``Settings``.
+
+        :return: The sender.
+        :rtype: SMTPSender
+        """
+        return cls(settings.mail_server, settings.mail_port, settings.mail_username, settings.mail_password,
+                   use_tls=settings.mail_ssl_tls, start_tls=settings.mail_starttls,
+                   validate_certs=settings.mail_validate_certs, timeout=settings.mail_timeout)
+
+    async def connect(self) -> None:
+        """
+        Opens the connection and logs in if credentials are configured.
+
+        :rtype: None
+        :raises aiosmtplib.SMTPException: If the server can't be reached or refuses the login.
+        """
+        self.client = aiosmtplib.SMTP(**self.options)
+        await self.client.connect()
+        self.connections += 1
+
+    async def send(self, message: Message) -> None:
+        """
+        Sends a message, connecting first if there is no open connection.
+
+        :param message: The message to send.
+        :type message: Message
+        :rtype: None
+        :raises aiosmtplib.SMTPException: If the message can't be sent.
+        """
+        if self.client is None or not self.client.is_connected:
+            await self.connect()
+        try:
+            await self.client.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # Servers close idle connections; retry once on a new one
+            await self.connect()
+            await self.client.send_message(message)
+
+    async def close(self) -> None:
+        """
+        Closes the connection if it is open.
+
+        :rtype: None
+        """
+        if self.client is not None and self.client.is_connected:
+            try:
+                await self.client.quit()
+            except aiosmtplib.SMTPException:
+                self.client.close()
+        self.client = None
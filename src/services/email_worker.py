@@ -0,0 +1,191 @@
+"""
+Email Worker Module
+
+This module delivers the emails queued in the outbox, outside the API processes. Run it with
+``python -m src.services.email_worker``; any number of workers may run side by side.
+
+Each round claims a batch of due emails, sends them over a persistent SMTP connection and settles the
+batch with two statements. Failed emails are retried with exponential backoff and jitter until
+``settings.email_max_attempts`` is reached; emails the server rejects permanently are not retried.
+"""
+
+import asyncio
+import logging
+import random
+import signal
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import aiosmtplib
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.database.models import EmailOutbox
+from src.repository.email_outbox import claim_emails, settle_emails
+from src.services.email import SMTPSender, build_messages
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the rest of a batch can't be sent over the current connection
+CONNECTION_ERRORS = (aiosmtplib.SMTPConnectError, aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPTimeoutError,
+                     aiosmtplib.SMTPAuthenticationError, OSError)
+
+
+def is_permanent(err: Exception) -> bool:
+    """
+    Tells whether sending an email failed for good, i.e. the server answered with a 5xx reply.
+
+    :param err: The error raised while sending.
+    :type err: Exception
+    :return: True if retrying won't help.
+    :rtype: bool
+    """
+    if isinstance(err, aiosmtplib.SMTPRecipientsRefused):
+        return all(error.code >= 500 for error in err.recipients)
+    return isinstance(err, aiosmtplib.SMTPResponseException) and err.code >= 500
+
+
+class EmailWorker:
+    """
+    Sends batches of outbox emails and keeps throughput counters.
+    """
+
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession], sender: SMTPSender,
+                 batch_size: int = 100, max_attempts: int = 8, retry_base: float = 30, retry_max: float = 3600,
+                 claim_timeout: float = 300):
+        self.session_maker = session_maker
+        self.sender = sender
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.claim_timeout = claim_timeout
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.batches = 0
+        self.send_seconds = 0.0
+
+    def retry_at(self, email: EmailOutbox) -> Optional[datetime]:
+        """
+        Returns when to retry an email that failed, or None if it is out of attempts.
+
+        :param email: The email that failed.
+        :type email: EmailOutbox
+        :return: The time of the next attempt or None.
+        :rtype: datetime | None
+        """
+        if email.attempts >= self.max_attempts:
+            return None
+        delay = min(self.retry_max, self.retry_base * 2 ** (email.attempts - 1))
+        return datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.5, 1))
+
+    async def run_once(self) -> int:
+        """
+        Claims, sends and settles one batch of due emails.
+
+        :return: The number of emails claimed.
+        :rtype: int
+        """
+        async with self.session_maker() as db:
+            emails = await claim_emails(self.batch_size, self.claim_timeout, db)
+        if not emails:
+            return 0
+
+        sent, failed = [], []
+        started = time.perf_counter()
+        for index, (email, message) in enumerate(zip(emails, build_messages(emails))):
+            if isinstance(message, Exception):
+                logger.error("Can't render email %s: %r", email.id, message)
+                failed.append((email.id, f"Can't render: {message!r}", None))
+                continue
+            try:
+                await self.sender.send(message)
+            except CONNECTION_ERRORS as err:
+                logger.warning("SMTP connection failed: %s", err)
+                await self.sender.close()
+                failed.extend((rest.id, repr(err), self.retry_at(rest)) for rest in emails[index:])
+                break
+            except aiosmtplib.SMTPException as err:
+                failed.append((email.id, repr(err), None if is_permanent(err) else self.retry_at(email)))
+                continue
+            sent.append(email.id)
+        elapsed = time.perf_counter() - started
+
+        async with self.session_maker() as db:
+            await settle_emails(sent, failed, db)
+
+        retried = sum(1 for _, _, retry_at in failed if retry_at is not None)
+        self.sent += len(sent)
+        self.retried += retried
+        self.failed += len(failed) - retried
+        self.batches += 1
+        self.send_seconds += elapsed
+        logger.info("Sent %d of %d emails in %.3fs (%.1f/s), %d to retry", len(sent), len(emails), elapsed,
+                    len(sent) / elapsed if elapsed else 0.0, retried)
+        return len(emails)
+
+    async def run(self, stop: asyncio.Event, poll_interval: float = 1.0) -> None:
+        """
+        Sends batches until ``stop`` is set, polling the outbox while it is empty.
+
+        :param stop: Set to stop the worker after the current batch.
+        :type stop: asyncio.Event
+        :param poll_interval: Seconds to wait when there are no due emails.
+        :type poll_interval: float
+        :rtype: None
+        """
+        try:
+            while not stop.is_set():
+                try:
+                    claimed = await self.run_once()
+                except Exception:
+                    logger.exception("Email batch failed")
+                    claimed = 0
+                if claimed < self.batch_size:
+                    try:
+                        await asyncio.wait_for(stop.wait(), poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            await self.sender.close()
+
+    def stats(self) -> dict:
+        """
+        Returns counters of the worker.
+
+        :return: Emails sent, retried and failed, batches, SMTP connections opened and the send rate.
+        :rtype: dict
+        """
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "batches": self.batches,
+            "connections": self.sender.connections,
+            "emails_per_second": self.sent / self.send_seconds if self.send_seconds else 0.0,
+        }
+
+
+async def main() -> None:
+    """
+    Runs an email worker configured from ``Settings`` until SIGINT or SIGTERM.
+
+    :rtype: None
+    """
+    worker = EmailWorker(SessionLocal, SMTPSender.from_settings(), batch_size=settings.email_batch_size,
+                         max_attempts=settings.email_max_attempts, retry_base=settings.email_retry_base,
+                         retry_max=settings.email_retry_max, claim_timeout=settings.email_claim_timeout)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await worker.run(stop, settings.email_poll_interval)
+    logger.info("Email worker stopped: %s", worker.stats())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
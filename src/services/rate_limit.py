@@ -0,0 +1,256 @@
+"""
+Rate Limit Module
+
+This module limits requests per authenticated user and route with a sliding window kept in Redis.
+Workers lease tokens from the window in batches with an atomic Lua script and admit requests from a
+local token bucket, so most requests are decided without a Redis round trip.
+"""
+
+import logging
+import math
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.cache import LocalTTLCache
+from src.services.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] is the window: a sorted set of leases named "<id>:<tokens>" and scored by the time they were granted.
+# ARGV: window in ms, limit, tokens wanted, id of the new lease, previous lease or "", its unused tokens.
+# Returns the tokens granted, the tokens left in the window and the ms until its oldest lease expires.
+SLIDING_WINDOW_LEASE = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+
+if ARGV[5] ~= '' then
+  local score = redis.call('ZSCORE', KEYS[1], ARGV[5])
+  if score then
+    local id, tokens = string.match(ARGV[5], '^(.*):(%d+)$')
+    local kept = tonumber(tokens) - tonumber(ARGV[6])
+    redis.call('ZREM', KEYS[1], ARGV[5])
+    if kept > 0 then
+      redis.call('ZADD', KEYS[1], score, id .. ':' .. kept)
+    end
+  end
+end
+
+local used = 0
+for _, lease in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+  used = used + tonumber(string.match(lease, ':(%d+)$'))
+end
+local granted = math.max(0, math.min(tonumber(ARGV[3]), limit - used))
+if granted > 0 then
+  redis.call('ZADD', KEYS[1], now, ARGV[4] .. ':' .. granted)
+  used = used + granted
+end
+redis.call('PEXPIRE', KEYS[1], window)
+
+local reset = window
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if #oldest > 0 then
+  reset = tonumber(oldest[2]) + window - now
+end
+return {granted, limit - used, reset}
+"""
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """
+    Parses a rate written as ``<requests>/<seconds>``, e.g. ``12/60``.
+
+    :param rate: The rate.
+    :type rate: str
+    :return: The number of requests allowed and the window in seconds.
+    :rtype: tuple[int, int]
+    :raises ValueError: If the rate is malformed.
+    """
+    times, _, seconds = rate.partition("/")
+    times, seconds = int(times), int(seconds)
+    if times < 1 or seconds < 1:
+        raise ValueError(f"Invalid rate: {rate}")
+    return times, seconds
+
+
+@dataclass
+class Lease:
+    member: str
+    tokens: int
+    remaining: int
+    reset_at: float
+    expires_at: float
+
+
+@dataclass
+class RateLimitState:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float
+
+
+class SlidingWindowLimiter:
+    """
+    A sliding-window rate limiter shared by all workers through Redis, with a local token bucket per key.
+
+    A worker that runs out of local tokens leases a share of the limit from the window in Redis. The share
+    is ``lease_fraction`` of the limit, capped by what is left. Leased tokens are spent locally for
+    ``lease_ttl`` seconds. Tokens left unused are handed back with the next lease of the same key. A window
+    therefore never admits more than its limit, and idle leases only hold tokens briefly. Rejections are
+    also kept locally for ``lease_ttl`` seconds.
+    """
+
+    def __init__(self, redis, lease_fraction: float, lease_ttl: float, local_size: int = 10000):
+        self.script = redis.register_script(SLIDING_WINDOW_LEASE)
+        self.lease_fraction = lease_fraction
+        self.lease_ttl = lease_ttl
+        self.leases = LocalTTLCache(local_size, lease_ttl)
+        self.local_hits = 0
+        self.redis_calls = 0
+        self.rejected = 0
+
+    async def acquire(self, key: str, times: int, seconds: int) -> RateLimitState:
+        """
+        Takes a token for a request.
+
+        If Redis is unavailable the request is allowed, so an outage of the limiter doesn't take the API down.
+
+        :param key: The key to limit, e.g. a route and a user id.
+        :type key: str
+        :param times: The number of requests allowed per window.
+        :type times: int
+        :param seconds: The window in seconds.
+        :type seconds: int
+        :return: Whether the request is allowed and the state of the window for the rate limit headers.
+        :rtype: RateLimitState
+        """
+        now = time.monotonic()
+        lease = self.leases.get(key)
+        if lease is not None and lease.expires_at > now:
+            if not lease.member:
+                self.rejected += 1
+                return RateLimitState(False, times, 0, max(0.0, lease.reset_at - now))
+            if lease.tokens > 0:
+                lease.tokens -= 1
+                self.local_hits += 1
+                return RateLimitState(True, times, lease.remaining + lease.tokens, max(0.0, lease.reset_at - now))
+
+        refund = (lease.member, lease.tokens) if lease is not None and lease.member and lease.tokens > 0 else ("", 0)
+        wanted = max(1, math.ceil(times * self.lease_fraction))
+        lease_id = uuid.uuid4().hex[:12]
+        self.redis_calls += 1
+        try:
+            granted, remaining, reset_ms = await self.script(
+                keys=[f"rate-limit:{key}"], args=[seconds * 1000, times, wanted, lease_id, *refund]
+            )
+        except RedisError as err:
+            logger.warning("Rate limiter is unavailable: %s", err)
+            return RateLimitState(True, times, times, float(seconds))
+        reset = reset_ms / 1000
+
+        if granted == 0:
+            # A rejection is remembered like an empty lease, so a client retrying in a loop doesn't reach Redis
+            self.leases.set(key, Lease("", 0, 0, now + reset, now + min(self.lease_ttl, reset)), ttl=seconds)
+            self.rejected += 1
+            return RateLimitState(False, times, 0, reset)
+        # Kept for the whole window, not just lease_ttl, so unused tokens can be refunded with the next lease
+        self.leases.set(key, Lease(f"{lease_id}:{granted}", granted - 1, remaining, now + reset, now + self.lease_ttl),
+                        ttl=seconds)
+        return RateLimitState(True, times, remaining + granted - 1, reset)
+
+    def stats(self) -> dict:
+        """
+        Returns counters of the current worker process.
+
+        :return: Requests admitted locally, Redis round trips, rejected requests and the number of local leases.
+        :rtype: dict
+        """
+        return {
+            "local_hits": self.local_hits,
+            "redis_calls": self.redis_calls,
+            "rejected": self.rejected,
+            "leases": len(self.leases),
+        }
+
+
+rate_limiter = SlidingWindowLimiter(redis_client, settings.rate_limit_lease_fraction, settings.rate_limit_lease_ttl)
+
+
+class RateLimit:
+    """
+    A route dependency limiting requests per authenticated user with the rate configured for the route
+    in ``settings.rate_limits``, falling back to ``settings.rate_limit_default``.
+
+    The ``RateLimit-*`` headers are stored in the request state and added to the response by
+    ``RateLimitHeadersMiddleware``, which also covers routes that return a ``Response`` themselves.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def rate(self) -> tuple[int, int]:
+        return parse_rate(settings.rate_limits.get(self.name, settings.rate_limit_default))
+
+    async def __call__(self, request: Request, current_user: User = Depends(auth_service.get_current_user)):
+        """
+        Takes a token for the current user or rejects the request with HTTP 429.
+
+        :param request: The incoming request.
+        :type request: Request
+        :param current_user: The current authenticated user.
+        :type current_user: User
+        :raises HTTPException: If the user exceeded the rate of the route.
+        :rtype: None
+        """
+        if not settings.rate_limit_enabled:
+            return
+        times, seconds = self.rate
+        state = await rate_limiter.acquire(f"{self.name}:{current_user.id}", times, seconds)
+        headers = {
+            "RateLimit-Limit": str(times),
+            "RateLimit-Remaining": str(state.remaining),
+            "RateLimit-Reset": str(math.ceil(state.reset)),
+            "RateLimit-Policy": f"{times};w={seconds}",
+        }
+        if not state.allowed:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests",
+                                headers={**headers, "Retry-After": headers["RateLimit-Reset"]})
+        request.state.rate_limit_headers = headers
+
+
+class RateLimitHeadersMiddleware:
+    """
+    An ASGI middleware adding the ``RateLimit-*`` headers set by ``RateLimit`` to the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers: Optional[dict] = scope.get("state", {}).get("rate_limit_headers")
+                if headers:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        *((name.lower().encode(), value.encode()) for name, value in headers.items()),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
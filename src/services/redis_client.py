@@ -0,0 +1,7 @@
+import redis.asyncio as redis
+
+from src.conf.config import settings
+
+
+# A shared asyncio client; connections are opened lazily from the running event loop
+redis_client = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
@@ -0,0 +1,151 @@
+"""
+Refresh Tokens Module
+
+This module keeps refresh token families in Redis instead of on the user row. Every login starts a family,
+so a user can stay signed in on several devices, and every refresh rotates the family to a new token.
+Presenting a token that was already rotated means it leaked: the whole family is revoked. A family expires
+together with its latest token, so Redis holds no more than the live sessions.
+"""
+
+import time
+import uuid
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from src.conf.config import settings
+from src.services.auth import auth_service
+from src.services.redis_client import redis_client
+
+# KEYS[1] is the family, holding the id of its current token. ARGV: the presented token id, the next
+# token id and the family ttl. Returns 1 if rotated, 0 if the family is unknown, -1 if the token was reused.
+ROTATE_FAMILY = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+  return 0
+end
+if current ~= ARGV[1] then
+  redis.call('DEL', KEYS[1])
+  return -1
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+ROTATED, UNKNOWN, REUSED = 1, 0, -1
+
+
+class RefreshTokenStore:
+    """
+    Issues and rotates refresh tokens, tracking the current token of each family in Redis.
+    """
+
+    def __init__(self, redis, ttl: int):
+        self.redis = redis
+        self.ttl = ttl
+        self.rotate_script = redis.register_script(ROTATE_FAMILY)
+
+    @staticmethod
+    def key(family: str) -> str:
+        return f"refresh-family:{family}"
+
+    async def _create(self, family: str, token_id: str) -> None:
+        await self.redis.set(self.key(family), token_id, ex=self.ttl)
+
+    async def _rotate(self, family: str, token_id: str, next_token_id: str) -> int:
+        return await self.rotate_script(keys=[self.key(family)], args=[token_id, next_token_id, self.ttl])
+
+    async def revoke(self, family: str) -> None:
+        """
+        Revokes a family, signing out the session it belongs to.
+
+        :param family: The family id.
+        :type family: str
+        :rtype: None
+        """
+        await self.redis.delete(self.key(family))
+
+    async def _token(self, email: str, family: str, token_id: str) -> str:
+        return await auth_service.create_refresh_token(data={"sub": email, "fid": family, "jti": token_id},
+                                                       expires_delta=self.ttl)
+
+    async def issue(self, email: str) -> str:
+        """
+        Starts a new family for a login and returns its first refresh token.
+
+        :param email: The user's email.
+        :type email: str
+        :return: The encoded refresh token.
+        :rtype: str
+        """
+        family, token_id = uuid.uuid4().hex, uuid.uuid4().hex
+        await self._create(family, token_id)
+        return await self._token(email, family, token_id)
+
+    async def rotate(self, claims: dict) -> str:
+        """
+        Replaces the current token of a family with a new one.
+
+        :param claims: The verified claims of the presented refresh token.
+        :type claims: dict
+        :return: The encoded refresh token that replaces it.
+        :rtype: str
+        :raises HTTPException: If the family is unknown, expired or revoked, or the token was already used,
+            in which case the family is revoked.
+        """
+        family, token_id = claims.get("fid"), claims.get("jti")
+        if not family or not token_id:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        next_token_id = uuid.uuid4().hex
+        result = await self._rotate(family, token_id, next_token_id)
+        if result == REUSED:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reused")
+        if result != ROTATED:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        return await self._token(claims["sub"], family, next_token_id)
+
+
+class InMemoryRefreshTokenStore(RefreshTokenStore):
+    """
+    A refresh token store kept in process memory, for tests and single-process deployments without Redis.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.families: dict[str, tuple[float, str]] = {}
+
+    def _current(self, family: str) -> Optional[str]:
+        item = self.families.get(family)
+        if item is None or item[0] <= time.monotonic():
+            self.families.pop(family, None)
+            return None
+        return item[1]
+
+    async def _create(self, family: str, token_id: str) -> None:
+        self.families[family] = (time.monotonic() + self.ttl, token_id)
+
+    async def _rotate(self, family: str, token_id: str, next_token_id: str) -> int:
+        current = self._current(family)
+        if current is None:
+            return UNKNOWN
+        if current != token_id:
+            del self.families[family]
+            return REUSED
+        self.families[family] = (time.monotonic() + self.ttl, next_token_id)
+        return ROTATED
+
+    async def revoke(self, family: str) -> None:
+        self.families.pop(family, None)
+
+
+refresh_token_store = RefreshTokenStore(redis_client, settings.refresh_token_ttl)
+
+
+def get_refresh_token_store() -> RefreshTokenStore:
+    """
+    Returns the refresh token store.
+
+    :return: The refresh token store.
+    :rtype: RefreshTokenStore
+    """
+    return refresh_token_store
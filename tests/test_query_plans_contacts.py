@@ -0,0 +1,118 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import Base, Contact, User
+from src.schemas import ContactOrder
+from src.repository.contacts import (
+    count_contacts,
+    get_contacts,
+    get_contact,
+    search_contacts,
+    stream_contacts,
+    get_upcoming_birthdays,
+    encode_cursor,
+)
+
+
+def create_schema(conn) -> None:
+    """
+    Creates the schema with the contacts indexes in name order. SQLite breaks ties between equally good
+    indexes by the order they were created in, which ``create_all`` leaves to set iteration order.
+    """
+    Base.metadata.create_all(conn)
+    indexes = sorted((index for index in Contact.__table__.indexes if index.name.startswith("ix_contacts_user_id_")),
+                     key=lambda index: index.name)
+    for index in indexes:
+        index.drop(conn)
+    for index in indexes:
+        index.create(conn)
+
+
+class TestContactsQueryPlans(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs the repository queries against SQLite and checks EXPLAIN QUERY PLAN of every statement they issue.
+    """
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(create_schema)
+        self.statements = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self.capture)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.user = User(id=1)
+        self.last = Contact(id=3, first_name="Taras", last_name="Tarasiuk")
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    def capture(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("EXPLAIN"):
+            self.statements.append((statement, parameters))
+
+    async def query_plan(self) -> str:
+        self.assertEqual(len(self.statements), 1)
+        statement, parameters = self.statements.pop()
+        conn = await self.session.connection()
+        rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return "\n".join(row[-1] for row in rows)
+
+    async def test_get_contacts_by_id_uses_user_id_id_index(self):
+        await get_contacts(skip=0, limit=10, user=self.user, db=self.session)
+        plan = await self.query_plan()
+        self.assertIn("USING INDEX ix_contacts_user_id_id (user_id=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    async def test_get_contacts_by_id_cursor_seeks_index(self):
+        cursor = encode_cursor(self.last, ContactOrder.id)
+        await get_contacts(skip=0, limit=10, user=self.user, db=self.session, cursor=cursor)
+        plan = await self.query_plan()
+        self.assertIn("USING INDEX ix_contacts_user_id_id (user_id=? AND id>?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    async def test_get_contacts_by_name_uses_name_index(self):
+        for cursor in (None, encode_cursor(self.last, ContactOrder.name)):
+            await get_contacts(skip=0, limit=10, user=self.user, db=self.session, cursor=cursor,
+                               order=ContactOrder.name)
+            plan = await self.query_plan()
+            self.assertIn("USING INDEX ix_contacts_user_id_name (user_id=?", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    async def test_get_contact_uses_primary_key(self):
+        await get_contact(contact_id=3, user=self.user, db=self.session)
+        plan = await self.query_plan()
+        self.assertIn("USING INTEGER PRIMARY KEY", plan)
+
+    async def test_search_contacts_is_scoped_by_user_index(self):
+        await search_contacts(self.session, first_name="Tar", last_name=None, email=None, user=self.user)
+        plan = await self.query_plan()
+        self.assertRegex(plan, r"SEARCH contacts USING (COVERING )?INDEX \w+ \(user_id=\?\)")
+
+    async def test_get_contacts_projection_keeps_index_order(self):
+        await get_contacts(skip=0, limit=10, user=self.user, db=self.session, order=ContactOrder.name,
+                           fields=("first_name", "phone"))
+        plan = await self.query_plan()
+        self.assertIn("USING INDEX ix_contacts_user_id_name (user_id=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    async def test_count_contacts_uses_covering_index(self):
+        await count_contacts(self.user, self.session)
+        plan = await self.query_plan()
+        self.assertIn("USING COVERING INDEX ix_contacts_user_id_id (user_id=?)", plan)
+
+    async def test_stream_contacts_walks_user_id_id_index(self):
+        self.assertEqual([row async for row in stream_contacts(self.user, self.session)], [])
+        plan = await self.query_plan()
+        self.assertIn("USING INDEX ix_contacts_user_id_id (user_id=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    async def test_get_upcoming_birthdays_uses_birthday_key_index(self):
+        for today in (date(2024, 3, 10), date(2024, 12, 28)):
+            await get_upcoming_birthdays(db=self.session, user=self.user, days=7, today=today)
+            plan = await self.query_plan()
+            self.assertIn("USING INDEX ix_contacts_user_id_birthday_key (user_id=? AND birthday_key", plan)
+            self.assertNotIn("(user_id=?)\n", plan)
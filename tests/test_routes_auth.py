@@ -1,24 +1,28 @@
-from unittest.mock import MagicMock
+from passlib.context import CryptContext
 
-from src.database.models import User
+from src.conf.config import settings
+from src.database.models import EmailOutbox, User
 from src.services.auth import auth_service
 
 
-def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+def test_create_user(client, session, user):
     response = client.post("/api/auth/signup", json=user,)
     assert response.status_code == 201, response.text
     data = response.json()
     assert data["user"]["email"] == user.get("email")
     assert "id" in data["user"]
+    queued: EmailOutbox = session.query(EmailOutbox).filter(EmailOutbox.recipient == user.get("email")).one()
+    assert queued.kind == "confirm_email"
+    assert queued.status == "pending"
+    assert queued.context == {"username": user.get("username"), "host": "http://testserver/"}
 
 
-def test_repeat_create_user(client, user):
+def test_repeat_create_user(client, session, user):
     response = client.post("/api/auth/signup", json=user,)
     assert response.status_code == 409, response.text
     data = response.json()
     assert data["detail"] == "Account already exists"
+    assert session.query(EmailOutbox).filter(EmailOutbox.recipient == user.get("email")).count() == 1
 
 
 def test_login_user_not_confirmed(client, user):
@@ -44,6 +48,21 @@ def test_login_user(client, session, user):
     assert data["token_type"] == "bearer"
 
 
+def test_login_rehashes_outdated_password_hash(client, session, user):
+    current_user: User = session.query(User).filter(User.email == user.get("email")).first()
+    current_user.password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(user.get("password"))
+    session.commit()
+    response = client.post("/api/auth/login", data={
+        "username": user.get("email"),
+        "password": user.get("password")
+    })
+    assert response.status_code == 200, response.text
+    session.expire_all()
+    rehashed_user: User = session.query(User).filter(User.email == user.get("email")).first()
+    assert rehashed_user.password.startswith(f"$2b${settings.bcrypt_rounds:02d}$")
+    assert auth_service.pwd_context.verify(user.get("password"), rehashed_user.password)
+
+
 def test_login_wrong_password(client, user):
     response = client.post("/api/auth/login", data={
         "username": user.get("email"),
@@ -81,6 +100,46 @@ def test_refresh_token(client, user):
     assert "refresh_token" in data, response.text
 
 
+def login(client, user) -> str:
+    response = client.post("/api/auth/login", data={
+        "username": user["email"],
+        "password": user["password"],
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["refresh_token"]
+
+
+def refresh(client, refresh_token):
+    return client.get("/api/auth/refresh_token", headers={"Authorization": f"Bearer {refresh_token}"})
+
+
+def test_refresh_token_rotates(client, user):
+    first = login(client, user)
+    response = refresh(client, first)
+    assert response.status_code == 200, response.text
+    second = response.json()["refresh_token"]
+    assert second != first
+
+    response = refresh(client, second)
+    assert response.status_code == 200, response.text
+
+
+def test_refresh_token_reuse_revokes_the_session(client, user):
+    other_session = login(client, user)
+    first = login(client, user)
+    second = refresh(client, first).json()["refresh_token"]
+
+    response = refresh(client, first)
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == "Refresh token reused"
+    response = refresh(client, second)
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == "Invalid refresh token"
+
+    response = refresh(client, other_session)
+    assert response.status_code == 200, response.text
+
+
 def test_refresh_token_invalid(client):
     response = client.get("/api/auth/refresh_token", headers={
         "Authorization": "Bearer invalid_token"
@@ -129,3 +188,11 @@ def test_request_email_already_confirmed(client, session, user):
     response = client.post("/api/auth/request_email", json={"email": user.get("email")})
     data = response.json()
     assert data["message"] == "Your email is already confirmed."
+
+
+def test_request_email_unknown_user(client, session):
+    response = client.post("/api/auth/request_email", json={"email": "nobody@example.com"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["message"] == "Check your email for confirmation."
+    assert session.query(EmailOutbox).filter(EmailOutbox.recipient == "nobody@example.com").count() == 0
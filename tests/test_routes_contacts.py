@@ -0,0 +1,216 @@
+import json
+
+import fakeredis
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from src.conf.config import settings
+from src.database.models import User
+from src.services.cache import response_cache
+from src.services.contacts_import import MAX_RECORD_LENGTH
+
+
+@pytest.fixture(scope="module")
+def token(client, session, user):
+    response = client.post("/api/auth/signup", json=user)
+    assert response.status_code == 201, response.text
+    current_user: User = session.query(User).filter(User.email == user.get("email")).first()
+    current_user.confirmed = True
+    session.commit()
+    response = client.post("/api/auth/login", data={"username": user.get("email"), "password": user.get("password")})
+    assert response.status_code == 200, response.text
+    return response.json()["access_token"]
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(response_cache, "redis", fakeredis.FakeAsyncRedis())
+    return response_cache
+
+
+def auth(token: str, **headers) -> dict:
+    return {"Authorization": f"Bearer {token}", **headers}
+
+
+def test_import_csv_reports_failed_lines(client, token):
+    body = ("first_name,last_name,email,phone,birthday\n"
+            "Taras,Shevchenko,taras@kobzar.ua,380501234567,1814-03-09\n"
+            "Lesya,Ukrainka,lesya@example.com,380501234568,not-a-date\n"
+            "Ivan,Franko,ivan@example.com,380501234569,1856-08-27\n"
+            "Ivan,Franko,ivan@example.com,380501234569,1856-08-27\n"
+            "Panteleimon,Kulish\n")
+    response = client.post("/api/contacts/import", content=body.encode(),
+                           headers=auth(token, **{"Content-Type": "text/csv"}))
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["failed"] == 3
+    assert [error["line"] for error in data["errors"]] == [3, 6, 5]
+    assert data["errors"][0]["detail"].startswith("birthday: ")
+    assert data["errors"][1]["detail"] == "Expected 5 fields, got 2"
+    assert data["errors"][2]["detail"] == "Duplicate email in the import"
+
+
+def test_import_ndjson_reports_existing_contacts(client, token):
+    rows = [
+        {"first_name": "Taras", "last_name": "Shevchenko", "email": "taras@kobzar.ua",
+         "phone": "380501234567", "birthday": "1814-03-09"},
+        {"first_name": "Marko", "last_name": "Vovchok", "email": "marko@example.com",
+         "phone": "380501234570", "birthday": "1833-12-22"},
+    ]
+    body = "\n".join(map(json.dumps, rows)) + "\n{broken\n"
+    response = client.post("/api/contacts/import", content=body.encode(),
+                           headers=auth(token, **{"Content-Type": "application/x-ndjson"}))
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["imported"] == 1
+    assert data["failed"] == 2
+    assert data["errors"][0]["line"] == 3
+    assert data["errors"][0]["detail"].startswith("Invalid JSON: ")
+    assert data["errors"][1] == {"line": 1, "detail": "Contact with this email already exists"}
+
+
+def test_import_unsupported_media_type(client, token):
+    response = client.post("/api/contacts/import", content=b"{}", headers=auth(token, **{"Content-Type": "text/plain"}))
+    assert response.status_code == 415, response.text
+
+
+def test_import_record_too_long(client, token):
+    def body():
+        yield b"first_name,last_name,email,phone,birthday\n"
+        for _ in range(MAX_RECORD_LENGTH // 1024 + 10):
+            yield b"x" * 1024
+
+    response = client.post("/api/contacts/import", content=body(), headers=auth(token, **{"Content-Type": "text/csv"}))
+    assert response.status_code == 413, response.text
+    assert response.json()["detail"] == f"Record on line 2 is longer than {MAX_RECORD_LENGTH} characters"
+
+
+def test_export_streams_the_imported_contacts(client, token):
+    response = client.get("/api/contacts/export", params={"format": "ndjson"}, headers=auth(token))
+    assert response.status_code == 200, response.text
+    assert response.headers["content-disposition"] == 'attachment; filename="contacts.ndjson"'
+    contacts = [json.loads(line) for line in response.text.splitlines()]
+    assert [contact["email"] for contact in contacts] == ["taras@kobzar.ua", "ivan@example.com", "marko@example.com"]
+
+    response = client.get("/api/contacts/export", params={"format": "csv", "last_name": "Franko"},
+                          headers=auth(token))
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/csv")
+    header, row = response.text.splitlines()
+    assert header == "id,first_name,last_name,email,phone,birthday,additional_info,created_at"
+    assert row.startswith(f"{contacts[1]['id']},Ivan,Franko,ivan@example.com,380501234569,1856-08-27,,")
+
+
+def contact_body(name: str, email: str) -> dict:
+    return {"first_name": name, "last_name": "Kosach", "email": email, "phone": "380501234571",
+            "birthday": "1871-02-25"}
+
+
+def test_create_contact_with_taken_email(client, token):
+    response = client.post("/api/contacts/", json=contact_body("Olena", "olena@example.com"), headers=auth(token))
+    assert response.status_code == 201, response.text
+    response = client.post("/api/contacts/", json=contact_body("Olha", "olena@example.com"), headers=auth(token))
+    assert response.status_code == 409, response.text
+    assert response.json()["detail"] == "Contact with this email already exists"
+
+
+def test_update_contact_to_taken_email(client, token):
+    response = client.post("/api/contacts/", json=contact_body("Mykhailo", "mykhailo@example.com"),
+                           headers=auth(token))
+    assert response.status_code == 201, response.text
+    contact_id = response.json()["id"]
+
+    response = client.put(f"/api/contacts/{contact_id}", json=contact_body("Mykhailo", "olena@example.com"),
+                          headers=auth(token))
+    assert response.status_code == 409, response.text
+    response = client.patch(f"/api/contacts/{contact_id}", json={"email": "olena@example.com"}, headers=auth(token))
+    assert response.status_code == 409, response.text
+    assert response.json()["detail"] == "Contact with this email already exists"
+
+    response = client.patch(f"/api/contacts/{contact_id}", json={"phone": "380501234572"}, headers=auth(token))
+    assert response.status_code == 200, response.text
+    assert response.json()["email"] == "mykhailo@example.com"
+
+
+def test_update_contact_with_null_field(client, token):
+    response = client.post("/api/contacts/", json=contact_body("Oleh", "oleh@example.com"), headers=auth(token))
+    assert response.status_code == 201, response.text
+    body = dict(contact_body("Oleh", "oleh@example.com"), first_name=None)
+
+    response = client.put(f"/api/contacts/{response.json()['id']}", json=body, headers=auth(token))
+    assert response.status_code == 422, response.text
+    assert response.json()["detail"][0]["loc"] == ["body", "first_name"]
+
+
+def test_other_integrity_errors_are_not_reported_as_conflicts(client, token, monkeypatch):
+    async def create_contact(*args):
+        raise IntegrityError("INSERT", {}, Exception("NOT NULL constraint failed: contacts.first_name"))
+
+    monkeypatch.setattr("src.repository.contacts.create_contact", create_contact)
+    with pytest.raises(IntegrityError):
+        client.post("/api/contacts/", json=contact_body("Oleh", "oleh.2@example.com"), headers=auth(token))
+
+
+def test_unchanged_list_is_not_modified(client, token, cache):
+    response = client.get("/api/contacts/", headers=auth(token))
+    assert response.status_code == 200, response.text
+    etag = response.headers["etag"]
+
+    response = client.get("/api/contacts/", headers=auth(token, **{"If-None-Match": etag}))
+    assert response.status_code == 304, response.text
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = client.get("/api/contacts/", headers=auth(token, **{"If-None-Match": etag, "Cache-Control": "no-cache"}))
+    assert response.status_code == 304, response.text
+
+
+@pytest.mark.parametrize("method, body", [
+    ("put", contact_body("Mykhailo", "kotsiubynsky@example.com")),
+    ("patch", {"additional_info": "writer"}),
+    ("delete", None),
+])
+def test_writes_change_the_etags(client, token, cache, method, body):
+    response = client.post("/api/contacts/", json=contact_body("Vasyl", f"vasyl.{method}@example.com"),
+                           headers=auth(token))
+    assert response.status_code == 201, response.text
+    contact_id = response.json()["id"]
+    list_etag = client.get("/api/contacts/", headers=auth(token)).headers["etag"]
+    contact_etag = client.get(f"/api/contacts/{contact_id}", headers=auth(token)).headers["etag"]
+    response = client.get(f"/api/contacts/{contact_id}", headers=auth(token, **{"If-None-Match": contact_etag}))
+    assert response.status_code == 304, response.text
+
+    response = client.request(method, f"/api/contacts/{contact_id}", json=body, headers=auth(token))
+    assert response.status_code == 200, response.text
+
+    response = client.get("/api/contacts/", headers=auth(token, **{"If-None-Match": list_etag}))
+    assert response.status_code == 200, response.text
+    assert response.headers["etag"] != list_etag
+    response = client.get(f"/api/contacts/{contact_id}", headers=auth(token, **{"If-None-Match": contact_etag}))
+    if method == "delete":
+        assert response.status_code == 404, response.text
+    else:
+        assert response.status_code == 200, response.text
+        assert response.headers["etag"] != contact_etag
+
+
+def test_write_invalidates_cached_list(client, token, cache):
+    client.get("/api/contacts/", params={"fields": "id,email"}, headers=auth(token))
+    hits, misses = cache.hits, cache.misses
+    response = client.get("/api/contacts/", params={"fields": "id,email"}, headers=auth(token))
+    assert (cache.hits, cache.misses) == (hits + 1, misses)
+    contact_id = response.json()[0]["id"]
+
+    response = client.patch(f"/api/contacts/{contact_id}", json={"email": "taras.hryhorovych@example.com"},
+                            headers=auth(token))
+    assert response.status_code == 200, response.text
+
+    response = client.get("/api/contacts/", params={"fields": "id,email"}, headers=auth(token))
+    assert (cache.hits, cache.misses) == (hits + 1, misses + 1)
+    assert response.json()[0] == {"id": contact_id, "email": "taras.hryhorovych@example.com"}
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.conf.config import settings
+from src.database.pool import InstrumentedAsyncQueuePool
+
+
+@pytest.fixture
+def internal_token(monkeypatch):
+    monkeypatch.setattr(settings, "internal_api_token", "internal-secret")
+    return "internal-secret"
+
+
+@pytest.mark.parametrize("path", ["/internal/pool", "/internal/cache", "/internal/rate-limit"])
+def test_internal_endpoints_are_disabled_without_a_token(client, monkeypatch, path):
+    monkeypatch.setattr(settings, "internal_api_token", None)
+    response = client.get(path, headers={"X-Internal-Token": ""})
+    assert response.status_code == 404, response.text
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Internal-Token": "wrong"}])
+def test_internal_endpoints_require_the_token(client, internal_token, headers):
+    response = client.get("/internal/pool", headers=headers)
+    assert response.status_code == 403, response.text
+
+
+@pytest.fixture
+def instrumented_engine(monkeypatch):
+    # The application engine keeps SQLite's default pool, so the route is pointed at an instrumented one
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=InstrumentedAsyncQueuePool, pool_size=2)
+    monkeypatch.setattr("src.routes.internal.engine", engine)
+    yield engine
+    engine.sync_engine.dispose()
+
+
+def test_read_pool_status(client, internal_token, instrumented_engine):
+    response = client.get("/internal/pool", headers={"X-Internal-Token": internal_token})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["pool_class"] == "InstrumentedAsyncQueuePool"
+    assert {"size", "checked_out", "overflow", "timeouts", "checkout_wait", "connect_latency"} <= data.keys()
+    assert data["checkout_wait"]["buckets"]["+Inf"] == data["checkout_wait"]["count"]
@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.pool import Histogram, InstrumentedAsyncQueuePool, PoolMetrics, pool_status
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_snapshot_is_cumulative(self):
+        histogram = Histogram(buckets=(0.01, 0.1))
+        for value in (0.001, 0.01, 0.05, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.snapshot(), {"buckets": {"0.01": 2, "0.1": 3, "+Inf": 4}, "count": 4, "sum": 3.061})
+
+
+class TestInstrumentedAsyncQueuePool(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        metrics_patcher = patch("src.database.pool.pool_metrics", new=PoolMetrics())
+        self.metrics = metrics_patcher.start()
+        self.addCleanup(metrics_patcher.stop)
+        self.engine = create_async_engine("sqlite+aiosqlite://", poolclass=InstrumentedAsyncQueuePool,
+                                          pool_size=1, max_overflow=0, pool_timeout=0.05)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_records_checkouts_and_connects(self):
+        for _ in range(3):
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        status = pool_status(self.engine.sync_engine.pool)
+        self.assertEqual(status["pool_class"], "InstrumentedAsyncQueuePool")
+        self.assertEqual((status["size"], status["checked_in"], status["checked_out"]), (1, 1, 0))
+        self.assertEqual(status["checkout_wait"]["count"], 3)
+        self.assertEqual(status["connect_latency"]["count"], 1)
+        self.assertEqual(status["timeouts"], 0)
+
+    async def test_counts_checkout_timeouts(self):
+        async with self.engine.connect():
+            with self.assertRaises(exc.TimeoutError):
+                async with self.engine.connect():
+                    pass
+            self.assertEqual(pool_status(self.engine.sync_engine.pool)["checked_out"], 1)
+
+        self.assertEqual(self.metrics.timeouts, 1)
+        self.assertEqual(self.metrics.checkout_wait.count, 2)
+        self.assertGreaterEqual(self.metrics.checkout_wait.sum, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,43 +1,65 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-from src.database.models import Contact, User
-from src.schemas import ContactCreate, ContactUpdate
+from src.database.models import Base, Contact, User
+from src.schemas import (BatchCreate, BatchDelete, BatchUpdate, ContactCreate, ContactUpdate, ContactPatch,
+                         ContactOrder, contact_fields_model, parse_contact_fields)
 from src.repository.contacts import (
+    apply_batch,
+    count_contacts,
+    import_contacts,
     get_contacts,
     get_contact,
     create_contact,
     remove_contact,
     update_contact,
+    patch_contact,
+    get_contact_version,
+    get_collection_stats,
     search_contacts,
+    full_text_search,
     get_upcoming_birthdays,
+    encode_cursor,
+    decode_cursor,
+    _unpack_cursor,
 )
 
 from datetime import date, timedelta
 
 
+def decode_rank_cursor(cursor: str) -> list:
+    return _unpack_cursor(cursor, "rank", 2)
+
+
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.user = User(id=1)
+        cache_patcher = patch("src.repository.contacts.response_cache", new=AsyncMock())
+        self.response_cache = cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
 
     async def test_get_contacts(self):
         contacts = [Contact(), Contact(), Contact()]
-        self.session.query().filter().offset().limit().all.return_value = contacts
+        self.result.scalars().all.return_value = contacts
         result = await get_contacts(skip=0, limit=10, user=self.user, db=self.session)
         self.assertEqual(result, contacts)
 
     async def test_get_contact_found(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = contact
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_get_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
@@ -49,24 +71,30 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             phone="+380501234567",
             birthday="2024-09-28"
         )
+        contact = Contact()
+        self.result.scalar_one.return_value = contact
         result = await create_contact(body=body, user=self.user, db=self.session)
-        self.assertEqual(result.first_name, body.first_name)
-        self.assertEqual(result.last_name, body.last_name)
-        self.assertEqual(result.email, body.email)
-        self.assertEqual(result.phone, body.phone)
-        self.assertEqual(result.birthday, body.birthday)
-        self.assertTrue(hasattr(result, "id"))
+        self.assertEqual(result, contact)
+        stmt = self.session.execute.call_args_list[0].args[0]
+        params = stmt.compile().params
+        self.assertEqual(params["first_name"], body.first_name)
+        self.assertEqual(params["birthday_key"], 928)
+        self.assertEqual(params["user_id"], self.user.id)
+        self.assertIn("RETURNING", str(stmt))
+        self.session.refresh.assert_not_called()
+        self.response_cache.invalidate.assert_awaited_once_with(self.user.id)
 
     async def test_remove_contact_found(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = contact
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_remove_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
+        self.response_cache.invalidate.assert_not_awaited()
 
     async def test_update_contact_found(self):
         body = ContactUpdate(
@@ -78,8 +106,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             additional_info="optional text"
         )
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
-        self.session.commit.return_value = None
+        self.result.scalar_one_or_none.return_value = contact
         result = await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
@@ -92,20 +119,61 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             birthday="2024-09-28",
             additional_info="optional text"
         )
-        self.session.query().filter().first.return_value = None
-        self.session.commit.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         result = await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertIsNone(result)
 
+    async def test_patch_contact_writes_provided_fields(self):
+        contact = Contact()
+        self.result.scalar_one_or_none.return_value = contact
+        body = ContactPatch(phone="+380671234567", birthday="1990-02-14")
+        result = await patch_contact(contact_id=1, body=body, user=self.user, db=self.session)
+        self.assertEqual(result, contact)
+        # The UPDATE, then the bump of the collection version
+        self.assertEqual(self.session.execute.await_count, 2)
+        stmt = self.session.execute.call_args_list[0].args[0]
+        params = stmt.compile().params
+        self.assertLessEqual({"phone", "birthday", "birthday_key"}, set(params))
+        self.assertFalse({"first_name", "last_name", "email", "additional_info"} & set(params))
+        self.assertIn("RETURNING", str(stmt))
+
+    async def test_patch_contact_without_fields(self):
+        contact = Contact()
+        self.result.scalar_one_or_none.return_value = contact
+        result = await patch_contact(contact_id=1, body=ContactPatch(), user=self.user, db=self.session)
+        self.assertEqual(result, contact)
+        self.session.commit.assert_not_called()
+        self.response_cache.invalidate.assert_not_awaited()
+
+    def test_contact_patch_rejects_null_required_fields(self):
+        with self.assertRaises(ValidationError):
+            ContactPatch(first_name=None)
+        self.assertIsNone(ContactPatch(additional_info=None).additional_info)
+
+    async def test_get_contact_version(self):
+        self.result.scalar_one_or_none.return_value = 3
+        result = await get_contact_version(contact_id=1, user=self.user, db=self.session)
+        self.assertEqual(result, 3)
+
+    async def test_get_collection_stats(self):
+        self.result.one_or_none.return_value = (5, 42)
+        result = await get_collection_stats(user=self.user, db=self.session)
+        self.assertEqual(result, (5, 42))
+
+    async def test_get_collection_stats_without_writes(self):
+        self.result.one_or_none.return_value = None
+        result = await get_collection_stats(user=self.user, db=self.session)
+        self.assertEqual(result, (0, 0))
+
     async def test_search_contacts_found(self):
         contact = Contact(id=1, first_name="Taras", last_name="Tarasiuk", email="taras@example.com", phone="+380509876543", birthday="2024-09-28")
         contacts = [contact]
-        self.session.query().filter().filter().all.return_value = contacts
+        self.result.scalars().all.return_value = contacts
         result = await search_contacts(self.session, first_name="John", last_name=None, email=None, user=self.user)
         self.assertEqual(result, contacts)
 
     async def test_search_contacts_not_found(self):
-        self.session.query().filter().filter().all.return_value = []
+        self.result.scalars().all.return_value = []
         result = await search_contacts(self.session, first_name="Abc", last_name=None, email=None, user=self.user)
         self.assertEqual(result, [])
 
@@ -113,11 +181,223 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         today = date.today()
         upcoming_birthday = today + timedelta(days=5)
         contact = Contact(id=1, first_name="Taras", last_name="Tarasiuk", email="taras@example.com", phone="+380509876543", birthday=upcoming_birthday)
-        self.session.query().filter().all.return_value = [contact]
-        result = get_upcoming_birthdays(db=self.session, user=self.user)
+        self.result.scalars().all.return_value = [contact]
+        result = await get_upcoming_birthdays(db=self.session, user=self.user)
         self.assertEqual(result, [contact])
 
     async def test_get_upcoming_birthdays_not_found(self):
-        self.session.query().filter().all.return_value = []
-        result = get_upcoming_birthdays(db=self.session, user=self.user)
+        self.result.scalars().all.return_value = []
+        result = await get_upcoming_birthdays(db=self.session, user=self.user)
         self.assertEqual(result, [])
+
+    async def test_get_contacts_with_cursor(self):
+        contacts = [Contact(id=11), Contact(id=12)]
+        self.result.scalars().all.return_value = contacts
+        cursor = encode_cursor(Contact(id=10), ContactOrder.id)
+        result = await get_contacts(skip=0, limit=2, user=self.user, db=self.session, cursor=cursor)
+        self.assertEqual(result, contacts)
+        stmt = self.session.execute.call_args.args[0]
+        self.assertIsNone(stmt._offset_clause)
+
+    async def test_get_contacts_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            await get_contacts(skip=0, limit=2, user=self.user, db=self.session, cursor="not-a-cursor")
+
+    def test_decode_cursor(self):
+        contact = Contact(id=5, first_name="Taras", last_name="Tarasiuk")
+        cursor = encode_cursor(contact, ContactOrder.name)
+        self.assertEqual(decode_cursor(cursor, ContactOrder.name), ["Tarasiuk", "Taras", 5])
+        with self.assertRaises(ValueError):
+            decode_cursor(cursor, ContactOrder.id)
+
+    async def test_search_contacts_escapes_wildcards(self):
+        self.result.scalars().all.return_value = []
+        await search_contacts(self.session, first_name="50%_off", last_name=None, email=None, user=self.user)
+        stmt = self.session.execute.call_args.args[0]
+        self.assertIn("50\\%\\_off", str(stmt.compile(compile_kwargs={"literal_binds": True})))
+
+    async def test_full_text_search(self):
+        contacts = [Contact(id=2), Contact(id=7)]
+        self.result.all.return_value = [(contacts[0], 3), (contacts[1], 1)]
+        result, next_cursor = await full_text_search("taras kyiv", limit=2, user=self.user, db=self.session)
+        self.assertEqual(result, contacts)
+        self.assertIsNotNone(next_cursor)
+
+    async def test_get_contacts_loads_requested_columns(self):
+        rows = [MagicMock(id=1, phone="+380501234567")]
+        self.result.all.return_value = rows
+        result = await get_contacts(skip=0, limit=10, user=self.user, db=self.session, order=ContactOrder.name,
+                                    fields=("phone",))
+        self.assertEqual(result, rows)
+        stmt = self.session.execute.call_args.args[0]
+        self.assertEqual([column.name for column in stmt.selected_columns], ["phone", "last_name", "first_name", "id"])
+
+    async def test_full_text_search_loads_requested_columns(self):
+        rows = [MagicMock(id=2), MagicMock(id=7)]
+        for row, rank in zip(rows, (3, 1)):
+            row.__getitem__.side_effect = lambda index, rank=rank: rank
+        self.result.all.return_value = rows
+        result, next_cursor = await full_text_search("taras", limit=2, user=self.user, db=self.session,
+                                                     fields=("first_name",))
+        self.assertEqual(result, rows)
+        self.assertEqual(decode_rank_cursor(next_cursor), [1, 7])
+        stmt = self.session.execute.call_args.args[0]
+        self.assertEqual([column.name for column in stmt.selected_columns], ["first_name", "id", "rank"])
+
+    def test_parse_contact_fields(self):
+        self.assertEqual(parse_contact_fields(" phone,id ,first_name,phone"), ("first_name", "phone", "id"))
+        self.assertIsNone(parse_contact_fields(""))
+        with self.assertRaises(ValueError):
+            parse_contact_fields("id,password")
+        model = contact_fields_model(("first_name", "id"))
+        self.assertEqual(model.model_validate(Contact(id=1, first_name="Taras", phone="1")).model_dump(),
+                         {"first_name": "Taras", "id": 1})
+
+    async def test_full_text_search_last_page(self):
+        self.result.all.return_value = []
+        result, next_cursor = await full_text_search("abc", limit=2, user=self.user, db=self.session)
+        self.assertEqual(result, [])
+        self.assertIsNone(next_cursor)
+
+
+class TestUpcomingBirthdays(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.user, other = User(email="user@example.com", password="secret"), User(email="other@example.com", password="secret")
+        self.session.add_all([self.user, other])
+        await self.session.flush()
+        birthdays = {
+            "new_year": date(1990, 1, 1),
+            "january": date(1985, 1, 3),
+            "december": date(2000, 12, 30),
+            "leap_day": date(1996, 2, 29),
+            "summer": date(1970, 7, 15),
+        }
+        for name, birthday in birthdays.items():
+            self.session.add(Contact(first_name=name, last_name="contact", email=f"{name}@example.com",
+                                     phone="+380501234567", birthday=birthday, user_id=self.user.id))
+        self.session.add(Contact(first_name="stranger", last_name="contact", email="stranger@example.com",
+                                 phone="+380501234567", birthday=date(1990, 12, 31), user_id=other.id))
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def upcoming(self, today: date, days: int) -> list:
+        contacts = await get_upcoming_birthdays(db=self.session, user=self.user, days=days, today=today)
+        return [contact.first_name for contact in contacts]
+
+    async def test_window_within_month(self):
+        self.assertEqual(await self.upcoming(date(2024, 7, 10), 7), ["summer"])
+
+    async def test_window_wraps_year_end(self):
+        self.assertEqual(await self.upcoming(date(2024, 12, 28), 7), ["december", "new_year", "january"])
+
+    async def test_window_crosses_months(self):
+        self.assertEqual(await self.upcoming(date(2023, 2, 25), 5), ["leap_day"])
+
+    async def test_window_longer_than_month(self):
+        self.assertEqual(await self.upcoming(date(2024, 11, 1), 90), ["december", "new_year", "january"])
+
+    async def test_window_of_a_year_returns_everyone_by_days_until(self):
+        self.assertEqual(await self.upcoming(date(2024, 7, 16), 365),
+                         ["december", "new_year", "january", "leap_day", "summer"])
+
+
+class TestApplyBatch(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.user, other = User(email="user@example.com", password="secret"), User(email="other@example.com", password="secret")
+        self.session.add_all([self.user, other])
+        await self.session.flush()
+        self.contacts = [
+            Contact(first_name=name, last_name="contact", email=f"{name}@example.com", phone="+380501234567",
+                    birthday=date(1990, 1, 1), user_id=self.user.id)
+            for name in ("taras", "lesya", "ivan")
+        ]
+        self.stranger = Contact(first_name="stranger", last_name="contact", email="stranger@example.com",
+                                phone="+380501234567", birthday=date(1990, 1, 1), user_id=other.id)
+        self.session.add_all(self.contacts + [self.stranger])
+        await self.session.commit()
+        self.statements = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: self.statements.append(statement.split()[0]))
+        cache_patcher = patch("src.repository.contacts.response_cache", new=AsyncMock())
+        self.response_cache = cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    def body(self, name: str, birthday: date = date(2000, 5, 17)) -> ContactCreate:
+        return ContactCreate(first_name=name, last_name="contact", email=f"{name}@example.com",
+                             phone="+380501234567", birthday=birthday)
+
+    async def test_applies_operations_set_based(self):
+        taras, lesya, ivan = (contact.id for contact in self.contacts)
+        operations = [BatchCreate(op="create", contact=self.body(f"new{i}")) for i in range(50)] + [
+            BatchUpdate(op="update", id=lesya, contact=self.body("lesya", date(1871, 2, 25))),
+            BatchDelete(op="delete", id=taras),
+        ]
+        results = await apply_batch(operations, self.user, self.session)
+
+        self.assertEqual([result.status for result in results], [201] * 50 + [200, 204])
+        self.assertEqual(results[0].contact.email, "new0@example.com")
+        self.assertEqual(len({result.id for result in results}), 52)
+        # The last INSERT bumps the version of the user's contacts collection
+        self.assertEqual(self.statements, ["SELECT", "DELETE", "UPDATE", "INSERT", "INSERT"])
+
+        rows = await self.session.execute(select(Contact.id, Contact.birthday_key).filter(Contact.user_id == self.user.id))
+        keys = dict(rows.all())
+        self.assertNotIn(taras, keys)
+        self.assertIn(ivan, keys)
+        self.assertEqual(keys[lesya], 225)
+        self.assertEqual(keys[results[0].id], 517)
+        # 50 created, 1 deleted
+        self.assertEqual(await get_collection_stats(self.user, self.session), (1, 49))
+
+    async def test_rejected_operations_dont_free_emails_or_lock_contacts(self):
+        taras, lesya, ivan = self.contacts
+        operations = [
+            BatchUpdate(op="update", id=taras.id, contact=self.body("lesya")),
+            BatchDelete(op="delete", id=taras.id),
+            BatchCreate(op="create", contact=self.body("taras")),
+            BatchCreate(op="create", contact=self.body("ivan")),
+            BatchDelete(op="delete", id=ivan.id),
+            BatchDelete(op="delete", id=ivan.id),
+        ]
+        results = await apply_batch(operations, self.user, self.session)
+
+        self.assertEqual([result.status for result in results], [409, 204, 201, 409, 204, 409])
+        self.assertEqual(results[0].detail, "Contact with this email already exists")
+        self.assertEqual(results[5].detail, "Contact is already changed in this batch")
+        rows = await self.session.execute(select(Contact.email).filter(Contact.user_id == self.user.id))
+        self.assertEqual(sorted(rows.scalars()), ["lesya@example.com", "taras@example.com"])
+
+    async def test_writes_maintain_versions_and_totals(self):
+        taras = self.contacts[0]
+        self.assertEqual(await get_collection_stats(self.user, self.session), (0, 0))
+        self.assertEqual(await get_contact_version(taras.id, self.user, self.session), 1)
+
+        await patch_contact(taras.id, ContactPatch(phone="+380671234567"), self.user, self.session)
+        await apply_batch([BatchDelete(op="delete", id=self.stranger.id)], self.user, self.session)
+        self.assertEqual(await get_contact_version(taras.id, self.user, self.session), 2)
+        self.assertEqual(await get_collection_stats(self.user, self.session), (1, 0))
+
+        await create_contact(self.body("mykola"), self.user, self.session)
+        await import_contacts([self.body("olena"), self.body("lesya")], self.user, self.session)
+        await remove_contact(taras.id, self.user, self.session)
+        self.assertIsNone(await get_contact_version(taras.id, self.user, self.session))
+        # The stats started empty for the contacts added in setUp, so the counter is relative to them
+        self.assertEqual(await get_collection_stats(self.user, self.session), (4, 1))
+        self.assertEqual(await count_contacts(self.user, self.session), 4)
@@ -1,13 +1,14 @@
 import unittest
-from unittest.mock import MagicMock
-from sqlalchemy.orm import Session
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-from src.database.models import User
+from src.database.models import Base, User
 from src.schemas import UserModel
 from src.repository.users import (
     get_user_by_email,
     create_user,
-    update_token,
+    update_password,
     confirmed_email,
     update_avatar,
 )
@@ -16,49 +17,107 @@ from src.repository.users import (
 class TestUsers(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.usermodel = UserModel(username="testname", email="test@email.com", password="secret_password")
+        cache_patcher = patch("src.repository.users.user_cache", new=AsyncMock())
+        self.user_cache = cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
 
     async def test_get_user_by_email_found(self):
         user = User(id=1, username="testname", email=self.usermodel.email)
-        self.session.query().filter().first.return_value = user
+        self.result.scalar_one_or_none.return_value = user
         result = await get_user_by_email(email=self.usermodel.email, db=self.session)
         self.assertEqual(result, user)
 
     async def test_get_user_by_email_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         result = await get_user_by_email(email="abc@email.com", db=self.session)
         self.assertIsNone(result)
 
     async def test_create_user(self):
-        self.session.add = MagicMock()
-        self.session.commit = MagicMock()
-        self.session.refresh = MagicMock()
+        user = User(id=1, username=self.usermodel.username, email=self.usermodel.email)
+        self.result.scalar_one_or_none.return_value = user
         result = await create_user(body=self.usermodel, db=self.session)
-        self.assertEqual(result.username, self.usermodel.username)
-        self.assertEqual(result.email, self.usermodel.email)
-        self.assertTrue(hasattr(result, "id"))
-        self.session.add.assert_called_once()
+        self.assertEqual(result, user)
+        self.session.execute.assert_awaited_once()
         self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once()
 
-    async def test_update_token(self):
-        user = User(id=1, username="testname", email=self.usermodel.email)
-        self.session.query().filter().first.return_value = user
-        await update_token(user=user, token="new_token", db=self.session)
-        self.assertEqual(user.refresh_token, "new_token")
-        self.session.commit.assert_called_once()
+    async def test_create_user_exists(self):
+        self.result.scalar_one_or_none.return_value = None
+        result = await create_user(body=self.usermodel, db=self.session)
+        self.assertIsNone(result)
+        self.session.commit.assert_not_called()
 
     async def test_confirmed_email(self):
-        user = User(id=1, username="testname", email=self.usermodel.email, confirmed=False)
-        self.session.query().filter().first.return_value = user
-        await confirmed_email(email=self.usermodel.email, db=self.session)
-        self.assertTrue(user.confirmed)
+        user = User(id=1, username="testname", email=self.usermodel.email, confirmed=True)
+        self.result.scalar_one_or_none.return_value = user
+        result = await confirmed_email(email=self.usermodel.email, db=self.session)
+        self.assertEqual(result, user)
+        self.session.execute.assert_awaited_once()
         self.session.commit.assert_called_once()
+        self.user_cache.invalidate.assert_awaited_once_with(self.usermodel.email)
+
+    async def test_confirmed_email_not_updated(self):
+        self.result.scalar_one_or_none.return_value = None
+        result = await confirmed_email(email=self.usermodel.email, db=self.session)
+        self.assertIsNone(result)
+        self.session.commit.assert_not_called()
+        self.user_cache.invalidate.assert_not_awaited()
 
     async def test_update_avatar(self):
         user = User(id=1, username="testname", email=self.usermodel.email, avatar="avatar")
-        self.session.query().filter().first.return_value = user
-        result = await update_avatar(email=self.usermodel.email, url="new_avatar", db=self.session)
+        updated = User(id=1, username="testname", email=self.usermodel.email, avatar="new_avatar")
+        self.result.scalar_one_or_none.return_value = updated
+        result = await update_avatar(user=user, url="new_avatar", db=self.session)
         self.assertEqual(result.avatar, "new_avatar")
+        self.session.execute.assert_awaited_once()
+        self.session.commit.assert_called_once()
+        self.user_cache.invalidate.assert_awaited_once_with(self.usermodel.email)
+
+    async def test_update_password(self):
+        user = User(id=1, username="testname", email=self.usermodel.email, password="old_hash")
+        await update_password(user=user, password="new_hash", db=self.session)
+        self.assertEqual(user.password, "new_hash")
         self.session.commit.assert_called_once()
+
+
+class TestUsersSQLite(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs the user writes against SQLite, counting the statements each one takes.
+    """
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.statements = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: self.statements.append(statement))
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.usermodel = UserModel(username="testname", email="test@email.com", password="secret_password")
+        cache_patcher = patch("src.repository.users.user_cache", new=AsyncMock())
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def test_signup_flow(self):
+        user = await create_user(body=self.usermodel, db=self.session)
+        self.assertEqual((user.email, user.confirmed), (self.usermodel.email, False))
+        self.assertIsNotNone(user.created_at)
+        self.assertIsNone(await create_user(body=self.usermodel, db=self.session))
+
+        self.statements.clear()
+        self.assertTrue((await confirmed_email(self.usermodel.email, self.session)).confirmed)
+        self.assertIsNone(await confirmed_email(self.usermodel.email, self.session))
+        self.assertIsNone(await confirmed_email("unknown@email.com", self.session))
+        self.assertEqual(len(self.statements), 3)
+
+        self.statements.clear()
+        updated = await update_avatar(user, "new_avatar", self.session)
+        self.assertEqual((updated.id, updated.avatar, updated.confirmed), (user.id, "new_avatar", True))
+        self.assertEqual(len(self.statements), 1)
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from jose import JWTError, jwt
+
+from src.services.auth import Auth
+
+
+class TestAccessTokenCache(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.auth = Auth()
+        self.auth.token_cache.clear()
+        self.auth.revoked_tokens.clear()
+        self.token = await self.auth.create_access_token(data={"sub": "test@email.com"})
+
+    async def test_decode_verifies_signature_once(self):
+        with patch("src.services.auth.jwt.decode", wraps=jwt.decode) as decode:
+            first = self.auth.decode_access_token(self.token)
+            second = self.auth.decode_access_token(self.token)
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first["sub"], "test@email.com")
+
+    async def test_expired_token_is_not_cached(self):
+        token = await self.auth.create_access_token(data={"sub": "test@email.com"}, expires_delta=-1)
+        with self.assertRaises(JWTError):
+            self.auth.decode_access_token(token)
+        self.assertEqual(len(self.auth.token_cache), 0)
+
+    async def test_cache_entry_expires_with_token(self):
+        token = await self.auth.create_access_token(data={"sub": "test@email.com"}, expires_delta=5)
+        with patch("src.services.cache.time.monotonic", return_value=1000.0):
+            self.auth.decode_access_token(token)
+        with patch("src.services.cache.time.monotonic", return_value=1010.0):
+            self.assertIsNone(self.auth.token_cache.get(self.auth._token_key(token)))
+
+    async def test_revoked_token_is_rejected(self):
+        self.auth.decode_access_token(self.token)
+        self.auth.revoke_token(self.token)
+        with self.assertRaises(JWTError):
+            self.auth.decode_access_token(self.token)
+
+
+class TestEmailTokens(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.auth = Auth()
+
+    async def test_batch_tokens_match_single_tokens(self):
+        emails = ["taras@example.com", "тарас@example.com"]
+        with patch("src.services.auth.datetime", wraps=datetime) as now:
+            now.utcnow.return_value = datetime(2026, 10, 17, 12, 30, 15)
+            for algorithm in ("HS256", "HS512"):
+                with self.subTest(algorithm=algorithm), patch.object(self.auth, "ALGORITHM", algorithm):
+                    tokens = self.auth.create_email_tokens(emails)
+                    self.assertEqual(tokens, [self.auth.create_email_token({"sub": email}) for email in emails])
+
+    async def test_batch_tokens_are_valid(self):
+        token, = self.auth.create_email_tokens(["taras@example.com"])
+        claims = jwt.get_unverified_claims(token)
+        self.assertEqual(claims["exp"] - claims["iat"], 7 * 24 * 60 * 60)
+        self.assertEqual(await self.auth.get_email_from_token(token), "taras@example.com")
+
+
+class TestPasswordHashing(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.auth = Auth()
+        self.auth.hash_max_pending = 3
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def slow_hash(self, password: str) -> str:
+        self.release.wait(5)
+        return f"hashed-{password}"
+
+    async def test_sheds_load_beyond_the_queue(self):
+        with patch.object(self.auth.pwd_context, "hash", side_effect=self.slow_hash):
+            pending = [asyncio.create_task(self.auth.get_password_hash(f"p{i}")) for i in range(3)]
+            await asyncio.sleep(0)
+            self.assertEqual(self.auth.hash_pending, 3)
+
+            with self.assertRaises(HTTPException) as err:
+                await self.auth.get_password_hash("one too many")
+            self.assertEqual(err.exception.status_code, 503)
+            self.assertEqual(err.exception.headers, {"Retry-After": "1"})
+
+            self.release.set()
+            self.assertEqual(await asyncio.gather(*pending), ["hashed-p0", "hashed-p1", "hashed-p2"])
+        self.assertEqual(self.auth.hash_pending, 0)
+        self.assertTrue(await self.auth.verify_password("secret", await self.auth.get_password_hash("secret")))
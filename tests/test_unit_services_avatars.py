@@ -0,0 +1,119 @@
+import io
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fastapi import UploadFile
+from PIL import Image
+
+from src.services.avatars import (AvatarError, AvatarStorage, AvatarTooLarge, CloudinaryStorage, LocalStorage,
+                                  avatar_key, normalise_image, process_avatar, read_upload)
+
+
+def make_image(width: int, height: int, format: str = "PNG", **params) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, format=format, **params)
+    return output.getvalue()
+
+
+def upload(data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="avatar.png")
+
+
+class TestReadUpload(unittest.IsolatedAsyncioTestCase):
+
+    async def test_read_upload(self):
+        data = b"x" * 200_000
+        content, digest = await read_upload(upload(data), max_bytes=200_000)
+        self.assertEqual(content, data)
+        self.assertEqual(len(digest), 64)
+
+    async def test_stops_reading_at_the_cap(self):
+        file = upload(b"x" * 1_000_000)
+        with self.assertRaises(AvatarTooLarge):
+            await read_upload(file, max_bytes=100_000)
+        self.assertLess(file.file.tell(), 200_000)
+
+
+class TestNormaliseImage(unittest.TestCase):
+
+    def test_crops_to_a_square_jpeg(self):
+        avatar = normalise_image(make_image(600, 300), size=250, max_pixels=10 ** 6)
+        with Image.open(io.BytesIO(avatar)) as image:
+            self.assertEqual((image.format, image.size, image.mode), ("JPEG", (250, 250), "RGB"))
+
+    def test_applies_exif_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees clockwise
+        data = make_image(400, 200, "JPEG", exif=exif)
+        with patch("src.services.avatars.ImageOps.fit", side_effect=lambda image, size, method: image) as fit:
+            normalise_image(data, size=100, max_pixels=10 ** 6)
+        width, height = fit.call_args.args[0].size
+        self.assertEqual(height, width * 2)
+
+    def test_rejects_invalid_images(self):
+        for data, max_pixels in ((b"not an image", 10 ** 6), (make_image(100, 100, "BMP"), 10 ** 6),
+                                 (make_image(2000, 1000), 10 ** 6)):
+            with self.subTest(data=data[:10]), self.assertRaises(AvatarError):
+                normalise_image(data, size=100, max_pixels=max_pixels)
+
+
+class TestProcessAvatar(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.storage = LocalStorage(folder.name, "/media/avatars/")
+        self.data = make_image(300, 300)
+
+    async def test_stores_avatar_under_its_content_key(self):
+        url = await process_avatar(upload(self.data), self.storage)
+
+        key = url.removeprefix("/media/avatars/").removesuffix(".jpg")
+        self.assertTrue(key.endswith("-250"))
+        with Image.open(self.storage.path(key)) as image:
+            self.assertEqual(image.size, (250, 250))
+        self.assertEqual(await process_avatar(upload(self.data), self.storage), url)
+
+    async def test_same_image_as_current_avatar_skips_processing(self):
+        url = await process_avatar(upload(self.data), self.storage)
+
+        with patch("src.services.avatars.normalise_image") as normalise, \
+                patch.object(self.storage, "save") as save:
+            self.assertEqual(await process_avatar(upload(self.data), self.storage, current_url=url), url)
+        normalise.assert_not_called()
+        save.assert_not_called()
+
+    async def test_existing_avatar_is_not_written_again(self):
+        key = avatar_key("a" * 64, 250)
+        self.storage.path(key).parent.mkdir(parents=True, exist_ok=True)
+        self.storage.path(key).write_bytes(b"stored")
+
+        await self.storage.save(key, b"new")
+
+        self.assertEqual(self.storage.path(key).read_bytes(), b"stored")
+
+
+class TestCloudinaryStorage(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.storage = CloudinaryStorage("cloud", "key", "secret", folder="avatars")
+        self.key = avatar_key("a" * 64, 250)
+
+    async def test_uploads_without_overwriting_a_stored_avatar(self):
+        for existing in (False, True):
+            with self.subTest(existing=existing), \
+                    patch("cloudinary.uploader.upload", return_value={"existing": existing}) as upload_:
+                url = await self.storage.save(self.key, b"avatar")
+
+            upload_.assert_called_once_with(b"avatar", public_id=f"avatars/{self.key}", overwrite=False,
+                                            resource_type="image")
+            self.assertTrue(url.endswith(f"/avatars/{self.key}.jpg"))
+
+    def test_storage_backends_implement_the_interface(self):
+        with self.assertRaises(TypeError):
+            AvatarStorage()
+
+
+if __name__ == '__main__':
+    unittest.main()
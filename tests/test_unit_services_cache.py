@@ -0,0 +1,129 @@
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from redis.exceptions import ConnectionError
+from starlette.datastructures import QueryParams
+
+from src.database.models import User
+from src.services.cache import CachedResponse, LocalTTLCache, ResponseCache, UserCache, dump_user
+
+
+class TestLocalTTLCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LocalTTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_expires_entries(self):
+        cache = LocalTTLCache(maxsize=2, ttl=60)
+        with patch("src.services.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+            cache.set("b", 2, ttl=5)
+        with patch("src.services.cache.time.monotonic", return_value=110.0):
+            self.assertEqual(cache.get("a"), 1)
+            self.assertIsNone(cache.get("b"))
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.cache = UserCache(self.redis, ttl=900, local_ttl=30, local_size=10)
+        self.user = User(id=1, username="testname", email="test@email.com", avatar="avatar",
+                         created_at=datetime(2024, 9, 28, 12, 0), confirmed=True, password="hash")
+
+    async def test_miss(self):
+        self.redis.get.return_value = None
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.assertEqual(self.cache.misses, 1)
+
+    async def test_set_writes_snapshot_with_ttl(self):
+        await self.cache.set(self.user)
+        self.redis.setex.assert_awaited_once_with("user:test@email.com", 900, dump_user(self.user))
+        self.assertNotIn(b"hash", dump_user(self.user))
+
+    async def test_local_hit_skips_redis(self):
+        await self.cache.set(self.user)
+        result = await self.cache.get(self.user.email)
+        self.redis.get.assert_not_awaited()
+        self.assertEqual(self.cache.local_hits, 1)
+        self.assertEqual((result.id, result.username, result.created_at), (1, "testname", self.user.created_at))
+
+    async def test_redis_hit_fills_local_tier(self):
+        self.redis.get.return_value = dump_user(self.user)
+        self.assertEqual((await self.cache.get(self.user.email)).email, self.user.email)
+        self.assertEqual((await self.cache.get(self.user.email)).email, self.user.email)
+        self.redis.get.assert_awaited_once()
+        self.assertEqual(self.cache.stats()["redis_hits"], 1)
+        self.assertEqual(self.cache.stats()["local_hits"], 1)
+
+    async def test_redis_errors_are_a_miss(self):
+        self.redis.get.side_effect = ConnectionError()
+        self.assertIsNone(await self.cache.get(self.user.email))
+
+    async def test_invalidate_evicts_and_publishes(self):
+        await self.cache.set(self.user)
+        await self.cache.invalidate(self.user.email)
+        self.assertEqual(len(self.cache.local), 0)
+        self.redis.delete.assert_awaited_once_with("user:test@email.com")
+        self.redis.publish.assert_awaited_once_with(UserCache.INVALIDATION_CHANNEL, self.user.email)
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.cache = ResponseCache(self.redis, ttl=300)
+        self.key = ResponseCache.key(1, "contacts", QueryParams("order=id&limit=10"))
+        self.response = CachedResponse({"ETag": '"3-abc"'}, b'[{"id":1}]')
+
+    def test_key_normalises_query_params(self):
+        self.assertEqual(self.key, ResponseCache.key(1, "contacts", QueryParams("limit=10&order=id")))
+        self.assertNotEqual(self.key, ResponseCache.key(2, "contacts", QueryParams("limit=10&order=id")))
+
+    async def test_hit_with_current_generation(self):
+        self.redis.mget.return_value = [b"4", None]
+        generation, cached = await self.cache.get(1, self.key)
+        self.assertIsNone(cached)
+        await self.cache.set(self.key, generation, self.response)
+        stored = self.redis.setex.call_args.args[2]
+        self.redis.setex.assert_awaited_once_with(self.key, 300, stored)
+
+        self.redis.mget.return_value = [b"4", stored]
+        self.assertEqual(await self.cache.get(1, self.key), (b"4", self.response))
+        self.redis.mget.assert_awaited_with("responses:1:generation", self.key)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "bypasses": 0, "hit_ratio": 0.5})
+
+    async def test_stale_generation_is_a_miss(self):
+        self.redis.mget.return_value = [b"5", b"4\n{}\n[]"]
+        self.assertEqual(await self.cache.get(1, self.key), (b"5", None))
+
+    async def test_bypass_skips_the_entry(self):
+        self.redis.mget.return_value = [None, b"0\n{}\n[]"]
+        self.assertEqual(await self.cache.get(1, self.key, bypass=True), (b"0", None))
+        self.assertEqual(self.cache.stats()["bypasses"], 1)
+
+    async def test_redis_errors_disable_storing(self):
+        self.redis.mget.side_effect = ConnectionError()
+        generation, cached = await self.cache.get(1, self.key)
+        self.assertIsNone(cached)
+        await self.cache.set(self.key, generation, self.response)
+        self.redis.setex.assert_not_awaited()
+
+    async def test_disabled_cache_skips_redis(self):
+        cache = ResponseCache(self.redis, ttl=300, enabled=False)
+        self.assertEqual(await cache.get(1, self.key), (None, None))
+        await cache.invalidate(1)
+        self.redis.mget.assert_not_awaited()
+        self.redis.incr.assert_not_awaited()
+
+    async def test_invalidate_increments_generation(self):
+        await self.cache.invalidate(1)
+        self.redis.incr.assert_awaited_once_with("responses:1:generation")
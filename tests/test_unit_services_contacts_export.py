@@ -0,0 +1,154 @@
+import csv
+import io
+import json
+import os
+import tracemalloc
+import unittest
+from datetime import date, datetime
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import Base, Contact, User
+from src.repository.contacts import stream_contacts
+from src.services.contacts_export import encode_csv, encode_ndjson, encode_vcard, iter_chunks
+from src.services.contacts_import import iter_csv
+
+
+def make_row(i: int) -> dict:
+    return {
+        "id": i,
+        "first_name": f"Taras{i}",
+        "last_name": "Shevchenko",
+        "email": f"taras{i}@example.com",
+        "phone": "380501234567",
+        "birthday": date(1814, 3, 9),
+        "additional_info": "poet, \"Kobzar\"\nauthor" if i % 2 else None,
+        "created_at": datetime(2024, 1, 1, 12, 0),
+    }
+
+
+async def rows(count: int):
+    for i in range(count):
+        yield make_row(i)
+
+
+async def collect(iterator) -> str:
+    return "".join([part async for part in iterator])
+
+
+async def rows_of(*items):
+    for item in items:
+        yield item
+
+
+class TestContactsExport(unittest.IsolatedAsyncioTestCase):
+
+    async def test_encode_ndjson(self):
+        lines = (await collect(encode_ndjson(rows(2)))).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1]), {
+            "id": 1, "first_name": "Taras1", "last_name": "Shevchenko", "email": "taras1@example.com",
+            "phone": "380501234567", "birthday": "1814-03-09", "additional_info": "poet, \"Kobzar\"\nauthor",
+            "created_at": "2024-01-01T12:00:00",
+        })
+
+    async def test_encode_csv_round_trips_through_import(self):
+        data = await collect(encode_csv(rows(3)))
+        self.assertEqual(len(list(csv.reader(io.StringIO(data)))), 4)
+
+        async def chunks():
+            yield data.encode()
+
+        records = [record async for _, record in iter_csv(chunks())]
+        self.assertEqual(records[1]["additional_info"], "poet, \"Kobzar\"\nauthor")
+        self.assertEqual(records[2]["birthday"], "1814-03-09")
+
+    async def test_encode_vcard(self):
+        card = await collect(encode_vcard(rows(2)))
+        self.assertEqual(card.count("BEGIN:VCARD\r\n"), 2)
+        self.assertIn("N:Shevchenko;Taras1;;;\r\n", card)
+        self.assertIn("BDAY:1814-03-09\r\n", card)
+        self.assertIn("NOTE:poet\\, \"Kobzar\"\\nauthor\r\n", card)
+        self.assertEqual(card.count("NOTE:"), 1)
+
+    async def test_encode_vcard_folds_long_lines(self):
+        row = dict(make_row(0), additional_info="ї" * 100)
+        card = await collect(encode_vcard(rows_of(row)))
+        lines = card.split("\r\n")
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        note = "".join(line[1:] if line.startswith(" ") else line for line in lines if "ї" in line)
+        self.assertEqual(note, "NOTE:" + "ї" * 100)
+
+    async def test_iter_chunks(self):
+        chunks = [chunk async for chunk in iter_chunks(encode_ndjson(rows(1000)), chunk_size=4096)]
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) < 4096 + 1024 for chunk in chunks))
+        self.assertEqual(b"".join(chunks).count(b"\n"), 1000)
+
+    async def test_export_peak_memory_does_not_grow_with_rows(self):
+        for encode in (encode_ndjson, encode_csv, encode_vcard):
+            peaks = []
+            for count in (1_000, 20_000):
+                tracemalloc.start()
+                try:
+                    async for _ in iter_chunks(encode(rows(count))):
+                        pass
+                    peaks.append(tracemalloc.get_traced_memory()[1])
+                finally:
+                    tracemalloc.stop()
+            self.assertLess(peaks[1], peaks[0] + 64 * 1024, encode.__name__)
+
+
+class TestContactsExportFromDatabase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.small = await self.add_user("small@example.com", 1_000)
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def add_user(self, email: str, contacts: int) -> User:
+        user = User(email=email, password="secret")
+        self.session.add(user)
+        await self.session.flush()
+        for start in range(0, contacts, 10_000):
+            rows = [dict(make_row(i), user_id=user.id) for i in range(start, min(start + 10_000, contacts))]
+            for row in rows:
+                del row["id"]
+            await self.session.execute(insert(Contact.__table__), rows)
+        await self.session.commit()
+        return user
+
+    async def export(self, user: User, encode) -> tuple[int, int, int]:
+        lines, size = 0, 0
+        tracemalloc.start()
+        try:
+            rows = stream_contacts(user, self.session, batch_size=500)
+            async for chunk in iter_chunks(encode(rows)):
+                lines += chunk.count(b"\n")
+                size += len(chunk)
+            return lines, size, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    async def test_export_peak_memory_does_not_grow_with_contacts(self):
+        large = await self.add_user("large@example.com", 20_000)
+        small_lines, _, small_peak = await self.export(self.small, encode_ndjson)
+        large_lines, _, large_peak = await self.export(large, encode_ndjson)
+        self.assertEqual((small_lines, large_lines), (1_000, 20_000))
+        self.assertLess(large_peak, small_peak + 256 * 1024)
+
+    @unittest.skipUnless(os.environ.get("RUN_SLOW_TESTS"), "set RUN_SLOW_TESTS=1 to export a million contacts")
+    async def test_export_of_a_million_contacts_uses_constant_memory(self):
+        million = await self.add_user("million@example.com", 1_000_000)
+        lines, size, peak = await self.export(million, encode_ndjson)
+        self.assertEqual(lines, 1_000_000)
+        self.assertGreater(size, 150 * 1024 * 1024)
+        # A handful of fetched batches and one output chunk, not the export
+        self.assertLess(peak, 8 * 1024 * 1024)
@@ -0,0 +1,68 @@
+import unittest
+
+from src.services.contacts_import import MAX_RECORD_LENGTH, RecordTooLong, iter_csv, iter_lines, iter_ndjson
+
+
+async def chunked(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+class TestContactsImport(unittest.IsolatedAsyncioTestCase):
+
+    async def test_iter_lines_across_chunks(self):
+        data = "first\r\nпʼятий\nlast".encode()
+        self.assertEqual(await collect(iter_lines(chunked(data, size=3))), ["first", "пʼятий", "last"])
+
+    async def test_iter_ndjson(self):
+        data = b'{"first_name": "Taras"}\n\n[1, 2]\n{broken\n{"first_name": "Lesya"}\n'
+        records = await collect(iter_ndjson(chunked(data)))
+        self.assertEqual(records[0], (1, {"first_name": "Taras"}))
+        self.assertEqual([(line, type(record)) for line, record in records[1:3]], [(3, ValueError), (4, ValueError)])
+        self.assertEqual(records[3], (5, {"first_name": "Lesya"}))
+
+    async def test_iter_csv_with_multiline_quoted_field(self):
+        data = (b'first_name,last_name,additional_info\n'
+                b'Taras,Shevchenko,"poet, ""Kobzar""\nauthor"\n'
+                b'Lesya,Ukrainka,\n'
+                b'Ivan,Franko\n')
+        records = await collect(iter_csv(chunked(data)))
+        self.assertEqual(records[0], (2, {"first_name": "Taras", "last_name": "Shevchenko",
+                                          "additional_info": 'poet, "Kobzar"\nauthor'}))
+        self.assertEqual(records[1], (4, {"first_name": "Lesya", "last_name": "Ukrainka", "additional_info": None}))
+        self.assertEqual(records[2][0], 5)
+        self.assertIsInstance(records[2][1], ValueError)
+
+    async def test_iter_csv_unterminated_quote(self):
+        records = await collect(iter_csv(chunked(b'first_name\n"Taras\n')))
+        self.assertEqual(records[0][0], 2)
+        self.assertIsInstance(records[0][1], ValueError)
+
+    async def test_iter_lines_rejects_a_long_line_before_reading_the_rest(self):
+        read = []
+
+        async def endless():
+            while True:
+                read.append(1)
+                yield b"x" * 1024
+
+        with self.assertRaises(RecordTooLong) as cm:
+            await collect(iter_lines(endless()))
+        self.assertEqual(cm.exception.line, 1)
+        self.assertLessEqual(len(read), MAX_RECORD_LENGTH // 1024 + 1)
+
+    async def test_iter_ndjson_rejects_a_long_line(self):
+        data = b'{"first_name": "Taras"}\n' + b"x" * (MAX_RECORD_LENGTH + 1) + b"\n"
+        with self.assertRaises(RecordTooLong) as cm:
+            await collect(iter_ndjson(chunked(data, size=4096)))
+        self.assertEqual(cm.exception.line, 2)
+
+    async def test_iter_csv_rejects_a_long_record(self):
+        data = b'first_name\n"' + b"x\n" * MAX_RECORD_LENGTH + b'"\n'
+        with self.assertRaises(RecordTooLong) as cm:
+            await collect(iter_csv(chunked(data, size=4096)))
+        self.assertEqual(cm.exception.line, 2)
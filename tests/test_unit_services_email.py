@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from jinja2 import UndefinedError
+
+from src.database.models import EmailOutbox
+from src.services.email import TemplateRenderer, build_messages, renderer
+
+
+class TestTemplateRenderer(unittest.TestCase):
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = Path(folder.name)
+        (self.folder / "greeting.html").write_text(
+            "{% for i in range(times) %}Hi {{ name }}{{ user.title() }}!{% endfor %}"
+        )
+        self.renderer = TemplateRenderer(self.folder)
+
+    def test_render_many_matches_template_render(self):
+        contexts = [{"name": "Taras", "times": 2, "user": ""}, {"name": "<b>Petro</b>", "times": 1, "user": "x"}]
+        template = self.renderer.environment.get_template("greeting.html")
+
+        rendered = self.renderer.render_many("greeting.html", contexts)
+
+        self.assertEqual(rendered, [template.render(context) for context in contexts])
+        self.assertEqual(rendered[1], "Hi &lt;b&gt;Petro&lt;/b&gt;X!")
+        self.assertEqual(self.renderer.render("greeting.html", contexts[0]), "Hi Taras!Hi Taras!")
+
+    def test_templates_are_compiled_once(self):
+        (self.folder / "greeting.html").write_text("Changed")
+        with patch.object(self.renderer.environment, "get_template") as get_template:
+            rendered = self.renderer.render("greeting.html", {"name": "Taras", "times": 1, "user": ""})
+        get_template.assert_not_called()
+        self.assertEqual(rendered, "Hi Taras!")
+
+    def test_errors(self):
+        with self.assertRaises(UndefinedError):
+            self.renderer.render_many("greeting.html", [{"name": "Taras", "times": 1, "user": ""}, {"times": 1}])
+        with self.assertRaises(KeyError):
+            self.renderer.render("missing.html", {})
+
+
+class TestBuildMessages(unittest.TestCase):
+
+    def test_emails_that_cant_be_rendered_dont_hold_back_the_batch(self):
+        emails = [
+            EmailOutbox(kind="confirm_email", recipient="taras@example.com", context={"username": "Taras", "host": "/"}),
+            EmailOutbox(kind="unknown", recipient="petro@example.com", context={}),
+            EmailOutbox(kind="confirm_email", recipient="anna@example.com", context={"username": "Anna", "host": "/"}),
+        ]
+
+        with patch.object(renderer, "render_many", wraps=renderer.render_many) as render_many:
+            taras, unknown, anna = build_messages(emails)
+
+        render_many.assert_called_once()
+        self.assertIsInstance(unknown, KeyError)
+        self.assertEqual((taras["To"], anna["To"]), ("taras@example.com", "anna@example.com"))
+        self.assertIn("Hi Anna,", anna.get_payload(decode=True).decode())
+
+
+if __name__ == '__main__':
+    unittest.main()
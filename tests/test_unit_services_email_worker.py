@@ -0,0 +1,214 @@
+import asyncio
+import email
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import Base, EmailOutbox
+from src.repository.email_outbox import claim_emails, queue_email
+from src.services.auth import auth_service
+from src.services.email import SMTPSender, build_message, queue_confirmation_email
+from src.services.email_worker import EmailWorker
+
+
+class LocalSMTPServer:
+    """
+    A minimal SMTP server on localhost that keeps the messages it receives.
+
+    Replies to RCPT can be overridden per recipient, e.g. to reject a mailbox.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.replies = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 localhost ESMTP\r\n")
+        recipients = []
+        while line := await reader.readline():
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                writer.write(b"250-localhost\r\n250 8BITMIME\r\n")
+            elif verb == "RCPT":
+                recipient = command.split(":", 1)[1].strip().strip("<>")
+                reply = self.replies.get(recipient, "250 OK")
+                if reply.startswith("250"):
+                    recipients.append(recipient)
+                writer.write(reply.encode() + b"\r\n")
+            elif verb == "DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                data = b""
+                while (chunk := await reader.readline()) != b".\r\n":
+                    data += chunk
+                self.messages.append((recipients, email.message_from_bytes(data)))
+                recipients = []
+                writer.write(b"250 OK\r\n")
+            elif verb == "QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            elif verb == "RSET":
+                recipients = []
+                writer.write(b"250 OK\r\n")
+            elif verb in ("HELO", "MAIL", "NOOP"):
+                writer.write(b"250 OK\r\n")
+            else:
+                writer.write(b"502 Command not implemented\r\n")
+            await writer.drain()
+        writer.close()
+
+
+class TestEmailWorker(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs the email worker against SQLite and a local SMTP server.
+    """
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session_maker = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.smtp = LocalSMTPServer()
+        await self.smtp.start()
+        self.sender = SMTPSender("127.0.0.1", self.smtp.port, use_tls=False, timeout=5)
+        self.worker = EmailWorker(self.session_maker, self.sender, batch_size=10, max_attempts=3, retry_base=30)
+
+    async def asyncTearDown(self):
+        await self.sender.close()
+        await self.smtp.stop()
+        await self.engine.dispose()
+
+    async def queue(self, *recipients: str):
+        async with self.session_maker() as db:
+            for recipient in recipients:
+                queue_confirmation_email(recipient, "Taras", "http://testserver/", db)
+            await db.commit()
+
+    async def outbox(self) -> dict:
+        async with self.session_maker() as db:
+            emails = await db.scalars(select(EmailOutbox).order_by(EmailOutbox.id))
+            return {email.recipient: email for email in emails}
+
+    async def test_batches_are_sent_over_one_connection(self):
+        await self.queue(*(f"user{i}@example.com" for i in range(5)))
+        self.assertEqual(await self.worker.run_once(), 5)
+        await self.queue("user5@example.com", "user6@example.com")
+        self.assertEqual(await self.worker.run_once(), 2)
+        self.assertEqual(await self.worker.run_once(), 0)
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 7)
+        outbox = await self.outbox()
+        self.assertTrue(all(email.status == "sent" and email.sent_at and email.attempts == 1
+                            for email in outbox.values()))
+        stats = self.worker.stats()
+        self.assertEqual((stats["sent"], stats["batches"], stats["connections"]), (7, 2, 1))
+        self.assertGreater(stats["emails_per_second"], 0)
+
+    async def test_message(self):
+        await self.queue("taras@example.com")
+        await self.worker.run_once()
+
+        [(recipients, message)] = self.smtp.messages
+        self.assertEqual(recipients, ["taras@example.com"])
+        self.assertEqual(message["To"], "taras@example.com")
+        self.assertEqual(message["Subject"], "Confirm your email address ")
+        html = message.get_payload(decode=True).decode()
+        self.assertIn("Hi Taras,", html)
+        token = html.split("api/auth/confirmed_email/")[1].split('"')[0]
+        self.assertEqual(await auth_service.get_email_from_token(token), "taras@example.com")
+
+    async def test_template_context_is_escaped(self):
+        async with self.session_maker() as db:
+            queue_email("confirm_email", "taras@example.com", {"username": "<b>Taras</b>", "host": "http://x/"}, db)
+            await db.commit()
+            [queued] = await claim_emails(1, 60, db)
+
+        self.assertIn("Hi &lt;b&gt;Taras&lt;/b&gt;,", build_message(queued).get_payload(decode=True).decode())
+
+    async def test_rejected_recipients(self):
+        self.smtp.replies = {"gone@example.com": "550 No such user", "full@example.com": "452 Mailbox full"}
+        await self.queue("gone@example.com", "full@example.com", "taras@example.com")
+
+        await self.worker.run_once()
+
+        outbox = await self.outbox()
+        self.assertEqual(outbox["taras@example.com"].status, "sent")
+        self.assertEqual(outbox["gone@example.com"].status, "failed")
+        self.assertIn("550", outbox["gone@example.com"].last_error)
+        self.assertEqual(outbox["full@example.com"].status, "pending")
+        self.assertGreater(outbox["full@example.com"].next_attempt_at, datetime.utcnow() + timedelta(seconds=10))
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(self.worker.stats()["retried"], 1)
+        self.assertEqual(self.worker.stats()["failed"], 1)
+
+    async def test_emails_are_retried_when_the_server_is_down(self):
+        await self.queue("taras@example.com", "petro@example.com")
+        await self.smtp.stop()
+
+        await self.worker.run_once()
+
+        outbox = await self.outbox()
+        self.assertTrue(all(email.status == "pending" and email.attempts == 1 for email in outbox.values()))
+        self.assertEqual(self.worker.stats()["retried"], 2)
+
+        await self.smtp.start()
+        self.sender.options["port"] = self.smtp.port
+        async with self.session_maker() as db:
+            await db.execute(EmailOutbox.__table__.update().values(next_attempt_at=datetime.utcnow()))
+            await db.commit()
+        await self.worker.run_once()
+
+        outbox = await self.outbox()
+        self.assertTrue(all(email.status == "sent" and email.attempts == 2 for email in outbox.values()))
+
+    async def test_gives_up_after_max_attempts(self):
+        self.smtp.replies = {"full@example.com": "452 Mailbox full"}
+        await self.queue("full@example.com")
+        for _ in range(3):
+            async with self.session_maker() as db:
+                await db.execute(EmailOutbox.__table__.update().values(next_attempt_at=datetime.utcnow()))
+                await db.commit()
+            await self.worker.run_once()
+
+        email = (await self.outbox())["full@example.com"]
+        self.assertEqual((email.status, email.attempts), ("failed", 3))
+
+    async def test_claimed_emails_are_not_claimed_again_until_the_claim_times_out(self):
+        await self.queue("taras@example.com")
+        async with self.session_maker() as db:
+            self.assertEqual(len(await claim_emails(10, 300, db)), 1)
+            self.assertEqual(await claim_emails(10, 300, db), [])
+            await db.execute(EmailOutbox.__table__.update().values(next_attempt_at=datetime.utcnow()))
+            await db.commit()
+            [email] = await claim_emails(10, 300, db)
+        self.assertEqual(email.attempts, 2)
+
+    async def test_run_stops(self):
+        await self.queue("taras@example.com")
+        stop = asyncio.Event()
+        task = asyncio.create_task(self.worker.run(stop, poll_interval=0.01))
+        while not self.smtp.messages:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await asyncio.wait_for(task, 1)
+
+        self.assertIsNone(self.sender.client)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from starlette.datastructures import QueryParams
+
+from src.services.etag import collection_etag, contact_etag, etag_matches
+
+
+class TestEtag(unittest.TestCase):
+
+    def test_contact_etag(self):
+        self.assertEqual(contact_etag(7, 3), '"7.3"')
+
+    def test_collection_etag_depends_on_version_user_and_params(self):
+        etag = collection_etag(1, 5, QueryParams("limit=10&order=name"))
+        self.assertEqual(etag, collection_etag(1, 5, QueryParams("order=name&limit=10")))
+        self.assertNotEqual(etag, collection_etag(1, 6, QueryParams("limit=10&order=name")))
+        self.assertNotEqual(etag, collection_etag(2, 5, QueryParams("limit=10&order=name")))
+        self.assertNotEqual(etag, collection_etag(1, 5, QueryParams("limit=20&order=name")))
+        self.assertTrue(etag.startswith('"5-') and etag.endswith('"'))
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"7.3"', '"7.3"'))
+        self.assertTrue(etag_matches('"1.1", W/"7.3"', '"7.3"'))
+        self.assertTrue(etag_matches("*", '"7.3"'))
+        self.assertFalse(etag_matches('"7.2"', '"7.3"'))
+        self.assertFalse(etag_matches(None, '"7.3"'))
@@ -0,0 +1,175 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+from fastapi import Depends, FastAPI, Response
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError
+
+from src.services.auth import auth_service
+from src.services.rate_limit import (RateLimit, RateLimitHeadersMiddleware, RateLimitState, SlidingWindowLimiter,
+                                     parse_rate)
+
+
+class TestParseRate(unittest.TestCase):
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("12/60"), (12, 60))
+        for rate in ("12", "0/60", "12/0", "a/60"):
+            with self.assertRaises(ValueError):
+                parse_rate(rate)
+
+
+class TestSlidingWindowLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = MagicMock()
+        self.script = AsyncMock()
+        self.redis.register_script.return_value = self.script
+        self.limiter = SlidingWindowLimiter(self.redis, lease_fraction=0.25, lease_ttl=60)
+
+    async def test_leased_tokens_are_spent_locally(self):
+        self.script.return_value = [3, 9, 60000]
+
+        states = [await self.limiter.acquire("contacts_list:1", 12, 60) for _ in range(3)]
+
+        self.script.assert_awaited_once()
+        kwargs = self.script.await_args.kwargs
+        self.assertEqual(kwargs["keys"], ["rate-limit:contacts_list:1"])
+        self.assertEqual(kwargs["args"][:3], [60000, 12, 3])
+        self.assertEqual(kwargs["args"][4:], ["", 0])
+        self.assertTrue(all(state.allowed for state in states))
+        self.assertEqual([state.remaining for state in states], [11, 10, 9])
+        self.assertEqual(self.limiter.stats(), {"local_hits": 2, "redis_calls": 1, "rejected": 0, "leases": 1})
+
+    async def test_new_lease_when_tokens_run_out(self):
+        self.script.return_value = [1, 0, 60000]
+        await self.limiter.acquire("contacts_list:1", 12, 60)
+        self.script.return_value = [0, 0, 30000]
+
+        state = await self.limiter.acquire("contacts_list:1", 12, 60)
+
+        self.assertEqual(self.script.await_count, 2)
+        self.assertEqual(self.script.await_args.kwargs["args"][4:], ["", 0])
+        self.assertEqual(state, RateLimitState(False, 12, 0, 30.0))
+        self.assertEqual(self.limiter.stats()["rejected"], 1)
+
+    async def test_rejection_is_kept_locally(self):
+        self.script.return_value = [0, 0, 30000]
+        await self.limiter.acquire("contacts_list:1", 12, 60)
+
+        state = await self.limiter.acquire("contacts_list:1", 12, 60)
+
+        self.script.assert_awaited_once()
+        self.assertFalse(state.allowed)
+        self.assertEqual(self.limiter.stats()["rejected"], 2)
+
+    async def test_expired_lease_is_refunded(self):
+        self.limiter.lease_ttl = 0
+        self.script.return_value = [3, 9, 60000]
+        await self.limiter.acquire("contacts_list:1", 12, 60)
+        first = self.script.await_args.kwargs["args"][3]
+
+        await self.limiter.acquire("contacts_list:1", 12, 60)
+
+        self.assertEqual(self.script.await_count, 2)
+        self.assertEqual(self.script.await_args.kwargs["args"][4:], [f"{first}:3", 2])
+
+    async def test_allows_requests_when_redis_is_down(self):
+        self.script.side_effect = ConnectionError("Connection refused")
+
+        state = await self.limiter.acquire("contacts_list:1", 12, 60)
+
+        self.assertTrue(state.allowed)
+        self.assertEqual(len(self.limiter.leases), 0)
+
+
+class TestSlidingWindowLimiterWithRedis(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+
+    def limiter(self, lease_ttl: float) -> SlidingWindowLimiter:
+        return SlidingWindowLimiter(fakeredis.FakeAsyncRedis(server=self.server), lease_fraction=0.25,
+                                    lease_ttl=lease_ttl)
+
+    async def window_tokens(self, key: str) -> int:
+        leases = await fakeredis.FakeAsyncRedis(server=self.server).zrange(f"rate-limit:{key}", 0, -1)
+        return sum(int(lease.rsplit(b":", 1)[1]) for lease in leases)
+
+    async def test_workers_sharing_a_key_admit_the_limit_in_total(self):
+        for lease_ttl in (60, 0):
+            with self.subTest(lease_ttl=lease_ttl):
+                first, second = self.limiter(lease_ttl), self.limiter(lease_ttl)
+                key = f"contacts_list:{lease_ttl}"
+
+                states = [await limiter.acquire(key, 12, 60) for _ in range(15) for limiter in (first, second)]
+
+                self.assertEqual(sum(state.allowed for state in states), 12)
+                self.assertFalse(states[-1].allowed)
+                self.assertEqual(await self.window_tokens(key), 12)
+
+    async def test_expired_lease_refunds_unused_tokens_to_the_window(self):
+        first, second = self.limiter(lease_ttl=0), self.limiter(lease_ttl=0)
+        await first.acquire("contacts_list:1", 8, 60)
+        await second.acquire("contacts_list:1", 8, 60)
+        self.assertEqual(await self.window_tokens("contacts_list:1"), 4)
+
+        state = await first.acquire("contacts_list:1", 8, 60)
+
+        # The first lease keeps the token it spent and returns the other one before leasing two more
+        self.assertEqual(await self.window_tokens("contacts_list:1"), 5)
+        self.assertEqual(state.remaining, 4)
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def setUp(self):
+        self.app = FastAPI()
+        self.app.add_middleware(RateLimitHeadersMiddleware)
+        self.app.dependency_overrides[auth_service.get_current_user] = lambda: SimpleNamespace(id=1)
+
+        @self.app.get("/items", dependencies=[Depends(RateLimit("contacts_list"))])
+        async def read_items():
+            return Response(content=b"[]", media_type="application/json")
+
+        self.client = TestClient(self.app)
+        self.limiter = MagicMock()
+        self.limiter.acquire = AsyncMock()
+        patcher = patch("src.services.rate_limit.rate_limiter", self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_headers_are_added_to_responses_returned_by_routes(self):
+        self.limiter.acquire.return_value = RateLimitState(True, 12, 11, 59.2)
+
+        response = self.client.get("/items")
+
+        self.assertEqual(response.status_code, 200)
+        self.limiter.acquire.assert_awaited_once_with("contacts_list:1", 12, 60)
+        self.assertEqual(response.headers["RateLimit-Limit"], "12")
+        self.assertEqual(response.headers["RateLimit-Remaining"], "11")
+        self.assertEqual(response.headers["RateLimit-Reset"], "60")
+        self.assertEqual(response.headers["RateLimit-Policy"], "12;w=60")
+
+    def test_too_many_requests(self):
+        self.limiter.acquire.return_value = RateLimitState(False, 12, 0, 14.5)
+
+        response = self.client.get("/items")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "15")
+        self.assertEqual(response.headers["RateLimit-Remaining"], "0")
+
+    def test_disabled(self):
+        with patch("src.services.rate_limit.settings.rate_limit_enabled", False):
+            response = self.client.get("/items")
+
+        self.assertEqual(response.status_code, 200)
+        self.limiter.acquire.assert_not_awaited()
+        self.assertNotIn("RateLimit-Limit", response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
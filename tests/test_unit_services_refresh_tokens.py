@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import HTTPException
+
+from src.services.auth import auth_service
+from src.services.refresh_tokens import REUSED, ROTATED, InMemoryRefreshTokenStore, RefreshTokenStore
+
+
+class TestRefreshTokenStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = MagicMock()
+        self.redis.set = AsyncMock()
+        self.redis.register_script.return_value = self.script = AsyncMock(return_value=ROTATED)
+        self.store = RefreshTokenStore(self.redis, ttl=60)
+
+    async def test_issue_starts_a_family(self):
+        token = await self.store.issue("taras@example.com")
+
+        claims = await auth_service.decode_refresh_token(token)
+        self.assertEqual(claims["sub"], "taras@example.com")
+        self.redis.set.assert_awaited_once_with(self.store.key(claims["fid"]), claims["jti"], ex=60)
+
+    async def test_rotate(self):
+        claims = await auth_service.decode_refresh_token(await self.store.issue("taras@example.com"))
+
+        new_claims = await auth_service.decode_refresh_token(await self.store.rotate(claims))
+
+        self.assertEqual((new_claims["sub"], new_claims["fid"]), (claims["sub"], claims["fid"]))
+        self.script.assert_awaited_once_with(keys=[self.store.key(claims["fid"])],
+                                             args=[claims["jti"], new_claims["jti"], 60])
+
+    async def test_rotate_rejects_reused_and_legacy_tokens(self):
+        self.script.return_value = REUSED
+        for claims, detail in (({"sub": "taras@example.com", "fid": "f", "jti": "j"}, "Refresh token reused"),
+                               ({"sub": "taras@example.com"}, "Invalid refresh token")):
+            with self.subTest(detail=detail), self.assertRaises(HTTPException) as err:
+                await self.store.rotate(claims)
+            self.assertEqual((err.exception.status_code, err.exception.detail), (401, detail))
+
+
+class TestInMemoryRefreshTokenStore(unittest.IsolatedAsyncioTestCase):
+
+    async def test_families_expire(self):
+        store = InMemoryRefreshTokenStore(ttl=60)
+        claims = await auth_service.decode_refresh_token(await store.issue("taras@example.com"))
+
+        with patch("src.services.refresh_tokens.time.monotonic", return_value=10 ** 9):
+            with self.assertRaises(HTTPException) as err:
+                await store.rotate(claims)
+        self.assertEqual(err.exception.detail, "Invalid refresh token")
+        self.assertEqual(store.families, {})
+
+
+if __name__ == '__main__':
+    unittest.main()